@@ -0,0 +1,209 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from scrape.combine import BetFPLCombiner
+from scrape.identity import merge_on_keys
+from scrape.players.features import FeatureStore
+from scrape.players.process import FPLProcessor
+from scrape.players.scrape import FPLScraper
+from team.select import DumbOptimiser
+from team.team import Team
+
+# Per-process inputs set up once by _init_worker rather than sent with every gameweek
+_worker = {}
+
+
+def _init_worker(season, gw_stats, fixtures, settings):
+    _worker["season"] = season
+    _worker["gw_stats"] = gw_stats
+    # Lookups only see gameweeks before the one asked for, so one store serves all
+    _worker["features"] = FeatureStore(gw_stats)
+    _worker["fixtures"] = fixtures
+    _worker["settings"] = settings
+
+
+def odds_for_gameweek(odds, fixtures, gameweek):
+    """
+    Latest odds for each of a gameweek's fixtures taken before the day of
+    its first kickoff.
+
+    Args:
+        odds (pd.DataFrame): Odds as from BetScraper.to_df, optionally with a
+            `snapshot` time per row when several scrapes are stacked.
+        fixtures (pd.DataFrame): FPLScraper.fixtures.
+        gameweek (int): Gameweek to pick odds for.
+
+    Returns:
+        pd.DataFrame: One row per fixture with odds.
+    """
+    games = fixtures[fixtures["gameweek"] == gameweek]
+    odds = merge_on_keys(
+        odds,
+        games[["home", "away"]].drop_duplicates(),
+        left_on=["home", "away"],
+        right_on=["home", "away"],
+        kinds=["team", "team"],
+        new="right",
+    )
+    if "snapshot" in odds.columns:
+        deadline = pd.to_datetime(games["game_date"]).min()
+        snapshot = pd.to_datetime(odds["snapshot"], utc=True).dt.tz_localize(None)
+        odds = odds[snapshot < deadline].sort_values("snapshot")
+    return odds.drop_duplicates(["home", "away"], keep="last")
+
+
+def _neutral_odds(fixtures, gameweek, season):
+    games = fixtures.loc[fixtures["gameweek"] == gameweek, ["home", "away"]]
+    return games.assign(
+        home_odds=1 / 3, draw_odds=1 / 3, away_odds=1 / 3, season=season
+    )
+
+
+def _score_picks(picks, actual):
+    """Actual points of the starters, captain counted twice"""
+    squad = picks[picks["picked"] == 1]
+    points = squad["element"].map(actual).fillna(0)
+    starters = squad["first_xi"] == 1
+    captain = squad["captain"] == 1
+    return {
+        "points": points[starters].sum() + points[captain].sum(),
+        "bench_points": points[~starters].sum(),
+        "captain": squad.loc[captain, "name"].iloc[0],
+        "captain_points": points[captain].sum(),
+        "blanks": int((starters & ~squad["element"].isin(actual.index)).sum()),
+        "squad_value": squad["value"].sum(),
+    }
+
+
+def _run_gameweek(gameweek, odds):
+    season, settings = _worker["season"], _worker["settings"]
+    gw_stats = _worker["gw_stats"]
+    result = {"gameweek": gameweek}
+    start = time.perf_counter()
+    try:
+        # Only the fixtures are read from the scraper. The shared store
+        # serves the stats, looking back from the gameweek only.
+        scraper = FPLScraper(season)
+        scraper.fixtures = _worker["fixtures"]
+        processor = FPLProcessor(
+            season, gameweek, scraper=scraper, features=_worker["features"]
+        )
+
+        df_next_game = BetFPLCombiner(
+            gameweek,
+            odds,
+            processor.player_stats,
+            season=season,
+            odds_weight_def=settings["odds_weight_def"],
+            odds_weight_fwd=settings["odds_weight_fwd"],
+        ).prepare_next_gw()
+
+        team = Team(
+            season,
+            gameweek,
+            df_next_game,
+            optimisation_obj=settings["optimiser"],
+            budget=settings["budget"],
+        )
+        picks = team.pick_xi()
+
+        played = gw_stats[
+            (gw_stats["season"] == season) & (gw_stats["gameweek"] == gameweek)
+        ]
+        actual = played.groupby("element")["total_points"].sum()
+        result.update(_score_picks(picks, actual))
+        result["n_players"] = len(df_next_game)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["pick_time"] = time.perf_counter() - start
+    return result
+
+
+def backtest(
+    season,
+    odds=None,
+    gameweeks=None,
+    optimiser=DumbOptimiser,
+    budget=1000,
+    odds_weight_def=0.6,
+    odds_weight_fwd=0.4,
+    processes=None,
+    scraper=None,
+):
+    """
+    Replay a past season, picking a team each gameweek from the data
+    available before it and scoring it on the points actually scored.
+
+    The scrape runs once and its data is handed to every worker when the
+    pool starts. Each gameweek is then sent with just its own odds.
+
+    Args:
+        season (int): Season in FPLScraper.SEASON_MAP.
+        odds (pd.DataFrame, optional): Stacked odds scrapes, see
+            odds_for_gameweek. Rows of other seasons are left out. Every
+            result is even money if not passed.
+        gameweeks (list, optional): Gameweeks to replay, 2 to 38 by default.
+        optimiser (Type, optional): Optimiser class for Team.
+        budget (int, optional): Budget for each pick.
+        odds_weight_def (float, optional): Odds weight for DEF and GK.
+        odds_weight_fwd (float, optional): Odds weight for MID and FWD.
+        processes (int, optional): Pool size. 1 runs in this process.
+        scraper (FPLScraper, optional): Scraper that has already been run.
+
+    Returns:
+        pd.DataFrame: One row per gameweek with the team's points, bench
+        and captain points, blanks (starters without a game), squad value,
+        time taken and a running total. Gameweeks that failed carry the
+        error instead.
+    """
+    if scraper is None:
+        scraper = FPLScraper(season)
+        scraper.run_scrape()
+    gw_stats = scraper.gw_stats
+    gw_stats = gw_stats.assign(season=gw_stats["season"].astype(int))
+    fixtures = scraper.fixtures
+
+    if odds is not None:
+        # The same clubs meet every season, so scrapes stamped with another
+        # season are dropped and the rest stamped with this one to merge
+        if "season" in odds.columns:
+            odds = odds[odds["season"].astype(int) == season]
+        if odds.empty:
+            raise Exception(f"No odds were scraped for season {season}.")
+        odds = odds.assign(season=season)
+
+    if gameweeks is None:
+        gameweeks = range(2, 39)
+    tasks = []
+    for gameweek in gameweeks:
+        if odds is None:
+            gw_odds = _neutral_odds(fixtures, gameweek, season)
+        else:
+            gw_odds = odds_for_gameweek(odds, fixtures, gameweek)
+        tasks.append((gameweek, gw_odds))
+
+    settings = {
+        "optimiser": optimiser,
+        "budget": budget,
+        "odds_weight_def": odds_weight_def,
+        "odds_weight_fwd": odds_weight_fwd,
+    }
+    initargs = (season, gw_stats, fixtures, settings)
+
+    processes = processes or os.cpu_count()
+    if processes == 1:
+        _init_worker(*initargs)
+        results = [_run_gameweek(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(
+            processes, initializer=_init_worker, initargs=initargs
+        ) as pool:
+            results = list(pool.map(_run_gameweek, *zip(*tasks)))
+
+    results = pd.DataFrame(results).set_index("gameweek")
+    if "points" in results.columns:
+        results["total_points"] = results["points"].fillna(0).cumsum()
+    return results
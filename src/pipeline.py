@@ -0,0 +1,216 @@
+"""Named stages with declared inputs, run concurrently and memoised on disk."""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+import pandas as pd
+
+
+def _describe(arg):
+    """Stable text for parameters json can't write, classes and functions by name"""
+    if hasattr(arg, "__qualname__"):
+        return f"{arg.__module__}.{arg.__qualname__}"
+    return str(arg)
+
+
+def fingerprint(obj):
+    """Hash of a stage output: frames by their contents, anything else pickled"""
+    digest = hashlib.sha256()
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        digest.update(str(obj.dtypes if obj.ndim == 2 else obj.dtype).encode())
+        if obj.ndim == 2:
+            digest.update(json.dumps(list(map(str, obj.columns))).encode())
+        try:
+            digest.update(pd.util.hash_pandas_object(obj).to_numpy())
+            return digest.hexdigest()
+        except TypeError:  # Unhashable cells such as lists
+            pass
+    digest.update(pickle.dumps(obj))
+    return digest.hexdigest()
+
+
+class Stage:
+    def __init__(self, name, func, inputs=(), params=None, memo=True):
+        """
+        Args:
+            name (str): Name other stages refer to it by.
+            func (Callable): Called with the outputs of `inputs` as keyword
+                arguments by stage name, then `params`.
+            inputs (list, optional): Stages whose outputs it takes.
+            params (dict, optional): Further arguments, part of its fingerprint.
+            memo (bool, optional): Store the output on disk.
+        """
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.params = dict(params or {})
+        self.memo = memo
+
+    def __repr__(self):
+        return f"Stage {self.name} of {self.inputs}"
+
+
+class Pipeline:
+    """
+    A DAG of stages run as soon as their inputs are ready, independent
+    ones side by side on a thread pool.
+
+    A stage's key is a hash of its function, params and the fingerprints
+    of its inputs' outputs. An output stored under that key is reused
+    without running the stage, or loading its inputs. Since keys follow
+    what inputs contain rather than how they were made, a source stage
+    run again that returns the same data leaves everything after it
+    memoised.
+
+    Outputs of stages that aren't memoised count as new on every run.
+    `ran` and `reused` list the stages run and reused by the last run.
+    """
+
+    def __init__(self, path=".cache/pipeline", max_workers=4):
+        """
+        Args:
+            path (str, optional): Directory of memoised outputs. None to not memoise.
+            max_workers (int, optional): Stages run at once.
+        """
+        self.path = Path(path) if path is not None else None
+        self.max_workers = max_workers
+        self.stages = {}
+        self.ran = []
+        self.reused = []
+
+    def add(self, name, func, inputs=(), params=None, memo=True):
+        """Add a stage, see Stage. Returns self so calls can be chained."""
+        missing = [i for i in inputs if i not in self.stages]
+        if missing:
+            raise Exception(f"Stage {name} takes unknown stages {missing}.")
+        if name in self.stages:
+            raise Exception(f"Stage {name} is already in the pipeline.")
+        self.stages[name] = Stage(name, func, inputs, params, memo)
+        return self
+
+    def _needed(self, targets):
+        """Stages the targets depend on, inputs before the stages taking them"""
+        order = []
+
+        def visit(name):
+            if name not in order:
+                for parent in self.stages[name].inputs:
+                    visit(parent)
+                order.append(name)
+
+        for target in targets:
+            visit(target)
+        return order
+
+    def _key(self, stage, fingerprints):
+        digest = hashlib.sha256()
+        digest.update(stage.name.encode())
+        digest.update(_describe(stage.func).encode())
+        digest.update(
+            json.dumps(stage.params, sort_keys=True, default=_describe).encode()
+        )
+        for name in stage.inputs:
+            digest.update(fingerprints[name].encode())
+        return digest.hexdigest()
+
+    def _files(self, key):
+        return self.path / f"{key}.pkl", self.path / f"{key}.json"
+
+    def _lookup(self, key):
+        """Fingerprint of the output stored under `key`, or None"""
+        if self.path is None:
+            return None
+        data, meta = self._files(key)
+        if not (data.exists() and meta.exists()):
+            return None
+        return json.loads(meta.read_text())["fingerprint"]
+
+    def _write(self, file, data):
+        """Write through a temporary file so readers never see half of one"""
+        file.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=file.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, file)
+
+    def _store(self, stage, key, output, digest):
+        data, meta = self._files(key)
+        self._write(data, pickle.dumps(output))
+        self._write(
+            meta, json.dumps({"stage": stage.name, "fingerprint": digest}).encode()
+        )
+
+    def _load(self, key):
+        with open(self._files(key)[0], "rb") as f:
+            return pickle.load(f)
+
+    def _execute(self, stage, key, outputs, keys):
+        """Run a stage, loading memoised inputs it needs"""
+        kwargs = {}
+        for name in stage.inputs:
+            if name not in outputs:
+                outputs[name] = self._load(keys[name])
+            kwargs[name] = outputs[name]
+        output = stage.func(**kwargs, **stage.params)
+        if not stage.memo:
+            # Not stored, so never the same as a stored output
+            return output, os.urandom(16).hex()
+        digest = fingerprint(output)
+        if self.path is not None:
+            self._store(stage, key, output, digest)
+        return output, digest
+
+    def run(self, targets=None, refresh=()):
+        """
+        Run or reuse every stage the targets need.
+
+        Args:
+            targets (list, optional): Stages wanted. The last added by default.
+            refresh (list, optional): Stages to run even if memoised, such
+                as sources whose data may have changed.
+
+        Returns:
+            dict: Output of each target by name.
+        """
+        targets = list(targets) if targets is not None else [list(self.stages)[-1]]
+        pending = self._needed(targets)
+        outputs, keys, fingerprints = {}, {}, {}
+        self.ran, self.reused = [], []
+
+        with ThreadPoolExecutor(self.max_workers) as pool:
+            running = {}
+            while pending or running:
+                for name in list(pending):
+                    stage = self.stages[name]
+                    if any(i not in fingerprints for i in stage.inputs):
+                        continue
+                    pending.remove(name)
+                    keys[name] = self._key(stage, fingerprints)
+                    stored = None
+                    if stage.memo and name not in refresh:
+                        stored = self._lookup(keys[name])
+                    if stored is not None:
+                        fingerprints[name] = stored
+                        self.reused.append(name)
+                        continue
+                    future = pool.submit(
+                        self._execute, stage, keys[name], outputs, keys
+                    )
+                    running[future] = name
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    outputs[name], fingerprints[name] = future.result()
+                    self.ran.append(name)
+
+        return {
+            name: outputs[name] if name in outputs else self._load(keys[name])
+            for name in targets
+        }
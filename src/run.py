@@ -1,26 +1,110 @@
+import datetime
+
+from pipeline import Pipeline
 from scrape.players.process import FPLProcessor
 from scrape.bet.scrape import FutureBetScraper
+from team.cache import ResultCache
+from team.select import DumbOptimiser
 from team.team import Team
 from scrape.combine import BetFPLCombiner
 
 
-def run(season, next_gameweek):
+def player_stats(season, next_gameweek, day):
+    """Stats as scraped on `day`, which only keys the memo"""
+    return FPLProcessor(season, next_gameweek).player_stats
 
-    # Update FPL stats
-    fpl_processor = FPLProcessor(season, next_gameweek)
-    player_stats = fpl_processor.player_stats
 
-    # Update betting
+def win_odds(day):
+    """Odds as scraped on `day`, which only keys the memo"""
     bet_scraper = FutureBetScraper()
     bet_scraper.run_scrape()
-    win_odds = bet_scraper.to_df()
+    return bet_scraper.to_df()
+
 
-    # Combine FPL and betting odds
-    df_next_game = BetFPLCombiner(
-        next_gameweek, win_odds, player_stats
+def next_game(player_stats, win_odds, next_gameweek, **combiner_kwargs):
+    return BetFPLCombiner(
+        next_gameweek, win_odds, player_stats, **combiner_kwargs
     ).prepare_next_gw()
 
-    # Update team choices
-    team = Team(season, next_gameweek, df_next_game)
+
+def pick_team(next_game, season, next_gameweek, picks=None, **team_kwargs):
+    """Pick from next_game, reusing a pick stored under `picks` for the same inputs"""
+    cache = ResultCache(picks) if picks is not None else None
+    team = Team(season, next_gameweek, next_game, cache=cache, **team_kwargs)
     team.pick_xi()
     return team
+
+
+def build_pipeline(
+    season,
+    next_gameweek,
+    optimisation_obj=DumbOptimiser,
+    odds_weight_def=0.6,
+    odds_weight_fwd=0.4,
+    budget=1000,
+    memo=".cache/pipeline",
+    picks=".cache/picks",
+):
+    """
+    The stages of run. FPL stats and odds are scraped side by side and
+    memoised with the combine, so changing only optimiser settings reuses
+    them. The sources are scraped again each day, as data is updated
+    during a gameweek; pass their stages to run's refresh to scrape again
+    sooner. A source that comes back unchanged leaves what follows it
+    memoised.
+
+    The team stage returns a Team, which isn't stored. Its pick is reused
+    from the ResultCache at `picks` when the players and settings are
+    unchanged, and solved again otherwise.
+    """
+    today = str(datetime.date.today())
+    pipeline = Pipeline(memo)
+    pipeline.add(
+        "player_stats",
+        player_stats,
+        params={"season": season, "next_gameweek": next_gameweek, "day": today},
+    )
+    pipeline.add("win_odds", win_odds, params={"day": today})
+    pipeline.add(
+        "next_game",
+        next_game,
+        inputs=["player_stats", "win_odds"],
+        params={
+            "next_gameweek": next_gameweek,
+            "season": season,
+            "odds_weight_def": odds_weight_def,
+            "odds_weight_fwd": odds_weight_fwd,
+        },
+    )
+    pipeline.add(
+        "team",
+        pick_team,
+        inputs=["next_game"],
+        params={
+            "season": season,
+            "next_gameweek": next_gameweek,
+            "optimisation_obj": optimisation_obj,
+            "budget": budget,
+            "picks": picks,
+        },
+        memo=False,
+    )
+    return pipeline
+
+
+def run(season, next_gameweek, refresh=(), **settings):
+    """
+    Pick the team for the next gameweek.
+
+    Args:
+        season (int): Season in FPLScraper.SEASON_MAP.
+        next_gameweek (int): Gameweek to pick for.
+        refresh (list, optional): Stages to run again even if memoised today,
+            e.g. ["player_stats", "win_odds"] to pick up data published since.
+        **settings: Passed to build_pipeline.
+
+    Returns:
+        Team: The picked team.
+    """
+    pipeline = build_pipeline(season, next_gameweek, **settings)
+    return pipeline.run(refresh=refresh)["team"]
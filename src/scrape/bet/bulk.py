@@ -0,0 +1,260 @@
+"""Backfill of historical odds over a date range: concurrent, rate limited and resumable."""
+
+import datetime as dt
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from scrape.bet.scrape import BetScraper, HistoricalBetScraper
+from scrape.bet.stream import FrameSink, stream_odds
+
+# Statuses worth another try, after a wait
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def date_range(start, end, days=1):
+    """YYMMDD dates from start to end inclusive, `days` apart"""
+    first = dt.datetime.strptime(start, "%y%m%d")
+    last = dt.datetime.strptime(end, "%y%m%d")
+    return [
+        (first + dt.timedelta(days=d)).strftime("%y%m%d")
+        for d in range(0, (last - first).days + 1, days)
+    ]
+
+
+class RateLimiter:
+    """Spaces calls to wait() at least 1 / rate seconds apart across threads"""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.lock = threading.Lock()
+        self.next = time.monotonic()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next)
+            self.next = start + self.interval
+        time.sleep(start - now)
+
+
+class BulkOddsFetcher:
+    """
+    Fetches the odds-history snapshot of every date in a range.
+
+    Requests go through one pooled session from a thread pool, no faster
+    than `rate` per second. A 429 or 5xx is tried again after an
+    exponential backoff, or the Retry-After the API sent. Each snapshot is
+    written to `path` as it arrives, so a backfill that stops, by error,
+    interruption or running out of credits, resumes from the dates
+    missing.
+
+    Credits are read from the x-requests-remaining and x-requests-last
+    headers. No date is started that, with those in flight at `cost`
+    credits each, could take this object's spend past `credit_budget` or
+    the account under `reserve`. Retries of a date already started go on,
+    as failed requests aren't charged.
+
+    Responses are streamed to disk as they arrive, and read back a game at
+    a time by to_df, so no snapshot is ever held whole in memory.
+
+    Attributes:
+        credits_used (int): Credits spent through this object.
+        credits_remaining (int): Account credits left, as last reported.
+        requests (int): Requests sent, retries included.
+        stopped (str): Why fetch stopped short, or None.
+    """
+
+    def __init__(
+        self,
+        path=".cache/odds",
+        rate=5,
+        max_workers=4,
+        credit_budget=None,
+        reserve=0,
+        cost=10,
+        retries=4,
+        backoff=1.0,
+        timeout=30,
+    ):
+        """
+        Args:
+            path (str, optional): Directory of fetched snapshots, one JSON file per date.
+            rate (float, optional): Requests per second at most. None for no limit.
+            max_workers (int, optional): Requests in flight at once.
+            credit_budget (int, optional): Credits this object may spend. No limit if not passed.
+            reserve (int, optional): Credits to leave on the account.
+            cost (int, optional): Credits a request is expected to cost, until the API reports it.
+            retries (int, optional): Further tries of a failed request.
+            backoff (float, optional): Seconds before the first retry, doubling after.
+            timeout (float, optional): Seconds to wait for a response.
+        """
+        self.path = Path(path)
+        self.limiter = RateLimiter(rate)
+        self.max_workers = max_workers
+        self.credit_budget = credit_budget
+        self.reserve = reserve
+        self.cost = cost
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.lock = threading.Lock()
+        self.credits_used = 0
+        self.credits_remaining = None
+        self.requests = 0
+        self.in_flight = 0
+        self.stopped = None
+
+    def __repr__(self):
+        return (
+            f"BulkOddsFetcher to {self.path}: {len(self.fetched)} dates,"
+            f" {self.credits_used} credits used, {self.credits_remaining} left."
+        )
+
+    def _file(self, date):
+        return self.path / f"{date}.json"
+
+    @property
+    def fetched(self):
+        """Dates with a snapshot on disk"""
+        return sorted(file.stem for file in self.path.glob("*.json"))
+
+    def _out_of_credits(self):
+        """Why another date can't be afforded, counting those in flight, or None"""
+        committed = (self.in_flight + 1) * self.cost
+        if (
+            self.credit_budget is not None
+            and self.credits_used + committed > self.credit_budget
+        ):
+            return "credit budget spent"
+        if (
+            self.credits_remaining is not None
+            and self.credits_remaining - committed < self.reserve
+        ):
+            return "credits down to the reserve"
+        return None
+
+    def _count(self, response):
+        used = response.headers.get("x-requests-last")
+        remaining = response.headers.get("x-requests-remaining")
+        if used is not None:
+            self.credits_used += int(float(used))
+            self.cost = max(int(float(used)), 1)
+        if remaining is not None:
+            self.credits_remaining = int(float(remaining))
+
+    def _send(self, url):
+        with self.lock:
+            self.requests += 1
+        response = self.session.get(url, timeout=self.timeout, stream=True)
+        with self.lock:
+            self._count(response)
+        return response
+
+    def _get(self, url):
+        """Response to `url`, retrying what can be retried"""
+        for attempt in range(self.retries + 1):
+            self.limiter.wait()
+            try:
+                response = self._send(url)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    return response
+                if attempt == self.retries:
+                    response.raise_for_status()
+                response.close()
+                wait = response.headers.get("Retry-After")
+                if wait is not None:
+                    time.sleep(float(wait))
+                    continue
+            time.sleep(self.backoff * 2**attempt)
+
+    def _write(self, date, response, chunk_size=1 << 16):
+        """Stream the body through a temporary file so a resume never sees half of one"""
+        self.path.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f, response:
+                for chunk in response.iter_content(chunk_size):
+                    f.write(chunk)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        os.replace(tmp, self._file(date))
+
+    def _fetch_one(self, date):
+        """Fetch and write one date, if the credits allow starting it"""
+        with self.lock:
+            self.stopped = self.stopped or self._out_of_credits()
+            if self.stopped:
+                return None
+            self.in_flight += 1
+        try:
+            response = self._get(HistoricalBetScraper(date).odds_endpoint)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+        self._write(date, response)
+        return date
+
+    def fetch(self, start, end=None, days=1):
+        """
+        Fetch the snapshot of every date from start to end not already on disk.
+
+        Args:
+            start (str): First date, YYMMDD.
+            end (str, optional): Last date, YYMMDD. Just start if not passed.
+            days (int, optional): Days between snapshots.
+
+        Returns:
+            list: Dates fetched by this call.
+        """
+        done = set(self.fetched)
+        todo = [d for d in date_range(start, end or start, days) if d not in done]
+        self.stopped = None
+        with ThreadPoolExecutor(self.max_workers) as pool:
+            fetched = list(pool.map(self._fetch_one, todo))
+        return [date for date in fetched if date is not None]
+
+    def load(self, date):
+        """Snapshot of `date` as fetched"""
+        with open(self._file(date)) as f:
+            return json.load(f)
+
+    def to_df(self, dates=None):
+        """
+        Aggregated odds of every game in the snapshots, as BetScraper.to_df
+        with the snapshot time of each row, for backtest.odds_for_gameweek.
+        Each row's season is the one its snapshot was taken in.
+
+        Args:
+            dates (list, optional): Dates to read. Every one fetched by default.
+        """
+        frames = []
+        for date in dates if dates is not None else self.fetched:
+            with open(self._file(date), "rb") as f:
+                sink, meta = stream_odds(f, FrameSink(), name_map=BetScraper.NAME_MAP)
+            odds = sink.frame()
+            if len(odds):
+                # Seasons start in the summer, 2023-24 being season 24
+                snapshot = pd.Timestamp(meta["timestamp"])
+                season = snapshot.year % 100 + int(snapshot.month >= 7)
+                frames.append(odds.assign(snapshot=meta["timestamp"], season=season))
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
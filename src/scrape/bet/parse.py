@@ -0,0 +1,88 @@
+"""Vectorised parse of odds API responses into BetScraper.to_df's frame."""
+
+import numpy as np
+import pandas as pd
+
+# Outcome prices are collected in this order
+OUTCOMES = ["home", "draw", "away"]
+
+
+def flatten(games):
+    """
+    One pass over the games of a response into flat arrays.
+
+    Bookmakers missing one of the three outcomes are left out.
+
+    Args:
+        games (list): Games as the odds API sends them.
+
+    Returns:
+        tuple: Home and away team names per game, and the game index and
+        (home, draw, away) decimal prices of each bookmaker's line.
+    """
+    homes, aways, index, prices = [], [], [], []
+    for g, game in enumerate(games):
+        home, away = game["home_team"], game["away_team"]
+        homes.append(home)
+        aways.append(away)
+        for bookie in game["bookmakers"]:
+            line = {o["name"]: o["price"] for o in bookie["markets"][0]["outcomes"]}
+            try:
+                prices.append((line[home], line["Draw"], line[away]))
+            except KeyError:
+                continue
+            index.append(g)
+    prices = np.array(prices, dtype=float).reshape(-1, len(OUTCOMES))
+    return homes, aways, np.array(index, dtype=np.int64), prices
+
+
+def aggregate(index, prices, n_games):
+    """
+    Margin-free probabilities averaged over each game's bookmakers.
+
+    Each line's implied probabilities are divided by their sum, as
+    Game._adjust_raw_game_odds_for_margin does, then averaged per game
+    with grouped sums. A game without bookmakers gets NaN.
+
+    Returns:
+        np.ndarray: (n_games, 3) home, draw and away probabilities.
+    """
+    implied = 1 / prices
+    implied /= implied.sum(axis=1, keepdims=True)
+    counts = np.bincount(index, minlength=n_games).astype(float)
+    sums = np.stack(
+        [np.bincount(index, implied[:, k], minlength=n_games) for k in range(3)],
+        axis=1,
+    )
+    with np.errstate(invalid="ignore"):
+        return sums / counts[:, None]
+
+
+def odds_frame(games, name_map=None, season=24):
+    """
+    The frame BetScraper.to_df builds from Game objects, from the raw
+    games without any per game pandas work.
+
+    Args:
+        games (list): Games as the odds API sends them.
+        name_map (dict, optional): Team renames, such as BetScraper.NAME_MAP.
+        season (int, optional): Season column.
+
+    Returns:
+        pd.DataFrame: home, away, home_odds, away_odds, draw_odds and season
+        per game.
+    """
+    name_map = name_map or {}
+    homes, aways, index, prices = flatten(games)
+    odds = aggregate(index, prices, len(homes))
+    df = pd.DataFrame(
+        {
+            "home": pd.Series(homes).replace(name_map),
+            "away": pd.Series(aways).replace(name_map),
+            "home_odds": odds[:, 0],
+            "away_odds": odds[:, 2],
+            "draw_odds": odds[:, 1],
+        }
+    )
+    df["season"] = season
+    return df
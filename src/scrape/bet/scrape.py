@@ -1,8 +1,9 @@
 from scrape.bet.game import Game
+from scrape.bet.parse import odds_frame
+from scrape.bet.stream import stream_odds
 
 import numpy as np
 import datetime as dt
-import pandas as pd
 import os
 import requests
 from dotenv import dotenv_values
@@ -53,23 +54,38 @@ class BetScraper(metaclass=ABCMeta):
         self.games.extend(games)
         return games
 
+    def stream_scrape(self, sink=None, batch_size=256, chunk_size=1 << 16):
+        """
+        Scrape without holding the response: games are parsed as the bytes
+        arrive and their aggregated odds written to `sink`, as to_df's rows,
+        a batch at a time. self.games is left empty.
+
+        Args:
+            sink (optional): FrameSink, CsvSink or anything with write(frame)
+                and close(). A FrameSink if not passed.
+            batch_size (int, optional): Games held before they're aggregated.
+            chunk_size (int, optional): Bytes read from the response at a time.
+
+        Returns:
+            tuple: The sink, and the response's fields other than the games.
+        """
+        with requests.get(self.odds_endpoint, stream=True) as r:
+            assert r.ok
+            return stream_odds(
+                r.iter_content(chunk_size),
+                sink,
+                batch_size=batch_size,
+                name_map=BetScraper.NAME_MAP,
+            )
+
     def to_df(self):
         if len(self.games) == 0:
             raise Exception("Run the scrape first")
         else:
-            df = pd.DataFrame.from_dict([game.to_dict() for game in self.games])
-            df = df.replace(
-                {"home_team": BetScraper.NAME_MAP, "away_team": BetScraper.NAME_MAP}
-            )
-            df = df.rename(
-                {
-                    "home_team": "home",
-                    "away_team": "away",
-                },
-                axis=1,
+            # Parsed in bulk from the raw games rather than game by game
+            return odds_frame(
+                [game.game_dict for game in self.games], BetScraper.NAME_MAP
             )
-            df["season"] = 24
-            return df
 
 
 class FutureBetScraper(BetScraper):
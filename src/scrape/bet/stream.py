@@ -0,0 +1,196 @@
+"""Streaming parse of odds payloads, a game at a time, into compact records."""
+
+import codecs
+import json
+from pathlib import Path
+
+import pandas as pd
+
+from scrape.bet.parse import odds_frame
+
+_decoder = json.JSONDecoder()
+
+
+class JSONStream:
+    """
+    Reads JSON values one at a time from chunks of bytes, holding only
+    the text of the value being read.
+    """
+
+    WHITESPACE = " \t\n\r"
+
+    def __init__(self, chunks, chunk_size=1 << 16):
+        """
+        Args:
+            chunks (Iterable): Bytes, or a binary file read `chunk_size` at a time.
+        """
+        if hasattr(chunks, "read"):
+            self.chunks = iter(lambda: chunks.read(chunk_size), b"")
+        else:
+            self.chunks = iter(chunks)
+        self.text = codecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+        self.done = False
+
+    def _more(self):
+        """Append the next chunk, dropping what's been read. False at the end."""
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            self.done = True
+            return False
+        self.buf = self.buf[self.pos :] + self.text.decode(chunk)
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Next character that isn't whitespace, "" at the end"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in self.WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._more():
+                return ""
+
+    def expect(self, chars):
+        char = self.peek()
+        if char == "" or char not in chars:
+            raise Exception(
+                f"Expected one of {chars!r} in the odds payload, got {char!r}."
+            )
+        self.pos += 1
+        return char
+
+    def value(self):
+        """The next whole JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._more():
+                    raise
+                continue
+            # A number at the very end of the buffer may go on in the next chunk
+            if end == len(self.buf) and not self.done and self._more():
+                continue
+            self.pos = end
+            return value
+
+    def items(self):
+        """Values of the array starting here, one at a time"""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(",]") == "]":
+                return
+
+
+def iter_games(chunks, meta=None):
+    """
+    Games of an odds payload, one at a time: a list of games as the odds
+    endpoint sends, or an object with them under "data" as odds-history
+    does. The other fields of such an object are put in `meta`.
+    """
+    stream = JSONStream(chunks)
+    if stream.peek() == "[":
+        yield from stream.items()
+        return
+    stream.expect("{")
+    if stream.peek() == "}":
+        return
+    while True:
+        key = stream.value()
+        stream.expect(":")
+        if key == "data":
+            yield from stream.items()
+        else:
+            value = stream.value()
+            if meta is not None:
+                meta[key] = value
+        if stream.expect(",}") == "}":
+            return
+
+
+class FrameSink:
+    """Keeps the records in memory and joins them into one frame"""
+
+    def __init__(self):
+        self.frames = []
+
+    def write(self, frame):
+        self.frames.append(frame)
+
+    def close(self):
+        pass
+
+    def frame(self):
+        if not self.frames:
+            return pd.DataFrame()
+        return pd.concat(self.frames, ignore_index=True)
+
+
+class CsvSink:
+    """Appends the records to a CSV file on disk"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.file = None
+
+    def write(self, frame):
+        if self.file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.file = open(self.path, "w", newline="")
+            frame.to_csv(self.file, index=False)
+        else:
+            frame.to_csv(self.file, index=False, header=False)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def frame(self):
+        self.close()
+        return pd.read_csv(self.path) if self.path.exists() else pd.DataFrame()
+
+
+def stream_odds(chunks, sink=None, batch_size=256, name_map=None, season=24):
+    """
+    Parse an odds payload a game at a time and write its aggregated odds
+    to `sink` in batches, so only a batch of raw games is ever held.
+
+    Args:
+        chunks (Iterable): Bytes of the payload, e.g. response.iter_content(),
+            or an open binary file.
+        sink (optional): Object with write(frame) and close(). A FrameSink
+            if not passed.
+        batch_size (int, optional): Games parsed together by odds_frame.
+        name_map (dict, optional): Team renames, such as BetScraper.NAME_MAP.
+        season (int, optional): Season column.
+
+    Returns:
+        tuple: The sink, and the payload's fields other than the games.
+    """
+    sink = sink if sink is not None else FrameSink()
+    meta = {}
+    batch = []
+
+    def flush():
+        sink.write(odds_frame(batch, name_map, season))
+        batch.clear()
+
+    try:
+        for game in iter_games(chunks, meta):
+            batch.append(game)
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    finally:
+        sink.close()
+    return sink, meta
@@ -0,0 +1,161 @@
+"""Local cache of downloaded CSV sources, stored as parsed frames."""
+
+import io
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+import requests
+
+try:
+    import pyarrow  # noqa: F401
+except ImportError:  # Frames are pickled instead of written as Parquet
+    pyarrow = None
+
+
+class CacheMiss(FileNotFoundError):
+    """A source read offline that isn't in the cache"""
+
+
+def _describe(arg):
+    """Stable text for read_csv arguments json can't write, functions by name"""
+    if callable(arg):
+        return f"{arg.__module__}.{arg.__qualname__}"
+    return str(arg)
+
+
+class SourceCache:
+    """
+    Keeps each downloaded CSV as a frame on disk, keyed by season and file.
+
+    A copy younger than `max_age` seconds (by the modification time of its
+    metadata) is used without touching the network. An older one is
+    revalidated with its ETag and Last-Modified headers, so an unchanged
+    file costs a 304 rather than a download and parse. If the network
+    can't be reached a stale copy is used. In offline mode the network is
+    never used and a missing source raises CacheMiss.
+
+    Frames are stored as Parquet when pyarrow is installed and pickled
+    otherwise. `hits`, `revalidated` and `downloads` count how each read
+    through this object was served.
+    """
+
+    def __init__(self, path=".cache/sources", max_age=3600, offline=False, timeout=30):
+        self.path = Path(path)
+        self.max_age = max_age
+        self.offline = offline
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.suffix = ".parquet" if pyarrow is not None else ".pkl"
+        self.hits = 0
+        self.revalidated = 0
+        self.downloads = 0
+
+    def __repr__(self):
+        return (
+            f"SourceCache at {self.path}: {self.hits} hits,"
+            f" {self.revalidated} revalidated, {self.downloads} downloads."
+        )
+
+    def _files(self, key):
+        return self.path / f"{key}{self.suffix}", self.path / f"{key}.json"
+
+    def _load(self, file):
+        if pyarrow is not None:
+            return pd.read_parquet(file)
+        return pd.read_pickle(file)
+
+    def _write(self, file, write):
+        """Write through a temporary file so readers never see half of one"""
+        file.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=file.parent, suffix=".tmp")
+        os.close(fd)
+        write(tmp)
+        os.replace(tmp, file)
+
+    def _store(self, key, frame, meta):
+        data, meta_file = self._files(key)
+        if pyarrow is not None:
+            self._write(data, lambda tmp: frame.to_parquet(tmp))
+        else:
+            self._write(data, frame.to_pickle)
+        self._write(meta_file, lambda tmp: Path(tmp).write_text(json.dumps(meta)))
+
+    def cached(self, key):
+        """Metadata of the stored copy of `key`, or None"""
+        data, meta_file = self._files(key)
+        if not (data.exists() and meta_file.exists()):
+            return None
+        return json.loads(meta_file.read_text())
+
+    def age(self, key):
+        """Seconds since `key` was last downloaded or revalidated"""
+        return time.time() - self._files(key)[1].stat().st_mtime
+
+    def read_csv(self, url, key, **kwargs):
+        """
+        Frame of the CSV at `url`, from the cache where it's still valid.
+
+        Args:
+            url (str): Source CSV.
+            key (str): Cache key, e.g. "2023-24/fixtures.csv".
+            **kwargs: Passed to pd.read_csv. A copy read with other
+                arguments is downloaded again.
+
+        Returns:
+            pd.DataFrame: The parsed CSV.
+        """
+        data, meta_file = self._files(key)
+        args = json.dumps(kwargs, sort_keys=True, default=_describe)
+        meta = self.cached(key)
+        if meta is not None and meta.get("args") != args:
+            meta = None
+
+        if meta is not None and (self.offline or self.age(key) < self.max_age):
+            self.hits += 1
+            return self._load(data)
+        if self.offline:
+            raise CacheMiss(f"Offline and {key} is not cached.")
+
+        headers = {}
+        if meta is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+        except requests.RequestException:
+            if meta is None:
+                raise
+            # Stale is better than nothing
+            self.hits += 1
+            return self._load(data)
+
+        if response.status_code == 304 and meta is not None:
+            os.utime(meta_file)
+            self.revalidated += 1
+            return self._load(data)
+        response.raise_for_status()
+
+        frame = pd.read_csv(io.BytesIO(response.content), **kwargs)
+        self._store(
+            key,
+            frame,
+            {
+                "url": url,
+                "args": args,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            },
+        )
+        self.downloads += 1
+        return frame
+
+    def clear(self):
+        for file in self.path.rglob("*"):
+            if file.is_file():
+                file.unlink(missing_ok=True)
@@ -1,6 +1,8 @@
 import numpy as np
 import pandas as pd
 
+from scrape.identity import merge_on_keys
+
 # from connect.db import PostgresConnector
 
 
@@ -42,16 +44,21 @@ class BetFPLCombiner:
         if df_odds["season"].dtype != "int64":
             df_odds["season"] = df_odds["season"].str.slice(start=-2).astype(int)
 
-        next_home_df = next_home_df.merge(
+        # Clubs are joined on their integer keys, so the odds API's spellings match
+        next_home_df = merge_on_keys(
+            next_home_df,
             df_odds,
             left_on=["team_name", "season", "next_opponent_name"],
             right_on=["home", "season", "away"],
+            kinds=["team", None, "team"],
             how="left",
         )
-        next_away_df = next_away_df.merge(
+        next_away_df = merge_on_keys(
+            next_away_df,
             df_odds,
             left_on=["team_name", "season", "next_opponent_name"],
             right_on=["away", "season", "home"],
+            kinds=["team", None, "team"],
             how="left",
         )
         df_next_game = pd.concat([next_home_df, next_away_df])
@@ -114,13 +121,31 @@ class BetFPLCombiner:
 
         return pivot
 
+    @staticmethod
+    def weight_points(
+        positions, scaled_points, agg_win_odds, odds_weight_def, odds_weight_fwd
+    ):
+        """Blend scaled points with win odds. Weights may be scalars or 1d
+        arrays, in which case a (players x weights) matrix is returned."""
+        is_def = np.isin(np.asarray(positions), ["DEF", "GK"])
+        scaled_points = np.asarray(scaled_points, dtype=float)
+        agg_win_odds = np.asarray(agg_win_odds, dtype=float)
+        if np.ndim(odds_weight_def) or np.ndim(odds_weight_fwd):
+            is_def, scaled_points, agg_win_odds = (
+                is_def[:, None],
+                scaled_points[:, None],
+                agg_win_odds[:, None],
+            )
+        weight = np.where(is_def, odds_weight_def, odds_weight_fwd)
+        return (1 - weight) * scaled_points + weight * agg_win_odds
+
     def _weight_points(self, df_next_game):
-        df_next_game["points_weighted"] = np.where(
-            df_next_game.position.isin(["DEF", "GK"]),
-            ((1 - self.odds_weight_def) * df_next_game["scaled_points"])
-            + (self.odds_weight_def * df_next_game["agg_win_odds"]),
-            ((1 - self.odds_weight_fwd) * df_next_game["scaled_points"])
-            + (self.odds_weight_fwd * df_next_game["agg_win_odds"]),
+        df_next_game["points_weighted"] = self.weight_points(
+            df_next_game["position"],
+            df_next_game["scaled_points"],
+            df_next_game["agg_win_odds"],
+            self.odds_weight_def,
+            self.odds_weight_fwd,
         )
         return df_next_game
 
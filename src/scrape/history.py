@@ -0,0 +1,231 @@
+"""Gameweek stats of many seasons on disk, partitioned by season and gameweek."""
+
+import os
+import re
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+import requests
+
+from scrape.players.scrape import FPLScraper
+
+try:
+    import pyarrow  # noqa: F401
+except ImportError:  # Partitions are pickled instead of written as Parquet
+    pyarrow = None
+
+PARTITION = re.compile(r"season=(\d+)")
+PART = re.compile(r"gameweek=(\d+)")
+GAMEWEEKS = 38
+
+
+def concat_partitions(frames):
+    """Concatenate frames keeping category columns as categories. Older
+    seasons lack some columns."""
+    frames = [frame for frame in frames if len(frame)]
+    if not frames:
+        return pd.DataFrame()
+    columns = dict.fromkeys(col for frame in frames for col in frame.columns)
+    for col in columns:
+        having = [frame for frame in frames if col in frame.columns]
+        if not all(isinstance(f[col].dtype, pd.CategoricalDtype) for f in having):
+            continue
+        categories = pd.api.types.union_categoricals(
+            [frame[col] for frame in having], ignore_order=True
+        ).categories
+        for frame in having:
+            frame[col] = frame[col].cat.set_categories(categories)
+    return pd.concat(frames, ignore_index=True)
+
+
+class HistoryStore:
+    """
+    Gameweek stats of any range of seasons, one file per season and gameweek.
+
+    Files are laid out as `season=24/gameweek=07.parquet` (or `.pkl` without
+    pyarrow), so a query on seasons and gameweeks is answered from the file
+    names and only the matching partitions are opened. Column selections
+    are pushed down to the Parquet reader too.
+
+    Rows have the columns and types of FPLScraper.gw_stats, so the result
+    of a read can be set as a scraper's gw_stats. `partitions_read` counts
+    the files opened by reads through this object.
+    """
+
+    def __init__(self, path=".cache/history", cache=None):
+        """
+        Args:
+            path (str, optional): Root of the dataset.
+            cache (SourceCache, optional): Passed to FPLScraper when ingesting.
+        """
+        self.path = Path(path)
+        self.cache = cache
+        self.suffix = ".parquet" if pyarrow is not None else ".pkl"
+        self.partitions_read = 0
+
+    def __repr__(self):
+        return f"HistoryStore at {self.path}: seasons {self.seasons}."
+
+    @property
+    def seasons(self):
+        """Seasons in the store"""
+        if not self.path.exists():
+            return []
+        matches = (PARTITION.fullmatch(d.name) for d in self.path.iterdir())
+        return sorted(int(m.group(1)) for m in matches if m)
+
+    def gameweeks(self, season):
+        """Gameweeks stored for `season`"""
+        return sorted(self._parts(season))
+
+    def _parts(self, season):
+        folder = self.path / f"season={season}"
+        if not folder.exists():
+            return {}
+        parts = {}
+        for file in folder.glob(f"*{self.suffix}"):
+            match = PART.fullmatch(file.name[: -len(self.suffix)])
+            if match:
+                parts[int(match.group(1))] = file
+        return parts
+
+    def _write_part(self, folder, gameweek, rows):
+        file = folder / f"gameweek={gameweek:02d}{self.suffix}"
+        rows = rows.reset_index(drop=True)
+        if pyarrow is not None:
+            rows.to_parquet(file, index=False)
+        else:
+            rows.to_pickle(file)
+        return file
+
+    def _write_season(self, season, gw_stats):
+        """Write a season's partitions to a temporary folder, then swap it in"""
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp = Path(tempfile.mkdtemp(dir=self.path, suffix=".tmp"))
+        for gameweek, rows in gw_stats.groupby("gameweek", observed=True):
+            self._write_part(tmp, gameweek, rows)
+        folder = self.path / f"season={season}"
+        if folder.exists():
+            shutil.rmtree(folder)
+        os.replace(tmp, folder)
+
+    def _write_gameweek(self, season, gameweek, rows):
+        """Write one partition next to its final name, then swap it in, so
+        writing a gameweek again replaces it"""
+        folder = self.path / f"season={season}"
+        folder.mkdir(parents=True, exist_ok=True)
+        tmp = Path(tempfile.mkdtemp(dir=folder, suffix=".tmp"))
+        file = self._write_part(tmp, gameweek, rows)
+        os.replace(file, folder / file.name)
+        tmp.rmdir()
+
+    def _fetch(self, season, gameweek=None):
+        scraper = FPLScraper(season, cache=self.cache)
+        return FPLScraper._combine_gw_stats([scraper._read_gw_stats(season, gameweek)])
+
+    def ingest(self, seasons, refresh=False):
+        """
+        Download the gameweek stats of `seasons` into the store.
+
+        Args:
+            seasons (list): Seasons in FPLScraper.SEASON_MAP.
+            refresh (bool, optional): Download seasons already stored again,
+                e.g. the one being played. Otherwise they're skipped.
+
+        Returns:
+            list: Seasons ingested.
+        """
+        unknown = set(seasons) - set(FPLScraper.SEASON_MAP)
+        if unknown:
+            raise Exception(f"No source for seasons {sorted(unknown)}.")
+        stored = set(self.seasons)
+        todo = [s for s in seasons if refresh or s not in stored]
+        with ThreadPoolExecutor(FPLScraper.MAX_CONNECTIONS) as pool:
+            for season, gw_stats in zip(todo, pool.map(self._fetch, todo)):
+                self._write_season(season, gw_stats)
+        return todo
+
+    def update(self, season, since=None):
+        """
+        Fetch the gameweeks of `season` from the last one stored, each from
+        its own gws/gwN.csv, until one isn't published yet. The last one is
+        fetched again as it may have been stored while it was being played.
+
+        Args:
+            season (int): Season in FPLScraper.SEASON_MAP.
+            since (int, optional): First gameweek to fetch, to write gameweeks
+                already stored again. The last stored by default.
+
+        Returns:
+            list: Gameweeks fetched.
+        """
+        stored = self.gameweeks(season)
+        gameweek = since if since is not None else (stored[-1] if stored else 1)
+        fetched = []
+        while gameweek <= GAMEWEEKS:
+            try:
+                rows = self._fetch(season, gameweek)
+            except (FileNotFoundError, requests.HTTPError):
+                # Not published, or offline and not cached (CacheMiss). A
+                # stored gameweek is kept as it is.
+                if gameweek in stored:
+                    gameweek += 1
+                    continue
+                break
+            self._write_gameweek(season, gameweek, rows)
+            fetched.append(gameweek)
+            gameweek += 1
+        return fetched
+
+    def gw_stats(self, seasons, update=False):
+        """
+        Stats of `seasons` in the order passed, like FPLScraper.gw_stats.
+        Seasons not stored are ingested whole first. Otherwise the store is
+        only read, unless `update` asks for unfinished seasons to be
+        updated over the network first.
+        """
+        self.ingest([s for s in seasons if s not in self.seasons])
+        for season in seasons if update else []:
+            if len(self.gameweeks(season)) < GAMEWEEKS:
+                self.update(season)
+        return concat_partitions([self.read(seasons=[s]) for s in seasons])
+
+    def _load(self, file, columns):
+        self.partitions_read += 1
+        if pyarrow is not None:
+            return pd.read_parquet(file, columns=columns)
+        frame = pd.read_pickle(file)
+        return frame if columns is None else frame[columns]
+
+    def read(self, seasons=None, gameweeks=None, before=None, columns=None):
+        """
+        Rows of the partitions matching every filter passed.
+
+        Args:
+            seasons (list, optional): Seasons to read. All stored by default.
+            gameweeks (list, optional): Gameweeks to read in each season.
+            before (tuple, optional): (season, gameweek) to read strictly
+                before, e.g. what was known going into a gameweek.
+            columns (list, optional): Columns to read. All by default.
+
+        Returns:
+            pd.DataFrame: Matching rows by season and gameweek.
+        """
+        files = []
+        for season in self.seasons:
+            if seasons is not None and season not in seasons:
+                continue
+            for gameweek, file in sorted(self._parts(season).items()):
+                if gameweeks is not None and gameweek not in gameweeks:
+                    continue
+                if before is not None and (season, gameweek) >= tuple(before):
+                    continue
+                files.append(file)
+        return concat_partitions([self._load(file, columns) for file in files])
+
+    def clear(self):
+        if self.path.exists():
+            shutil.rmtree(self.path)
@@ -0,0 +1,389 @@
+"""Integer keys for the clubs and players named differently by each source."""
+
+import json
+import re
+import unicodedata
+from collections import Counter
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from scrape.bet.scrape import BetScraper
+from scrape.players.scrape import GW_RENAMES
+
+UNMATCHED = -1
+FILLER = {"fc", "afc", "and", "the"}
+# Words only left out of a comparison with a name lacking them, so "Luton
+# Town" is "Luton" but "Manchester City" isn't "Manchester United"
+SUFFIXES = {"town", "city", "united", "utd"}
+
+
+def normalise(name):
+    """Lower case ascii words in sorted order without filler like "FC", so
+    "Heung-Min Son" and "Son Heung-min" are the same"""
+    name = unicodedata.normalize("NFKD", str(name))
+    name = name.encode("ascii", "ignore").decode().lower().replace("'", "")
+    words = [w for w in re.findall(r"[a-z0-9]+", name) if w not in FILLER]
+    return " ".join(sorted(words))
+
+
+@lru_cache(maxsize=1 << 16)
+def _words_match(a, b):
+    """Same word give or take a typo, or one a prefix of the other, as
+    "man" of "manchester". Short words like "1" must match exactly."""
+    short, long = sorted([a, b], key=len)
+    if len(short) >= 3 and long.startswith(short):
+        return True
+    # The ratio can't beat this, so most pairs skip the matcher
+    if 2 * len(short) < 0.85 * (len(short) + len(long)):
+        return False
+    return SequenceMatcher(None, a, b).ratio() >= 0.85
+
+
+def _word_score(a, b):
+    """Share of the words of `a` matching a word of `b`"""
+    words, own = b.split(), a.split()
+    return sum(any(_words_match(t, w) for w in words) for t in own) / len(own)
+
+
+@lru_cache(maxsize=1 << 16)
+def _has_suffix(name):
+    return any(_words_match(w, suffix) for w in name.split() for suffix in SUFFIXES)
+
+
+def _strip_suffixes(name):
+    words = [w for w in name.split() if w not in SUFFIXES]
+    return " ".join(words) if words else name
+
+
+def _blocks(word):
+    """Blocks of a word, so a typo in either end still shares one"""
+    return word[:3], word[0] + word[-1]
+
+
+def similarity(a, b):
+    """Closeness in [0, 1] of two normalised names by their words, both
+    ways, e.g. "city man" and "city manchester" score 1"""
+    if not (_has_suffix(a) and _has_suffix(b)):
+        a, b = _strip_suffixes(a), _strip_suffixes(b)
+    return (_word_score(a, b) + _word_score(b, a)) / 2
+
+
+class Registry:
+    """
+    Canonical names with integer keys.
+
+    Aliases are kept by normalised spelling. Each word is blocked on its
+    first three letters and on its first and last. A name not seen before
+    is compared only with the names sharing a block with enough of its
+    words to reach the threshold, and taken as an alias of the closest if
+    it's close enough and clearly closer than the runner up.
+    """
+
+    def __init__(self, threshold=0.8, margin=0.05):
+        self.threshold = threshold
+        self.margin = margin
+        self.names = []
+        self.aliases = {}
+        self.spellings = {}
+        self.blocks = {}
+        self.unmatched = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name, aliases=()):
+        """Key of `name`, added as a canonical name if it's not known"""
+        key = self.aliases.get(normalise(name))
+        if key is None:
+            key = len(self.names)
+            self.names.append(name)
+        for alias in [name, *aliases]:
+            self.alias(alias, key)
+        return key
+
+    def alias(self, alias, key):
+        alias = normalise(alias)
+        self.aliases[alias] = key
+        self.spellings.setdefault(key, set()).add(alias)
+        for word in alias.split():
+            for block in _blocks(word):
+                self.blocks.setdefault(block, set()).add(key)
+        self.unmatched.pop(alias, None)
+
+    def _match(self, name):
+        """Key of the closest known name to an unseen one, or UNMATCHED"""
+        hits = Counter()
+        for word in name.split():
+            hits.update(set().union(*(self.blocks.get(b, ()) for b in _blocks(word))))
+        # Both ways scores average to the threshold only if this one's words
+        # score 2 * threshold - 1, and suffixes may not count
+        needed = (2 * self.threshold - 1) * len(_strip_suffixes(name).split())
+        scores = {}
+        for key, count in hits.items():
+            if count >= needed - 1e-9:
+                scores[key] = max(similarity(name, a) for a in self.spellings[key])
+        ranked = sorted(scores.items(), key=lambda item: -item[1])
+        if not ranked or ranked[0][1] < self.threshold:
+            return UNMATCHED, ranked[0] if ranked else (None, 0)
+        if len(ranked) > 1 and ranked[0][1] - ranked[1][1] < self.margin:
+            return UNMATCHED, ranked[0]
+        return ranked[0][0], ranked[0]
+
+    def keys(self, names, source=None, add_new=False):
+        """
+        Integer keys of `names`, working out each distinct name once.
+
+        Args:
+            names (list): Names as written by a source.
+            source (str, optional): Where the names came from, for the
+                unmatched report.
+            add_new (bool, optional): Add names that match nothing as new
+                canonical names rather than reporting them.
+
+        Returns:
+            np.ndarray: int32 keys, UNMATCHED for names that match nothing.
+        """
+        codes, uniques = pd.factorize(pd.Series(names, dtype=object))
+        keys = np.empty(len(uniques), dtype=np.int32)
+        for i, name in enumerate(uniques):
+            spelling = normalise(name)
+            key = self.aliases.get(spelling)
+            if key is None:
+                key, (guess, score) = self._match(spelling)
+                if key != UNMATCHED:
+                    self.alias(name, key)
+                elif add_new:
+                    key = self.add(name)
+                else:
+                    self.unmatched[spelling] = {
+                        "name": name,
+                        "source": source,
+                        "closest": None if guess is None else self.names[guess],
+                        "score": round(float(score), 3),
+                    }
+            keys[i] = key
+        return np.where(codes >= 0, keys[codes], UNMATCHED).astype(np.int32)
+
+    def to_dict(self):
+        return {"names": self.names, "aliases": self.aliases}
+
+    @classmethod
+    def from_dict(cls, data, **kwargs):
+        registry = cls(**kwargs)
+        registry.names = list(data["names"])
+        for alias, key in data["aliases"].items():
+            registry.alias(alias, key)
+        return registry
+
+
+class IdentityIndex:
+    """
+    Stable integer keys for clubs and players across sources and seasons.
+
+    Clubs are keyed by name. Players are keyed by name too, and their FPL
+    `element` ids, which change every season, are mapped to the same key
+    through it. Names matching nothing get UNMATCHED keys and are listed by
+    `report` rather than silently dropped by a merge.
+    """
+
+    def __init__(self, teams=None, players=None):
+        self.teams = teams if teams is not None else Registry()
+        self.players = players if players is not None else Registry()
+        self.elements = {}
+
+    def __repr__(self):
+        return (
+            f"IdentityIndex of {len(self.teams)} clubs and {len(self.players)}"
+            f" players, {len(self.teams.unmatched) + len(self.players.unmatched)}"
+            " names unmatched."
+        )
+
+    @classmethod
+    def default(cls):
+        """Index of the clubs of every season, with the spellings of FPL and
+        the odds API"""
+        index = cls()
+        aliases = {}
+        for renames in [GW_RENAMES["team"], BetScraper.NAME_MAP]:
+            for alias, name in renames.items():
+                aliases.setdefault(name, []).append(alias)
+        clubs = [
+            "Arsenal",
+            "Aston Villa",
+            "Bournemouth",
+            "Brentford",
+            "Brighton",
+            "Burnley",
+            "Chelsea",
+            "Crystal Palace",
+            "Everton",
+            "Fulham",
+            "Leeds",
+            "Leicester",
+            "Liverpool",
+            "Luton",
+            "Manchester City",
+            "Manchester Utd",
+            "Newcastle",
+            "Norwich",
+            "Nottingham",
+            "Sheffield Utd",
+            "Southampton",
+            "Tottenham",
+            "Watford",
+            "West Brom",
+            "West Ham",
+            "Wolves",
+        ]
+        for club in clubs:
+            index.teams.add(club, aliases.get(club, []))
+        for alias, name in GW_RENAMES["name"].items():
+            index.players.add(name, [alias])
+        return index
+
+    def registry(self, kind):
+        """Registry of "team" or "player" names"""
+        return {"team": self.teams, "player": self.players}[kind]
+
+    def team_keys(self, names, source=None, add_new=False):
+        """int32 keys of club names, UNMATCHED where they match no club
+        unless `add_new`"""
+        return self.teams.keys(names, source, add_new)
+
+    def player_keys(self, names, seasons=None, elements=None, source=None):
+        """
+        int32 keys of players, adding the ones not seen before.
+
+        Args:
+            names (list): Player names.
+            seasons (list, optional): Season of each row, with `elements`.
+            elements (list, optional): FPL element id of each row. The
+                (season, element) pairs are remembered, see element_keys.
+            source (str, optional): Where the names came from.
+        """
+        keys = self.players.keys(names, source, add_new=True)
+        if elements is not None:
+            pairs = pd.DataFrame(
+                {"season": seasons, "element": elements, "key": keys}
+            ).drop_duplicates(["season", "element"], keep="last")
+            self.elements.update(
+                zip(zip(pairs.season.tolist(), pairs.element.tolist()), pairs.key)
+            )
+        return keys
+
+    def element_keys(self, seasons, elements):
+        """int32 player keys of (season, element) pairs seen by player_keys,
+        UNMATCHED for the others"""
+        pairs = zip(np.asarray(seasons).tolist(), np.asarray(elements).tolist())
+        return np.array(
+            [self.elements.get(pair, UNMATCHED) for pair in pairs], dtype=np.int32
+        )
+
+    def report(self):
+        """Names that matched nothing, with the closest known name"""
+        rows = [
+            {"kind": kind, **entry}
+            for kind, registry in [("team", self.teams), ("player", self.players)]
+            for entry in registry.unmatched.values()
+        ]
+        return pd.DataFrame(
+            rows, columns=["kind", "name", "source", "closest", "score"]
+        )
+
+    def save(self, path):
+        data = {
+            "teams": self.teams.to_dict(),
+            "players": self.players.to_dict(),
+            "elements": [[*pair, int(key)] for pair, key in self.elements.items()],
+        }
+        with open(path, "w") as f:
+            json.dump(data, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        index = cls(
+            Registry.from_dict(data["teams"]), Registry.from_dict(data["players"])
+        )
+        index.elements = {(s, e): key for s, e, key in data["elements"]}
+        return index
+
+
+@lru_cache(maxsize=None)
+def default_index():
+    """IdentityIndex.default shared by the pipeline's merges"""
+    return IdentityIndex.default()
+
+
+def _respell(names, keys, trusted_names, trusted_keys):
+    """`names` with those whose key is on the trusted side spelled as there"""
+    spelling = pd.Series(trusted_names.to_numpy(), index=trusted_keys)
+    spelling = spelling[(spelling.index != UNMATCHED) & ~spelling.index.duplicated()]
+    respelled = spelling.reindex(keys).to_numpy()
+    return names.mask(pd.notna(respelled), respelled)
+
+
+def merge_on_keys(
+    left, right, left_on, right_on, kinds, new="left", identity=None, **kwargs
+):
+    """
+    pd.merge on integer keys in place of name columns.
+
+    Name columns of `kinds` "team" or "player" are swapped for their keys
+    in a copy of each side's join columns, the frames merged on those and
+    the key columns dropped again. Other join columns are used as they are.
+    The other side's names matching one of the trusted side are written as
+    the trusted side spells it, so the merged name columns of both sides
+    can be compared.
+
+    Unseen names on the `new` side, the one whose names are trusted, are
+    added to the index. On the other side names matching nothing are
+    reported by the index and their rows can't join, as their UNMATCHED
+    key is never on the trusted side.
+
+    Args:
+        left_on (list): Join columns of left.
+        right_on (list): Join columns of right, lined up with left_on.
+        kinds (list): "team" for a club name column, "player" for a player
+            name column, None for any other.
+        new (str, optional): "left" or "right", the side defining the names.
+        identity (IdentityIndex, optional): default_index() if not passed.
+        **kwargs: Passed to pd.merge.
+    """
+    identity = identity if identity is not None else default_index()
+    left_keys, right_keys, added = [], [], []
+    for i, kind in enumerate(kinds):
+        if kind is None:
+            left_keys.append(left_on[i])
+            right_keys.append(right_on[i])
+            continue
+        key = f"_{left_on[i]}_key"
+        # The trusted side first, so the other can match the names it adds.
+        # The other's matched names are then spelled as the trusted side's,
+        # so merged name columns compare equal to the trusted ones.
+        left_names, right_names = left[left_on[i]], right[right_on[i]]
+        registry = identity.registry(kind)
+        if new == "left":
+            left_key = registry.keys(left_names, "left", add_new=True)
+            right_key = registry.keys(right_names, "right")
+            right_names = _respell(right_names, right_key, left_names, left_key)
+            right = right.assign(**{right_on[i]: right_names})
+        else:
+            right_key = registry.keys(right_names, "right", add_new=True)
+            left_key = registry.keys(left_names, "left")
+            left_names = _respell(left_names, left_key, right_names, right_key)
+            left = left.assign(**{left_on[i]: left_names})
+        left = left.assign(**{key: left_key})
+        right = right.assign(**{key: right_key})
+        if left_on[i] == right_on[i]:
+            # Joined on the same column, so it's kept once as on a plain merge
+            right = right.drop(columns=right_on[i])
+        left_keys.append(key)
+        right_keys.append(key)
+        added.append(key)
+    merged = left.merge(right, left_on=left_keys, right_on=right_keys, **kwargs)
+    return merged.drop(columns=added)
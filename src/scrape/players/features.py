@@ -0,0 +1,169 @@
+"""Rolling per-player aggregates for every gameweek, from one pass over the stats."""
+
+import numpy as np
+import pandas as pd
+
+from scrape.identity import default_index
+
+# Gameweeks given to a season on the timeline, more if a season ran longer
+SEASON_LENGTH = 38
+
+
+class FeatureStore:
+    """
+    Per-player aggregates of the gameweeks before any (season, gameweek).
+
+    The stats are laid on one timeline of gameweeks running across
+    seasons, and per player prefix sums of points, minutes, ICT and games
+    are taken along it once, along with the row last played before each
+    gameweek. The aggregates over any window before any gameweek are then
+    a difference of two columns of those, so a lookup costs O(players)
+    whatever the window. A player's rows are joined across seasons by
+    their key in the identity index, so a respelled name stays one player.
+
+    Attributes:
+        names (pd.Index): Players as last spelled, in the order of the arrays' rows.
+        offsets (dict): Timeline position of gameweek 1 of each season.
+    """
+
+    SUMS = ["total_points", "minutes", "ict_index"]
+    LAST = ["team_name", "value", "position", "team_id", "element"]
+    COLUMNS = ["name", "total_points", "team_name", "value", "ict_index", "minutes"]
+    COLUMNS += ["position", "team_id", "element"]
+
+    def __init__(self, gw_stats, window=30, identity=None):
+        """
+        Args:
+            gw_stats (pd.DataFrame): FPLScraper.gw_stats, of any seasons.
+            window (int, optional): Gameweeks looked back by default.
+            identity (IdentityIndex, optional): default_index() if not passed.
+        """
+        identity = identity if identity is not None else default_index()
+        self.window = window
+        seasons = gw_stats["season"].astype(int)
+        spans = gw_stats["gameweek"].groupby(seasons).max().clip(lower=SEASON_LENGTH)
+        starts = np.concatenate([[0], spans.cumsum().to_numpy()[:-1]])
+        self.offsets = dict(zip(spans.index, starts.tolist()))
+        self.n_times = int(spans.sum())
+
+        times = seasons.map(self.offsets).to_numpy() + gw_stats["gameweek"] - 1
+        order = np.argsort(times.to_numpy(), kind="stable")
+        self.rows = gw_stats.iloc[order].reset_index(drop=True)
+        times = times.to_numpy()[order]
+        elements = self.rows["element"] if "element" in self.rows else None
+        keys = identity.player_keys(
+            self.rows["name"], seasons.to_numpy()[order], elements, "fpl"
+        )
+        codes, _ = pd.factorize(keys)
+        self.names = pd.Index(self.rows["name"].groupby(codes).last().to_numpy())
+        n_players = len(self.names)
+        cells = codes * self.n_times + times
+
+        def prefix(weights=None):
+            """(players, times + 1) sums of everything before each time"""
+            counts = np.bincount(cells, weights, minlength=n_players * self.n_times)
+            out = np.zeros((n_players, self.n_times + 1))
+            np.cumsum(counts.reshape(n_players, self.n_times), axis=1, out=out[:, 1:])
+            return out
+
+        self._games = prefix()
+        self._sums = {
+            col: prefix(self.rows[col].to_numpy(dtype=float)) for col in self.SUMS
+        }
+
+        # Row last played (where the column is known) up to each time
+        self._last = {}
+        for col in self.LAST:
+            if col not in self.rows.columns:
+                continue
+            known = self.rows[col].notna().to_numpy()
+            last = np.full(n_players * self.n_times, -1)
+            np.maximum.at(last, cells[known], np.flatnonzero(known))
+            self._last[col] = np.maximum.accumulate(
+                last.reshape(n_players, self.n_times), axis=1
+            )
+
+    def __repr__(self):
+        return (
+            f"FeatureStore of {len(self.names)} players over {self.n_times}"
+            f" gameweeks of seasons {list(self.offsets)}."
+        )
+
+    def time(self, season, gameweek):
+        """Position of a gameweek on the timeline, clipped to its ends"""
+        if season in self.offsets:
+            time = self.offsets[season] + gameweek - 1
+        else:
+            time = self.n_times if season > max(self.offsets) else 0
+        return int(np.clip(time, 0, self.n_times))
+
+    def _window(self, times, window):
+        """Aggregates of every player over the window before each of `times`,
+        as (players, len(times)) arrays"""
+        times = np.asarray(times)
+        starts = np.clip(times - window, 0, None)
+        games = self._games[:, times] - self._games[:, starts]
+        sums = {
+            col: prefix[:, times] - prefix[:, starts]
+            for col, prefix in self._sums.items()
+        }
+        last = {
+            col: np.where(times > 0, rows[:, np.clip(times - 1, 0, None)], -1)
+            for col, rows in self._last.items()
+        }
+        return games, sums, last
+
+    def _frame(self, players, times, games, sums, last):
+        """Rows of the aggregates at (players, times) positions"""
+        frame = pd.DataFrame({"name": self.names.take(players)})
+        for col in ["total_points", "minutes"]:
+            frame[col] = sums[col][players, times].astype(np.int64)
+        frame["ict_index"] = sums["ict_index"][players, times] / games[players, times]
+        for col, rows in last.items():
+            # -1, never known for the player, comes out missing
+            values = self.rows[col].reindex(rows[players, times])
+            frame[col] = values.reset_index(drop=True)
+        return frame[[col for col in self.COLUMNS if col in frame]]
+
+    def features(self, season, gameweek, window=None):
+        """
+        Aggregates of each player who played in the `window` gameweeks
+        before `gameweek` of `season`, like FPLProcessor's collapsed stats:
+        points and minutes summed, ICT averaged and the rest as last played.
+
+        Args:
+            season (int): Season of the gameweek.
+            gameweek (int): Gameweek the stats lead up to, not included.
+            window (int, optional): Gameweeks looked back. self.window by default.
+
+        Returns:
+            pd.DataFrame: One row per player.
+        """
+        window = self.window if window is None else window
+        games, sums, last = self._window([self.time(season, gameweek)], window)
+        players = np.flatnonzero(games[:, 0] > 0)
+        frame = self._frame(players, np.zeros_like(players), games, sums, last)
+        frame["season"] = season
+        frame["next_gw"] = gameweek
+        return frame
+
+    def rolling(self, window=None):
+        """
+        features for every (season, gameweek) on the timeline at once.
+
+        Returns:
+            pd.DataFrame: One row per player and gameweek they had played
+            in the window before.
+        """
+        window = self.window if window is None else window
+        seasons = np.repeat(
+            list(self.offsets), np.diff([*self.offsets.values(), self.n_times])
+        )
+        times = np.arange(self.n_times)
+        gameweeks = times - np.array([self.offsets[s] for s in seasons]) + 1
+        games, sums, last = self._window(times, window)
+        players, columns = np.nonzero(games > 0)
+        frame = self._frame(players, columns, games, sums, last)
+        frame["season"] = seasons[columns]
+        frame["next_gw"] = gameweeks[columns]
+        return frame
@@ -1,18 +1,23 @@
 import pandas as pd
+from scrape.identity import merge_on_keys
+from scrape.players.features import FeatureStore
 from scrape.players.scrape import FPLScraper
 
 
 # TODO: This shouldn't be a class really, just a function
 class FPLProcessor:
-    def __init__(self, season, next_gameweek):
+    def __init__(self, season, next_gameweek, scraper=None, features=None):
 
         # Inputs
         self.season = season
         self.gameweek = next_gameweek
 
-        # Scraper
-        self.scraper = FPLScraper(season)
-        self.scraper.run_scrape()
+        # Scraper, pass one that has already been run to reuse its data.
+        # Otherwise one is run when its data is first needed.
+        self.scraper = scraper
+
+        # Rolling player stats, pass a FeatureStore to share one across gameweeks
+        self.features = features
 
         # Data
         self.fixtures = pd.DataFrame()
@@ -20,6 +25,17 @@ class FPLProcessor:
         self.next_fixtures = pd.DataFrame()
         self.gameweek_dates = pd.DataFrame()
 
+    @property
+    def scraper(self):
+        if self._scraper is None:
+            self._scraper = FPLScraper(self.season)
+            self._scraper.run_scrape()
+        return self._scraper
+
+    @scraper.setter
+    def scraper(self, val):
+        self._scraper = val
+
     @staticmethod
     def _process_fixtures(fixtures_raw):
         fixtures_1 = fixtures_raw[["home", "away", "game_date", "gameweek"]]
@@ -47,58 +63,35 @@ class FPLProcessor:
     def fixtures(self, f):
         self._fixtures = f
 
+    @property
+    def features(self):
+        if self._features is None:
+            self._features = FeatureStore(self.scraper.gw_stats)
+        return self._features
+
+    @features.setter
+    def features(self, val):
+        self._features = val
+
     def _collapse_past_games(self, games_window=30):
-        """Collapse gameweek by gameweek stats until the latest gw"""
-
-        current_gw = self.gameweek - 1
-        next_gw = self.gameweek
-        season = int(self.season)
-
-        df = self.scraper.gw_stats
-        df["season"] = df["season"].astype(int)
-
-        df = df.reset_index(drop=True)
-        if current_gw < 5:
-            df = df[
-                (
-                    (df["GW"] < current_gw)
-                    & (df["GW"] > current_gw - games_window)
-                    & (df["season"] == season)
-                )
-                | (
-                    (df["GW"] > current_gw + 38 - games_window)
-                    & (df["season"] == season - 1)
-                )
-            ]
-        else:
-            df = df[(df["season"] == season)]
-
-        df = df.groupby(["name"]).agg(
-            {
-                "total_points": "sum",
-                "team_name": "last",
-                "value": "last",
-                "ict_index": "mean",
-                "minutes": "sum",
-                "position": "last",
-                "team_id": "last",
-                "element": "last",
-            }
+        """Player stats over the games_window gameweeks before the next one"""
+        return self.features.features(
+            int(self.season), self.gameweek, window=games_window
         )
 
-        df["season"] = season
-        df = df.reset_index()
-        df["next_gw"] = next_gw
-        return df
-
     def _sum_player_stats(self):
 
         fixtures_gw = self.fixtures[self.fixtures["gameweek"] == self.gameweek]
         gw_stats_collapsed = self._collapse_past_games(games_window=30)
 
         gw_stats_collapsed = gw_stats_collapsed.rename(columns={"team_name": "team"})
-        players = gw_stats_collapsed.merge(
-            fixtures_gw, left_on="team", right_on="team_name", how="left"
+        players = merge_on_keys(
+            gw_stats_collapsed,
+            fixtures_gw,
+            left_on=["team"],
+            right_on=["team_name"],
+            kinds=["team"],
+            how="left",
         )
         players = players.drop("team_name", axis=1)
 
@@ -1,4 +1,72 @@
+import io
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+# Columns of merged_gw.csv that are kept, with compact types. Older seasons
+# lack some of them.
+GW_DTYPES = {
+    "name": "category",
+    "position": "category",
+    "team": "category",
+    "kickoff_time": "category",
+    "GW": "int8",
+    "element": "int16",
+    "assists": "int8",
+    "bps": "int16",
+    "goals_scored": "int8",
+    "minutes": "int16",
+    "opponent_team": "int8",
+    "selected": "int32",
+    "team_a_score": "float32",
+    "team_h_score": "float32",
+    "total_points": "int16",
+    "transfers_balance": "int32",
+    "value": "int16",
+    "was_home": "bool",
+    "creativity": "float32",
+    "ict_index": "float32",
+    "influence": "float32",
+    "threat": "float32",
+}
+
+GW_RENAMES = {
+    "team": {
+        "Man City": "Manchester City",
+        "Man Utd": "Manchester Utd",
+        "Spurs": "Tottenham",
+        "Nott'm Forest": "Nottingham",
+    },
+    "name": {
+        "Son Heung-min": "Heung-Min Son",
+        "João Cancelo": "João Pedro Cavaco Cancelo",
+        "Emerson Leite de Souza Junior": "Emerson Aparecido Leite de Souza Junior",
+    },
+}
+
+
+# Names of 2019-20 and before, e.g. "Aaron_Cresswell_402"
+OLD_NAME = re.compile(r"^(.+?)_\d+$")
+
+
+def _is_gw_column(col):
+    return col in GW_DTYPES
+
+
+def _rename_categories(col, mapping):
+    """Rename the categories of `col`, merging any that end up the same"""
+    renamed = col.cat.categories.map(lambda c: mapping.get(c, c))
+    categories, codes = np.unique(
+        np.asarray(renamed, dtype=object), return_inverse=True
+    )
+    codes = np.where(col.cat.codes >= 0, codes[col.cat.codes], -1)
+    return pd.Series(
+        pd.Categorical.from_codes(codes, categories), index=col.index, name=col.name
+    )
 
 
 class FPLScraper:
@@ -14,31 +82,58 @@ class FPLScraper:
         20: "2019-20",
         19: "2018-19",
     }
+    MAX_CONNECTIONS = 4
+    TIMEOUT = 60
 
-    def __init__(self, season):
+    def __init__(self, season, cache=None, history=None):
+        """
+        Args:
+            season (int): Season in SEASON_MAP.
+            cache (SourceCache, optional): Local copies of the source CSVs. Every read downloads if not passed.
+            history (HistoryStore, optional): Store the gameweek stats are read from, fetching only gameweeks it doesn't have yet. merged_gw.csv is downloaded whole if not passed.
+        """
         self.season = season
+        self.cache = cache
+        self.history = history
+        self.session = None
         self.team_ids = pd.DataFrame()
         self.fixtures = pd.DataFrame()
         self.gw_stats = pd.DataFrame()
 
+    def _get_session(self):
+        """One session for every download so connections are reused"""
+        if self.session is None:
+            self.session = requests.Session()
+            adapter = HTTPAdapter(pool_maxsize=FPLScraper.MAX_CONNECTIONS)
+            self.session.mount("http://", adapter)
+            self.session.mount("https://", adapter)
+        return self.session
+
+    def _read_csv(self, season, file, **kwargs):
+        """Read a source CSV for a season, or of every season if season is
+        None, through the cache if there is one"""
+        source = file if season is None else f"{FPLScraper.SEASON_MAP[season]}/{file}"
+        url = f"{FPLScraper.BASE_URL}/{source}"
+        if self.cache is not None:
+            return self.cache.read_csv(url, source, **kwargs)
+        if not url.startswith(("http://", "https://")):
+            return pd.read_csv(url, **kwargs)
+        response = self._get_session().get(url, timeout=FPLScraper.TIMEOUT)
+        response.raise_for_status()
+        return pd.read_csv(io.BytesIO(response.content), **kwargs)
+
+    @staticmethod
+    def _format_team_ids(team_ids):
+        team_ids = team_ids.rename(columns={"name": "team", "id": "team_id"})
+        team_ids = team_ids.replace({"team": GW_RENAMES["team"]})
+        return team_ids
+
     @property
     def team_ids(self):
         if self._team_ids.empty:
-            team_ids = pd.read_csv(
-                f"{FPLScraper.BASE_URL}/{FPLScraper.SEASON_MAP[self.season]}/teams.csv"
+            self._team_ids = self._format_team_ids(
+                self._read_csv(self.season, "teams.csv")
             )
-            team_ids = team_ids.rename(columns={"name": "team", "id": "team_id"})
-            team_ids = team_ids.replace(
-                {
-                    "team": {
-                        "Man City": "Manchester City",
-                        "Man Utd": "Manchester Utd",
-                        "Spurs": "Tottenham",
-                        "Nott'm Forest": "Nottingham",
-                    }
-                }
-            )
-            self._team_ids = team_ids
         return self._team_ids
 
     @team_ids.setter
@@ -83,9 +178,7 @@ class FPLScraper:
     @property
     def fixtures(self):
         if self._fixtures.empty:
-            fixtures = pd.read_csv(
-                f"{FPLScraper.BASE_URL}/{FPLScraper.SEASON_MAP[self.season]}/fixtures.csv"
-            )
+            fixtures = self._read_csv(self.season, "fixtures.csv")
             self._fixtures = self._format_fixtures(fixtures)
         return self._fixtures
 
@@ -93,71 +186,92 @@ class FPLScraper:
     def fixtures(self, val):
         self._fixtures = val
 
-    def _get_gw_stats(self):
-        gw_stats_current = pd.read_csv(
-            f"{FPLScraper.BASE_URL}/{FPLScraper.SEASON_MAP[self.season]}/gws/merged_gw.csv"
+    def _read_gw_stats(self, season, gameweek=None):
+        """Stats of a season from merged_gw.csv, or of one gameweek from its
+        gws/gwN.csv, which has no GW column"""
+        file = "gws/merged_gw.csv" if gameweek is None else f"gws/gw{gameweek}.csv"
+        gw_stats = self._read_csv(season, file, usecols=_is_gw_column, dtype=GW_DTYPES)
+        if gameweek is not None:
+            gw_stats["GW"] = np.int8(gameweek)
+        gw_stats["season"] = np.int8(season)
+
+        # Names and dates are normalised once per distinct value
+        if "kickoff_time" in gw_stats:
+            kickoff = gw_stats["kickoff_time"]
+            days = pd.to_datetime(kickoff.cat.categories).tz_localize(None).normalize()
+            gw_stats["kickoff_time"] = days.take(kickoff.cat.codes)
+        if "team" not in gw_stats:
+            gw_stats["team"] = self._derive_teams(season, gw_stats)
+        old = {
+            c: OLD_NAME.sub(r"\1", c).replace("_", " ")
+            for c in gw_stats["name"].cat.categories
+        }
+        gw_stats["name"] = _rename_categories(gw_stats["name"], old)
+        for col in ["team", "name"]:
+            gw_stats[col] = _rename_categories(gw_stats[col], GW_RENAMES[col])
+        return gw_stats
+
+    def _derive_teams(self, season, gw_stats):
+        """
+        Club of each row of a season whose stats have no team column, as
+        before 2020-21: the other side of the fixture against
+        opponent_team that day, named from master_team_list.csv.
+        """
+        fixtures = self._read_csv(season, "fixtures.csv")
+        day = (
+            pd.to_datetime(fixtures["kickoff_time"]).dt.tz_localize(None).dt.normalize()
+        )
+        home = pd.DataFrame(
+            {
+                "day": day,
+                "opponent_team": fixtures["team_a"],
+                "was_home": True,
+                "team_id": fixtures["team_h"],
+            }
         )
-        gw_stats_previous = pd.read_csv(
-            f"{FPLScraper.BASE_URL}/{FPLScraper.SEASON_MAP[self.season-1]}/gws/merged_gw.csv"
+        away = home.assign(
+            opponent_team=fixtures["team_h"], was_home=False, team_id=fixtures["team_a"]
         )
+        rows = pd.DataFrame(
+            {
+                "day": gw_stats["kickoff_time"].to_numpy(),
+                "opponent_team": gw_stats["opponent_team"].to_numpy(dtype=np.int64),
+                "was_home": gw_stats["was_home"].to_numpy(),
+            }
+        )
+        team_ids = rows.merge(
+            pd.concat([home, away]), how="left", on=["day", "opponent_team", "was_home"]
+        )["team_id"]
 
-        gw_stats_current["season"] = self.season
-        gw_stats_previous["season"] = self.season - 1
+        teams = self._read_csv(None, "master_team_list.csv")
+        teams = teams[teams["season"] == FPLScraper.SEASON_MAP[season]]
+        names = team_ids.map(teams.set_index("team")["team_name"])
+        return pd.Categorical(names.to_numpy(dtype=object))
 
-        gw_stats = pd.concat([gw_stats_current, gw_stats_previous])
-        gw_stats["team_id"] = 99
+    @staticmethod
+    def _combine_gw_stats(frames):
+        for col in ["team", "name"]:
+            categories = pd.api.types.union_categoricals(
+                [gw_stats[col] for gw_stats in frames]
+            ).categories
+            for gw_stats in frames:
+                gw_stats[col] = gw_stats[col].cat.set_categories(categories)
+
+        gw_stats = pd.concat(frames, ignore_index=True)
+        gw_stats["team_id"] = np.int8(99)
         gw_stats = gw_stats.rename(
             columns={"team": "team_name", "GW": "gameweek", "kickoff_time": "game_date"}
         )
-
-        MAP_ = {
-            "team_name": {
-                "Man City": "Manchester City",
-                "Man Utd": "Manchester Utd",
-                "Spurs": "Tottenham",
-                "Nott'm Forest": "Nottingham",
-            },
-            "name": {
-                "Son Heung-min": "Heung-Min Son",
-                "João Cancelo": "João Pedro Cavaco Cancelo",
-                "Emerson Leite de Souza Junior": "Emerson Aparecido Leite de Souza Junior",
-            },
-        }
-
-        gw_stats = gw_stats.replace(MAP_)
-        gw_stats["game_date"] = pd.to_datetime(gw_stats["game_date"]).dt.date
-        gw_stats["game_date"] = pd.to_datetime(gw_stats["game_date"])
-        # gw_stats = gw_stats.rename(columns={'team_name': 'team' })  # ADDED from Team._sum_player_stats()
-        NEEDED_COLS = [
-            "gameweek",
-            "assists",
-            "bps",
-            "creativity",
-            "element",
-            "goals_scored",
-            "ict_index",
-            "influence",
-            "minutes",
-            "name",
-            "opponent_team",
-            "position",
-            "season",
-            "selected",
-            "team_a_score",
-            "team_h_score",
-            "team_id",
-            "team_name",
-            "threat",
-            "total_points",
-            "transfers_balance",
-            "value",
-            "was_home",
-            "game_date",
-        ]
-
-        gw_stats = gw_stats[[col for col in gw_stats.columns if col in NEEDED_COLS]]
         return gw_stats
 
+    def _get_gw_stats(self):
+        seasons = [self.season, self.season - 1]
+        if self.history is not None:
+            return self.history.gw_stats(seasons, update=True)
+        return self._combine_gw_stats(
+            [self._read_gw_stats(season) for season in seasons]
+        )
+
     @property
     def gw_stats(self):
         if self._gw_stats.empty:
@@ -168,6 +282,34 @@ class FPLScraper:
     def gw_stats(self, val):
         self._gw_stats = val
 
+    def prefetch(self):
+        """
+        Download and parse every source of the season at once: teams,
+        fixtures and both seasons of gameweek stats. Each is read on its
+        own thread over the pooled session, so this takes about as long as
+        the slowest file. Results are set on the usual properties.
+
+        Returns:
+            FPLScraper: self.
+        """
+        with ThreadPoolExecutor(FPLScraper.MAX_CONNECTIONS) as pool:
+            teams = pool.submit(self._read_csv, self.season, "teams.csv")
+            fixtures = pool.submit(self._read_csv, self.season, "fixtures.csv")
+            if self.history is not None:
+                gw_stats = pool.submit(self._get_gw_stats)
+            else:
+                gw_stats = [
+                    pool.submit(self._read_gw_stats, season)
+                    for season in [self.season, self.season - 1]
+                ]
+            self.team_ids = self._format_team_ids(teams.result())
+            self.fixtures = self._format_fixtures(fixtures.result())
+            if self.history is not None:
+                self.gw_stats = gw_stats.result()
+            else:
+                self.gw_stats = self._combine_gw_stats([f.result() for f in gw_stats])
+        return self
+
     def run_scrape(self):
-        self.gw_stats = self._get_gw_stats()
+        self.prefetch()
         return self.gw_stats
@@ -0,0 +1,99 @@
+"""Disk cache of picked teams keyed by a hash of the inputs to the pick."""
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+
+class ResultCache:
+    """
+    Least recently used store of pick frames, one pickle per key.
+
+    Recency is the file modification time, refreshed on every hit, so the
+    order survives restarts and is shared by processes using the same
+    directory. `hits` and `misses` count lookups made through this object.
+    """
+
+    def __init__(self, path=".cache/picks", max_entries=256):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def __repr__(self):
+        return (
+            f"ResultCache at {self.path}: {len(self)} entries,"
+            f" {self.hits} hits, {self.misses} misses."
+        )
+
+    def __len__(self):
+        return len(self._entries())
+
+    @staticmethod
+    def key(selector):
+        """
+        Hash of the optimiser's players and its parameters.
+
+        Every column counts, not just those the optimiser reads, as the
+        stored pick carries them all and a hit must not bring back stale
+        names or odds.
+
+        Args:
+            selector (Optimiser): Optimiser about to pick.
+
+        Returns:
+            str: Hex digest identifying the pick.
+        """
+        df = selector.player_df
+        digest = hashlib.sha256()
+        digest.update(json.dumps(list(map(str, df.columns))).encode())
+        digest.update(str(df.dtypes.tolist()).encode())
+        digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy())
+        digest.update(
+            json.dumps(selector.cache_params(), sort_keys=True, default=str).encode()
+        )
+        return digest.hexdigest()
+
+    def _file(self, key):
+        return self.path / f"{key}.pkl"
+
+    def _entries(self):
+        return list(self.path.glob("*.pkl"))
+
+    def get(self, key):
+        """Stored frame for `key`, or None on a miss"""
+        file = self._file(key)
+        try:
+            frame = pd.read_pickle(file)
+        except (FileNotFoundError, EOFError):
+            self.misses += 1
+            return None
+        os.utime(file)
+        self.hits += 1
+        return frame
+
+    def put(self, key, frame):
+        """Store `frame`, evicting the least recently used entries over the bound"""
+        # Written to a temporary file first so readers never see half a pickle
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        os.close(fd)
+        frame.to_pickle(tmp)
+        os.replace(tmp, self._file(key))
+        self._evict()
+
+    def _evict(self):
+        entries = self._entries()
+        excess = len(entries) - self.max_entries
+        if excess <= 0:
+            return
+        for file in sorted(entries, key=lambda f: f.stat().st_mtime)[:excess]:
+            file.unlink(missing_ok=True)
+
+    def clear(self):
+        for file in self._entries():
+            file.unlink(missing_ok=True)
@@ -0,0 +1,253 @@
+"""Season chip calendar by dynamic programming over precomputed squad values."""
+
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from scrape.combine import BetFPLCombiner
+from team.select import DumbOptimiser, Optimiser, best_formation
+
+CHIPS = ["wildcard", "free_hit", "bench_boost", "triple_captain"]
+
+
+def fixture_counts(fixtures, gameweeks=None, teams=None):
+    """
+    Games per club per gameweek, 2 for a double and 0 for a blank.
+
+    Each club's fixtures are pivoted with BetFPLCombiner._shape_double_gameweeks,
+    the same way player rows are, and its games counted from the home
+    columns that come out.
+
+    Args:
+        fixtures (pd.DataFrame): FPLScraper.fixtures.
+        gameweeks (list, optional): Gameweeks to count. All in fixtures by default.
+        teams (list, optional): Clubs to count. All in fixtures by default.
+
+    Returns:
+        pd.DataFrame: Clubs by gameweeks.
+    """
+    if gameweeks is not None:
+        fixtures = fixtures[fixtures.gameweek.isin(gameweeks)]
+    sides = []
+    for side in ["home", "away"]:
+        sides.append(
+            fixtures.assign(
+                team_name=fixtures[side], is_home=side == "home", name=fixtures[side]
+            )
+        )
+    rows = pd.concat(sides).assign(
+        element=lambda df: df.gameweek,
+        total_points=0,
+        value=0,
+        ict_index=0,
+        minutes=0,
+        position="",
+        home_odds=np.nan,
+        draw_odds=np.nan,
+        away_odds=np.nan,
+    )
+    pivot = BetFPLCombiner._shape_double_gameweeks(rows)
+    home = pivot.filter(regex=r"^home\d+$")
+    pivot["games"] = home.notna().sum(axis=1)
+
+    counts = pivot.pivot_table(
+        index="team_name", columns="element", values="games", aggfunc="sum"
+    )
+    gameweeks = (
+        gameweeks if gameweeks is not None else sorted(fixtures.gameweek.unique())
+    )
+    teams = teams if teams is not None else counts.index
+    return counts.reindex(index=teams, columns=gameweeks).fillna(0).astype(int)
+
+
+class ChipPlanner:
+    """
+    Finds the gameweeks to play each chip in.
+
+    Squads are only re-picked by the optimiser at a wildcard or free hit,
+    so the candidate squads are the one held now plus one per possible
+    wildcard week, and every chip's value in every gameweek is worked out
+    from those up front: at most two optimiser solves per gameweek. The
+    calendar is then a dynamic program over (gameweek, chips left, squad
+    held) with memoised subproblems, each step a table lookup.
+
+    Weekly transfers aren't modelled, see TransferPlanner for those. The
+    squad held between wildcards is scored as it is.
+
+    Attributes:
+        values (dict): Points per gameweek by squad label and chip.
+        free_hit (np.ndarray): Points of the best free hit squad per gameweek.
+        squads (dict): Positions in player_df of each squad by label.
+        total_points (float): Projected points of the best calendar.
+        baseline_points (float): Projected points playing no chips.
+    """
+
+    def __init__(
+        self,
+        player_df,
+        projections,
+        squad=None,
+        budget=1000,
+        chips=None,
+        games=None,
+        optimiser=DumbOptimiser,
+        wildcard_horizon=6,
+        season=None,
+        solver_options=None,
+    ):
+        """
+        Args:
+            player_df (pd.DataFrame): Players with name, team_name, position, value and total_points.
+            projections (pd.DataFrame): Projected points indexed like player_df, one column per gameweek left.
+            squad (list, optional): Row labels of the squad held now. Picked for the first weeks if not passed.
+            budget (int, optional): Budget for wildcard and free hit squads.
+            chips (dict, optional): Number of each chip left. One of each by default.
+            games (pd.DataFrame, optional): Games per club per gameweek as from fixture_counts. If passed, projections are per game and scaled by it.
+            optimiser (Type, optional): Optimiser picking the wildcard and free hit squads.
+            wildcard_horizon (int, optional): Gameweeks a wildcard squad is picked for.
+            season (int, optional): Passed on to the optimiser.
+            solver_options (dict, optional): Solve budget for the optimiser.
+        """
+        self.player_df = player_df
+        self.gameweeks = list(projections.columns)
+        points = projections.reindex(player_df.index).fillna(0)
+        if games is not None:
+            per_team = games.reindex(index=player_df.team_name, columns=self.gameweeks)
+            points = points * per_team.fillna(0).to_numpy()
+        self.points = points.to_numpy(dtype=float)
+        self.games = games
+        self.budget = budget
+        self.chips = dict.fromkeys(CHIPS, 1) if chips is None else dict(chips)
+        unknown = set(self.chips) - set(CHIPS)
+        if unknown:
+            raise Exception(f"Unknown chips: {sorted(unknown)}. Chips are {CHIPS}.")
+        self.optimiser = optimiser
+        self.wildcard_horizon = wildcard_horizon
+        self.season = season
+        self.solver_options = solver_options
+
+        xi_limits = Optimiser.POS_CONSTRAINTS["XI"]
+        self._xi_limits = [xi_limits[p] for p in xi_limits]
+        self._pos_codes = np.array(
+            [
+                list(xi_limits).index(p) if p in xi_limits else -1
+                for p in player_df.position
+            ]
+        )
+        self.n_solves = 0
+
+        self.squads = {}
+        if squad is not None:
+            self.squads["held"] = np.flatnonzero(player_df.index.isin(squad))
+        self.values = {}
+        self.free_hit = None
+        self.total_points = None
+        self.baseline_points = None
+
+    def _pick(self, points):
+        """Positions in player_df of the optimiser's squad for `points`"""
+        self.n_solves += 1
+        selector = self.optimiser(
+            self.player_df.assign(points_weighted=points),
+            self.season,
+            budget=self.budget,
+            solver_options=self.solver_options,
+        )
+        return np.flatnonzero(selector.first_xv.picked.to_numpy() == 1)
+
+    def _week_values(self, rows, t):
+        """Points of a squad in gameweek t: as normal, bench boosted and
+        triple captained"""
+        points = self.points[rows, t]
+        starters = best_formation(points, self._pos_codes[rows], self._xi_limits)
+        xi, captain = points[starters].sum(), points[starters].max()
+        return {
+            None: xi + captain,
+            "bench_boost": points.sum() + captain,
+            "triple_captain": xi + 2 * captain,
+        }
+
+    def _precompute(self):
+        n_weeks = len(self.gameweeks)
+        horizon = self.wildcard_horizon
+        # Without a squad the first one is a free pick, so no wildcard in week 0
+        first = 0
+        if "held" not in self.squads:
+            self.squads["held"] = self._pick(self.points[:, :horizon].sum(axis=1))
+            first = 1
+        if self.chips.get("wildcard"):
+            for t in range(first, n_weeks):
+                points = self.points[:, t : t + horizon].sum(axis=1)
+                self.squads[f"wildcard_{self.gameweeks[t]}"] = self._pick(points)
+        self.free_hit = np.zeros(n_weeks)
+        if self.chips.get("free_hit"):
+            for t in range(n_weeks):
+                rows = self._pick(self.points[:, t])
+                self.free_hit[t] = self._week_values(rows, t)[None]
+
+        self.values = {
+            label: [self._week_values(rows, t) for t in range(n_weeks)]
+            for label, rows in self.squads.items()
+        }
+
+    def plan(self):
+        """
+        Best chip calendar over the gameweeks in projections.
+
+        Returns:
+            pd.DataFrame: Per gameweek, the chip played (None for none), the
+            squad held, its projected points and, if games were passed, the
+            clubs with a double or blank.
+        """
+        self._precompute()
+        n_weeks = len(self.gameweeks)
+        names = list(self.chips)
+
+        @lru_cache(maxsize=None)
+        def best(t, left, squad):
+            """Best points from gameweek t on with chips `left` (counts in the
+            order of `names`), and this week's chip, squad, points and chips
+            left after it"""
+            if t == n_weeks:
+                return 0.0, None
+            options = [(self.values[squad][t][None], left, None, squad)]
+            for k, chip in enumerate(names):
+                if not left[k]:
+                    continue
+                after = left[:k] + (left[k] - 1,) + left[k + 1 :]
+                held = squad
+                if chip == "wildcard":
+                    held = f"wildcard_{self.gameweeks[t]}"
+                    if held not in self.values:
+                        continue
+                    points = self.values[held][t][None]
+                elif chip == "free_hit":
+                    points = self.free_hit[t]
+                else:
+                    points = self.values[squad][t][chip]
+                options.append((points, after, chip, held))
+
+            results = []
+            for points, after, chip, held in options:
+                total = points + best(t + 1, after, held)[0]
+                results.append((total, (chip, held, points, after)))
+            return max(results, key=lambda result: result[0])
+
+        left = tuple(self.chips[name] for name in names)
+        squad = "held"
+        calendar = []
+        self.total_points = best(0, left, squad)[0]
+        for t, gameweek in enumerate(self.gameweeks):
+            chip, squad, points, left = best(t, left, squad)[1]
+            calendar.append(
+                {"gameweek": gameweek, "chip": chip, "squad": squad, "points": points}
+            )
+        self.baseline_points = sum(week[None] for week in self.values["held"])
+
+        calendar = pd.DataFrame(calendar).set_index("gameweek")
+        if self.games is not None:
+            games = self.games.reindex(columns=self.gameweeks)
+            calendar["doubles"] = (games > 1).sum().to_numpy()
+            calendar["blanks"] = (games == 0).sum().to_numpy()
+        return calendar
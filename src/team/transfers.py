@@ -0,0 +1,352 @@
+"""Rolling-horizon transfer planning from an existing squad."""
+
+import numpy as np
+import pandas as pd
+
+from team.model import build_transfer_model, get_backend
+from team.select import Optimiser
+
+
+def sell_price(purchase_price, value):
+    """FPL keeps half of any rise, rounded down, and all of any fall"""
+    purchase_price = np.asarray(purchase_price, dtype=float)
+    value = np.asarray(value, dtype=float)
+    return np.where(
+        value > purchase_price,
+        purchase_price + np.floor((value - purchase_price) / 2),
+        value,
+    )
+
+
+class TransferPlanner:
+    """
+    Plans transfers over the next few gameweeks from an existing squad.
+
+    Free transfers, the hit for each extra transfer, the bank and sale
+    prices are all modelled, so a move is only made when the projected
+    points over the horizon pay for it. The model is built once over a
+    fixed set of candidates; `advance` applies a week's transfers, slides
+    the projections along one gameweek and re-solves the same model from
+    the previous plan.
+
+    Solves start from a feasible plan, the previous one or making no
+    transfers, and stop at a 0.5% gap or after 10 s, keeping the best plan
+    found. On 700 players with the default 65-75 candidates, plans and
+    advances over 5 gameweeks took 6-10 s, a third of them stopping at the
+    limit within 2% of the bound. Over 8 gameweeks most stop at the limit,
+    usually within 2% and at worst 5%.
+
+    Attributes:
+        transfers (pd.DataFrame): Planned moves, one row per player in or out.
+        summary (pd.DataFrame): Per gameweek transfers, hits, free transfers,
+            bank and projected points of the squad with its captain.
+        objective_value (float): Projected points less hits over the horizon.
+        solve_info (dict): Status, objective, bound, gap and time of the last solve.
+    """
+
+    def __init__(
+        self,
+        player_df,
+        squad,
+        projections,
+        bank=0,
+        free_transfers=1,
+        purchase_prices=None,
+        hit_cost=4,
+        max_free_transfers=5,
+        discount=1.0,
+        candidates_per_position=12,
+        solver_options=None,
+    ):
+        """
+        Args:
+            player_df (pd.DataFrame): Players with name, team_name, position and value (current price).
+            squad (list): Row labels of player_df in the current squad.
+            projections (pd.DataFrame): Projected points, indexed like player_df, one column per gameweek in the horizon.
+            bank (float, optional): Money in the bank, in the units of value.
+            free_transfers (int, optional): Free transfers available this gameweek.
+            purchase_prices (pd.Series, optional): Price paid per squad player, for sell prices. Current prices by default.
+            hit_cost (float, optional): Cost of each extra transfer, in the units of projections.
+            max_free_transfers (int, optional): Cap on rolled-over free transfers.
+            discount (float, optional): Weight of each gameweek relative to the one before.
+            candidates_per_position (int, optional): Players per position considered for transfers in, by projected points and by points per price.
+            solver_options (dict, optional): Solve budget, see Optimiser. A 0.5% gap and 10 s by default.
+        """
+        self.player_df = player_df
+        self.hit_cost = hit_cost
+        self.max_free_transfers = max_free_transfers
+        self.discount = discount
+        # Plans that differ by moving a transfer a week are near ties, so
+        # proving the last fraction of a point is left out by default
+        self.solver_options = {
+            "mip_gap": 0.005,
+            "time_limit": 10,
+            **(solver_options or {}),
+        }
+
+        self.owned = pd.Index(squad)
+        self.bank = bank
+        self.free_transfers = free_transfers
+        values = player_df.loc[self.owned, "value"]
+        purchase = values if purchase_prices is None else purchase_prices[self.owned]
+        self.sell_prices = pd.Series(sell_price(purchase, values), index=self.owned)
+
+        self.candidates = self._choose_candidates(projections, candidates_per_position)
+        self.gameweeks = list(projections.columns)
+        self.projections = projections.loc[self.candidates]
+        self.backend = None
+        self.solution = None
+        self.objective_value = None
+        self.solve_info = {}
+        self.transfers = pd.DataFrame()
+        self.summary = pd.DataFrame()
+
+    def _choose_candidates(self, projections, per_position):
+        """The squad plus the best players per position by total projection
+        and by projection per unit price"""
+        total = projections.sum(axis=1)
+        per_price = total / self.player_df.loc[projections.index, "value"]
+        positions = self.player_df.loc[projections.index, "position"]
+        keep = set(self.owned)
+        for _, rows in total.groupby(positions).groups.items():
+            keep.update(total[rows].nlargest(per_position).index)
+            keep.update(per_price[rows].nlargest(per_position // 2).index)
+        return pd.Index([i for i in projections.index if i in keep])
+
+    def _state(self):
+        """Week 0 inputs that change as the horizon slides"""
+        owned = self.candidates.isin(self.owned).astype(float)
+        prices = self.player_df.loc[self.candidates, "value"].to_numpy(dtype=float)
+        sell_prices = self.sell_prices.reindex(self.candidates).to_numpy()
+        return owned, np.where(np.isnan(sell_prices), prices, sell_prices)
+
+    def _get_backend(self):
+        if self.backend is None:
+            owned, sell_prices = self._state()
+            df = self.player_df.loc[self.candidates]
+            model = build_transfer_model(
+                self.projections.to_numpy(dtype=float),
+                df.value.to_numpy(dtype=float),
+                sell_prices,
+                df.position.to_numpy(),
+                df.team_name.to_numpy(),
+                owned,
+                self.bank,
+                self.free_transfers,
+                Optimiser.POS_CONSTRAINTS["XV"],
+                self.hit_cost,
+                self.max_free_transfers,
+                self.discount,
+            )
+            self.backend = get_backend(model, **self.solver_options)
+        return self.backend
+
+    def plan(self):
+        """
+        Solve for the best transfers over the horizon.
+
+        Returns:
+            pd.DataFrame: One row per player bought or sold, with the
+            gameweek, move ("in" or "out"), name, position and price.
+        """
+        return self._solve(self._hold_solution())
+
+    def _solve(self, warm_start):
+        backend = self._get_backend()
+        try:
+            self.solution = backend.solve(warm_start=warm_start)
+        finally:
+            self.solve_info = dict(backend.info)
+        self.objective_value = float(backend.model.c @ self.solution)
+        self._describe()
+        return self.transfers
+
+    def _blocks(self, solution):
+        n, n_weeks = len(self.candidates), len(self.gameweeks)
+        weekly = solution[: 4 * n * n_weeks].reshape(n_weeks, 4, n) > 0.5
+        hits, free, bank, _ = solution[4 * n * n_weeks :].reshape(4, n_weeks)
+        return weekly, np.round(hits), np.round(free), bank
+
+    def _describe(self):
+        weekly, hits, free, bank = self._blocks(self.solution)
+        points = self.projections.to_numpy(dtype=float)
+        df = self.player_df.loc[self.candidates]
+
+        moves, summary = [], []
+        for t, gameweek in enumerate(self.gameweeks):
+            squad, bought, sold, captain = weekly[t]
+            for move, mask in (("out", sold), ("in", bought)):
+                rows = df[mask][["name", "team_name", "position", "value"]]
+                moves.append(rows.assign(gameweek=gameweek, move=move))
+            summary.append(
+                {
+                    "gameweek": gameweek,
+                    "transfers": int(bought.sum()),
+                    "hits": int(hits[t]),
+                    "free_transfers": int(free[t]),
+                    "bank": bank[t],
+                    "points": points[squad, t].sum() + points[captain, t].sum(),
+                    "captain": df.name[captain].iloc[0],
+                }
+            )
+        columns = ["gameweek", "move", "name", "team_name", "position", "value"]
+        self.transfers = pd.concat(moves)[columns]
+        self.summary = pd.DataFrame(summary).set_index("gameweek")
+
+    def _hold_solution(self):
+        """Plan that makes no transfers, captaining the best owned player"""
+        n, n_weeks = len(self.candidates), len(self.gameweeks)
+        owned = self._state()[0]
+        weekly = np.zeros((n_weeks, 4, n))
+        weekly[0, 0] = owned
+        points = np.where(owned > 0, self.projections.iloc[:, 0], -np.inf)
+        weekly[0, 3, np.argmax(points)] = 1
+        tail = np.zeros((4, n_weeks))
+        tail[1:3, 0] = self.free_transfers, self.bank
+        return self._hold_from(weekly, tail, 1)
+
+    def _shifted_solution(self, shift):
+        """Last plan moved on `shift` gameweeks, holding the squad after it"""
+        n, n_weeks = len(self.candidates), len(self.gameweeks)
+        weekly = self.solution[: 4 * n * n_weeks].reshape(n_weeks, 4, n)
+        tail = self.solution[4 * n * n_weeks :].reshape(4, n_weeks)
+        weekly = np.concatenate([weekly[shift:], np.zeros_like(weekly[:shift])])
+        tail = np.concatenate([tail[:, shift:], np.zeros_like(tail[:, :shift])], 1)
+        # Rolling the moves made gives at least the free transfers it planned
+        tail[1, 0] = self.free_transfers
+        return self._hold_from(weekly, tail, n_weeks - shift)
+
+    def _hold_from(self, weekly, tail, start):
+        """Fill in no transfers from week `start` on: the squad, captain and
+        bank carry over and unused free transfers roll over"""
+        for t in range(start, len(self.gameweeks)):
+            weekly[t] = weekly[t - 1]
+            weekly[t, 1:3] = 0
+            hits, free, bank, hit_taken = tail[:, t - 1]
+            free = free - weekly[t - 1, 1].sum() + hits + 1
+            if hit_taken > 0.5:
+                free = 1
+            tail[:, t] = 0, max(1, min(free, self.max_free_transfers)), bank, 0
+        return np.concatenate([weekly.ravel(), tail.ravel()])
+
+    def best_transfer(self, player_out=None):
+        """
+        The single transfer this gameweek that does most for the plan.
+
+        Args:
+            player_out (optional): Row label of the squad player to sell. Any
+                player by default.
+
+        Returns:
+            pd.DataFrame: The player out and the player in.
+        """
+        backend = self._get_backend()
+        n = len(self.candidates)
+        buy = n + np.arange(n)
+        rows = backend.add_rows(np.zeros(n), buy, np.ones(n), 1, 1, "one_transfer")
+        sell = None
+        if player_out is not None:
+            if player_out not in self.owned:
+                raise Exception(f"{player_out} is not in the squad.")
+            sell = 2 * n + self.candidates.get_loc(player_out)
+            backend.set_bounds([sell], 1, 1)
+        # The horizon plan is kept, for advance and the summary
+        plan = self.solution, self.objective_value, self.transfers, self.summary
+        try:
+            self._solve(None)
+            first = self.transfers[self.transfers.gameweek == self.gameweeks[0]]
+        finally:
+            backend.delete_rows(rows)
+            if sell is not None:
+                backend.set_bounds([sell], 0, 1)
+            self.solution, self.objective_value, self.transfers, self.summary = plan
+        return first.sort_values("move", ascending=False)
+
+    def squad(self, gameweek=None):
+        """Row labels of the planned squad for a gameweek, the first by default"""
+        weekly = self._blocks(self.solution)[0]
+        t = 0 if gameweek is None else self.gameweeks.index(gameweek)
+        return self.candidates[weekly[t][0]]
+
+    def advance(self, projections, bought=None, sold=None):
+        """
+        Make the first gameweek's transfers and slide the horizon on one week.
+
+        The model is patched rather than rebuilt: week 0 flow and bank rows,
+        week 0 bounds and the objective are updated, then the plan is
+        re-solved starting from the previous one, or from making no more
+        transfers when the moves made weren't the planned ones.
+
+        Args:
+            projections (pd.DataFrame): Projections for the new horizon, same
+                number of gameweeks and covering the candidates.
+            bought (list, optional): Row labels actually bought. The planned
+                buys by default.
+            sold (list, optional): Row labels actually sold. The planned
+                sales by default.
+
+        Returns:
+            pd.DataFrame: The new plan, as from `plan`.
+        """
+        if self.solution is None:
+            raise Exception("Run plan first.")
+        if len(projections.columns) != len(self.gameweeks):
+            raise Exception("The horizon length can't change.")
+        weekly = self._blocks(self.solution)[0][0]
+        planned_buys = self.candidates[weekly[1]]
+        planned_sales = self.candidates[weekly[2]]
+        bought = planned_buys if bought is None else pd.Index(bought)
+        sold = planned_sales if sold is None else pd.Index(sold)
+        as_planned = set(bought) == set(planned_buys) and set(sold) == set(
+            planned_sales
+        )
+
+        prices = self.player_df["value"]
+        n_moves = len(bought)
+        self.bank += self.sell_prices.reindex(sold).fillna(prices).sum()
+        self.bank -= prices[bought].sum()
+        self.owned = self.owned.difference(sold).union(bought)
+        self.sell_prices = pd.concat(
+            [self.sell_prices.drop(sold, errors="ignore"), prices[bought]]
+        )
+        if n_moves > self.free_transfers:
+            self.free_transfers = 1
+        else:
+            self.free_transfers = min(
+                self.free_transfers - n_moves + 1, self.max_free_transfers
+            )
+
+        self.gameweeks = list(projections.columns)
+        self.projections = projections.reindex(self.candidates).fillna(0)
+        if as_planned:
+            warm_start = self._shifted_solution(1)
+        else:
+            warm_start = self._hold_solution()
+        self._patch()
+        return self._solve(warm_start)
+
+    def _patch(self):
+        backend = self._get_backend()
+        model = backend.model
+        n, n_weeks = len(self.candidates), len(self.gameweeks)
+        owned, sell_prices = self._state()
+
+        points = self.projections.to_numpy(dtype=float)
+        weight = self.discount ** np.arange(n_weeks)
+        cols, costs = [], []
+        for t in range(n_weeks):
+            cols += [t * 4 * n + np.arange(n), t * 4 * n + 3 * n + np.arange(n)]
+            costs += [weight[t] * points[:, t]] * 2
+        backend.set_costs(np.concatenate(cols), np.concatenate(costs))
+
+        flow = model.blocks["flow"][:n]
+        backend.set_row_bounds(flow, owned, owned)
+        bank_rows = model.blocks["bank"]
+        backend.set_row_bounds(bank_rows[:1], self.bank, self.bank)
+        for t, row in enumerate(bank_rows):
+            backend.set_coeffs(row, t * 4 * n + 2 * n + np.arange(n), -sell_prices)
+
+        backend.set_bounds(2 * n + np.arange(n), 0, owned)
+        backend.set_bounds(n + np.arange(n), 0, 1 - owned)
+        free = 4 * n * n_weeks + n_weeks
+        backend.set_bounds([free], self.free_transfers, self.free_transfers)
@@ -0,0 +1,207 @@
+"""Factories and sample sources shared by the test modules."""
+
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+# BetScraper reads its key at import, so tests run without a .env
+os.environ.setdefault("API_KEY", "test")
+
+from scrape.players.scrape import FPLScraper  # noqa: E402
+
+CLUBS = [f"Club {i}" for i in range(20)]
+
+
+def make_players(n=300, seed=0):
+    rng = np.random.default_rng(seed)
+    positions = rng.choice(["GK", "DEF", "MID", "FWD"], n, p=[0.1, 0.35, 0.4, 0.15])
+    value = rng.integers(40, 131, n).astype(float)
+    total_points = np.clip(rng.normal(value - 40, 20), 0, None).round()
+    odds = rng.uniform(0.1, 0.8, n)
+    df = pd.DataFrame(
+        {
+            "name": [f"Player {i}" for i in range(n)],
+            "element": np.arange(1, n + 1),
+            "team_name": rng.choice(CLUBS, n),
+            "position": positions,
+            "value": value,
+            "total_points": total_points,
+            "agg_win_odds": odds,
+        }
+    )
+    df["scaled_points"] = df.total_points / df.total_points.max()
+    weight = np.where(df.position.isin(["DEF", "GK"]), 0.6, 0.4)
+    df["points_weighted"] = (1 - weight) * df.scaled_points + weight * odds
+    return df
+
+
+POSITIONS = ["GK"] * 3 + ["DEF"] * 8 + ["MID"] * 8 + ["FWD"] * 5
+
+
+def make_fixtures(start="2023-08-12"):
+    """Round robin, every club plays once per gameweek"""
+    rows, clubs = [], list(CLUBS)
+    for gameweek in range(1, 39):
+        date = pd.Timestamp(start) + pd.Timedelta(weeks=gameweek - 1)
+        for k in range(10):
+            home, away = clubs[k], clubs[-k - 1]
+            if gameweek % 2:
+                home, away = away, home
+            rows.append((home, away, date, gameweek))
+        clubs = [clubs[0]] + [clubs[-1]] + clubs[1:-1]
+    return pd.DataFrame(rows, columns=["home", "away", "game_date", "gameweek"])
+
+
+def make_season(seed=0):
+    rng = np.random.default_rng(seed)
+    players = pd.DataFrame(
+        {
+            "team_name": np.repeat(CLUBS, len(POSITIONS)),
+            "position": POSITIONS * len(CLUBS),
+        }
+    )
+    players["name"] = [f"Player {i}" for i in range(len(players))]
+    players["element"] = np.arange(len(players)) + 1
+    players["value"] = rng.integers(40, 131, len(players)).astype(float)
+    players["team_id"] = 99
+    skill = (players["value"] - 30) / 30
+
+    fixtures = make_fixtures()
+    seasons = []
+    for season in (23, 24):
+        gws = players.merge(pd.DataFrame({"gameweek": range(1, 39)}), how="cross")
+        n = len(gws)
+        plays = rng.random(n) < 0.8
+        gws["minutes"] = np.where(plays, 90, 0)
+        gws["total_points"] = np.where(
+            plays, 2 + rng.poisson(np.repeat(skill.to_numpy(), 38)), 0
+        )
+        gws["ict_index"] = rng.uniform(0, 10, n)
+        gws["season"] = season
+        gws["game_date"] = pd.Timestamp("2023-08-12") + pd.to_timedelta(
+            (gws["gameweek"] - 1) * 7, unit="D"
+        )
+        seasons.append(gws)
+
+    scraper = FPLScraper(24)
+    scraper.gw_stats = pd.concat(seasons, ignore_index=True)
+    scraper.fixtures = fixtures
+    return scraper
+
+
+TEAMS = "id,name\n1,Arsenal\n2,Man City\n3,Spurs\n"
+FIXTURES = (
+    "team_h,team_a,kickoff_time,event\n"
+    "1,2,2023-08-12T12:30:00Z,1\n"
+    "3,1,2023-08-19T15:00:00Z,2\n"
+)
+
+
+class SourceServer:
+    """Serves CSVs from a dict on localhost with ETags, counting requests.
+    Each response is held back `delay` seconds, like a slow link."""
+
+    def __init__(self, files, delay=0):
+        self.files = dict(files)
+        self.delay = delay
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests.append(self.path)
+                time.sleep(server.delay)
+                body = server.files.get(self.path)
+                if body is None:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                etag = f'"{hash(body)}"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body.encode())
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+MERGED_GW = {
+    "2023-24": (
+        "name,position,team,xP,assists,bps,element,kickoff_time,minutes,"
+        "total_points,value,was_home,GW\n"
+        "Son Heung-min,MID,Spurs,5.0,1,30,1,2023-08-13T13:00:00Z,90,8,90,True,1\n"
+        "Erling Haaland,FWD,Man City,6.0,0,20,2,2023-08-11T19:00:00Z,90,6,140,False,1\n"
+        "Son Heung-min,MID,Spurs,4.0,0,10,1,2023-08-19T16:30:00Z,80,2,90,True,2\n"
+    ),
+    # An older season without the position column
+    "2022-23": (
+        "name,team,assists,bps,element,kickoff_time,minutes,total_points,value,"
+        "was_home,GW\n"
+        "Heung-Min Son,Spurs,0,5,3,2022-08-06T11:30:00Z,90,3,115,True,1\n"
+    ),
+}
+
+
+def make_game(home, away, commence, prices, books=None):
+    """A game as the odds API sends it, with (home, draw, away) prices per bookmaker"""
+    books = books or [f"book{i}" for i in range(len(prices))]
+    return {
+        "id": f"{home}-{away}-{commence}",
+        "sport_key": "soccer_epl",
+        "commence_time": commence,
+        "home_team": home,
+        "away_team": away,
+        "bookmakers": [
+            {
+                "key": book,
+                "title": book.title(),
+                "last_update": commence,
+                "markets": [
+                    {
+                        "key": "h2h",
+                        "last_update": commence,
+                        "outcomes": [
+                            {"name": home, "price": float(h)},
+                            {"name": away, "price": float(a)},
+                            {"name": "Draw", "price": float(d)},
+                        ],
+                    }
+                ],
+            }
+            for book, (h, d, a) in zip(books, prices)
+        ],
+    }
+
+
+def make_games(n_games=10, n_books=5, seed=0):
+    rng = np.random.default_rng(seed)
+    games = []
+    for i in range(n_games):
+        home, away = rng.choice(CLUBS, 2, replace=False)
+        prices = rng.uniform(1.5, 6, (n_books, 3)).round(2)
+        games.append(
+            make_game(home, away, f"2023-09-{1 + i % 28:02d}T14:00:00Z", prices)
+        )
+    return games
@@ -0,0 +1,94 @@
+import pandas as pd
+import pytest
+
+from backtest import backtest, odds_for_gameweek
+from conftest import make_fixtures, make_season
+
+
+def test_odds_for_gameweek_takes_latest_snapshot_before_kickoff():
+    fixtures = make_fixtures()
+    game = fixtures[fixtures.gameweek == 3].iloc[0]
+    odds = pd.DataFrame(
+        {
+            "home": game.home,
+            "away": game.away,
+            "home_odds": [0.4, 0.5, 0.6],
+            "snapshot": [
+                game.game_date - pd.Timedelta(days=3),
+                game.game_date - pd.Timedelta(days=1),
+                game.game_date + pd.Timedelta(hours=12),
+            ],
+        }
+    )
+    other = odds.assign(home="Nobody")
+    picked = odds_for_gameweek(pd.concat([odds, other]), fixtures, 3)
+    assert picked.home_odds.tolist() == [0.5]
+
+
+def test_backtest_scores_each_gameweek():
+    scraper = make_season()
+    gameweeks = [2, 6, 7]
+    results = backtest(24, gameweeks=gameweeks, processes=1, scraper=scraper)
+    assert "error" not in results.columns
+    assert results.index.tolist() == gameweeks
+    assert (results.points > 0).all()
+    assert (results.squad_value <= 1000).all()
+    assert results.total_points.iloc[-1] == results.points.sum()
+
+    # Captain is counted twice against the gameweek's actual points
+    gw_stats = scraper.gw_stats
+    played = gw_stats[(gw_stats.season == 24) & (gw_stats.gameweek == 6)]
+    captain = played[played.name == results.loc[6, "captain"]]
+    assert results.loc[6, "captain_points"] == captain.total_points.sum()
+
+    pooled = backtest(24, gameweeks=gameweeks, processes=2, scraper=scraper)
+    pd.testing.assert_frame_equal(
+        results.drop(columns="pick_time"), pooled.drop(columns="pick_time")
+    )
+
+
+def test_backtest_uses_this_seasons_odds():
+    scraper = make_season()
+    fixtures = scraper.fixtures
+    favourites = {f"Club {i}" for i in range(5)}
+
+    def scrape(clubs, season):
+        games = fixtures[fixtures.gameweek == 6][["home", "away"]]
+        return games.assign(
+            home_odds=games.home.isin(clubs).map({True: 0.9, False: 0.1}),
+            away_odds=games.away.isin(clubs).map({True: 0.9, False: 0.1}),
+            draw_odds=0.1,
+            season=season,
+        )
+
+    # Last season's scrape of the same fixtures favours other clubs
+    odds = pd.concat([scrape({"Club 10", "Club 11"}, 23), scrape(favourites, 24)])
+    results = backtest(
+        24,
+        odds=odds,
+        gameweeks=[6],
+        odds_weight_def=1,
+        odds_weight_fwd=1,
+        processes=1,
+        scraper=scraper,
+    )
+    assert "error" not in results.columns
+    players = scraper.gw_stats.drop_duplicates("name").set_index("name")
+    assert players.team_name[results.loc[6, "captain"]] in favourites
+
+    # Unstamped odds are taken for the season replayed
+    unstamped = scrape(favourites, 24).drop(columns="season")
+    last_season = backtest(
+        23,
+        odds=unstamped,
+        gameweeks=[6],
+        odds_weight_def=1,
+        odds_weight_fwd=1,
+        processes=1,
+        scraper=scraper,
+    )
+    assert players.team_name[last_season.loc[6, "captain"]] in favourites
+
+    # Scraped for a season and stamped with it, so not used for another
+    with pytest.raises(Exception, match="No odds"):
+        backtest(22, odds=odds, gameweeks=[6], processes=1, scraper=scraper)
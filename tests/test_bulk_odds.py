@@ -0,0 +1,142 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from scrape.bet.bulk import BulkOddsFetcher, date_range
+from scrape.bet.scrape import BetScraper
+from conftest import make_games
+
+
+class OddsServer:
+    """
+    Stand-in odds-history endpoint on localhost. Charges `cost` credits an
+    answered request from `credits`, and answers the first `failures`
+    requests for each date with 429 then 500, free.
+    """
+
+    def __init__(self, credits=1000, cost=10, failures=0, delay=0.05):
+        self.credits = credits
+        self.cost = cost
+        self.failures = failures
+        self.delay = delay
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                date = parse_qs(urlparse(self.path).query)["date"][0]
+                with server.lock:
+                    server.requests.append((time.monotonic(), date))
+                    tries = sum(d == date for _, d in server.requests)
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                time.sleep(server.delay)
+                with server.lock:
+                    server.in_flight -= 1
+                    failed = tries <= server.failures
+                    if not failed:
+                        server.credits -= server.cost
+                    remaining = server.credits
+
+                if failed:
+                    self.send_response(429 if tries == 1 else 500)
+                    self.send_header("Retry-After", "0")
+                    self.end_headers()
+                    return
+                seed = int(date[8:10])
+                body = json.dumps(
+                    {"timestamp": date, "data": make_games(3, 4, seed)}
+                ).encode()
+                self.send_response(200)
+                self.send_header("x-requests-remaining", str(remaining))
+                self.send_header("x-requests-last", str(server.cost))
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/v4/sports/"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def odds_server(monkeypatch):
+    def start(**kwargs):
+        server = OddsServer(**kwargs).__enter__()
+        servers.append(server)
+        monkeypatch.setattr(BetScraper, "BASE_URL", server.url)
+        return server
+
+    servers = []
+    yield start
+    for server in servers:
+        server.__exit__()
+
+
+def test_backfill_is_concurrent_and_rate_limited(odds_server, tmp_path):
+    server = odds_server()
+    fetcher = BulkOddsFetcher(tmp_path, rate=20, max_workers=4)
+    dates = fetcher.fetch("230901", "230910")
+    assert dates == date_range("230901", "230910")
+    assert server.max_in_flight > 1
+
+    # Ten requests at 20 a second take at least 0.45 s to start
+    starts = [t for t, _ in server.requests]
+    assert max(starts) - min(starts) > 0.4
+    assert fetcher.credits_used == 100 and fetcher.credits_remaining == 900
+
+    odds = fetcher.to_df()
+    assert len(odds) == 30
+    assert {"home", "away", "home_odds", "draw_odds", "away_odds", "snapshot"} <= set(
+        odds.columns
+    )
+    assert (odds.season == 24).all()
+
+
+def test_retries_and_resume(odds_server, tmp_path):
+    server = odds_server(failures=2)
+    fetcher = BulkOddsFetcher(tmp_path, rate=None, backoff=0.01, credit_budget=30)
+    # 10 credits a date: three dates in flight use up the budget
+    assert fetcher.fetch("230901", "230906") == date_range("230901", "230903")
+    assert fetcher.stopped == "credit budget spent"
+    assert fetcher.credits_used == 30
+    assert len(server.requests) == 9
+
+    # A fresh fetcher picks up where it stopped
+    fetcher = BulkOddsFetcher(tmp_path, rate=None, backoff=0.01)
+    assert fetcher.fetch("230901", "230906") == date_range("230904", "230906")
+    assert fetcher.fetched == date_range("230901", "230906")
+    assert len(server.requests) == 18
+
+    # Never leaves the account under its reserve, 940 credits are left
+    fetcher = BulkOddsFetcher(tmp_path, rate=None, backoff=0.01, reserve=925)
+    fetcher.credits_remaining = server.credits
+    assert fetcher.fetch("230907", "230910") == ["230907"]
+    assert fetcher.stopped == "credits down to the reserve"
+    assert server.credits == 930
+
+
+def test_gives_up_after_retries(odds_server, tmp_path):
+    odds_server(failures=5)
+    fetcher = BulkOddsFetcher(tmp_path, rate=None, retries=2, backoff=0.01)
+    with pytest.raises(Exception):
+        fetcher.fetch("230901")
+    assert fetcher.fetched == []
@@ -0,0 +1,60 @@
+import time
+
+import pandas as pd
+
+from team.cache import ResultCache
+from team.select import DumbOptimiser, GreedyOptimiser
+from team.team import Team
+from conftest import make_players
+
+
+def test_team_reuses_cached_pick(tmp_path):
+    df = make_players()
+    cache = ResultCache(tmp_path)
+
+    first = Team(24, 1, df, cache=cache).pick_xi()
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    team = Team(24, 1, df, cache=cache)
+    again = team.pick_xi()
+    assert (cache.hits, cache.misses) == (1, 1)
+    pd.testing.assert_frame_equal(first, again)
+    # The selector never had to solve
+    assert team.selector._first_xv.empty
+
+    # Refreshed odds aren't hidden by the stored pick
+    refreshed = df.assign(agg_win_odds=df.agg_win_odds / 2)
+    fresh = Team(24, 1, refreshed, cache=cache).pick_xi()
+    assert (cache.hits, cache.misses) == (1, 2)
+    picked = fresh.set_index("element").agg_win_odds
+    expected = refreshed.set_index("element").agg_win_odds
+    pd.testing.assert_series_equal(picked, expected[picked.index])
+
+
+def test_key_tracks_inputs():
+    df = make_players()
+    key = ResultCache.key(DumbOptimiser(df, 24))
+    assert key == ResultCache.key(DumbOptimiser(df.copy(), 24))
+    # Columns the optimiser doesn't read are returned by a hit, so count too
+    assert key != ResultCache.key(DumbOptimiser(df.assign(minutes=0), 24))
+
+    changed = df.copy()
+    changed.loc[0, "points_weighted"] += 0.01
+    assert key != ResultCache.key(DumbOptimiser(changed, 24))
+    assert key != ResultCache.key(DumbOptimiser(df, 24, budget=990))
+    assert key != ResultCache.key(GreedyOptimiser(df, 24))
+
+
+def test_lru_eviction(tmp_path):
+    cache = ResultCache(tmp_path, max_entries=2)
+    for key in "abc":
+        cache.put(key, pd.DataFrame({"key": [key]}))
+        # mtime resolution can be coarse
+        time.sleep(0.01)
+        if key == "b":
+            cache.get("a")
+            time.sleep(0.01)
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
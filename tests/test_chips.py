@@ -0,0 +1,94 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from team.chips import CHIPS, ChipPlanner, fixture_counts
+from conftest import CLUBS, make_fixtures, make_players
+
+
+def make_projections(df, weeks, seed=0):
+    rng = np.random.default_rng(seed)
+    base = df.value.to_numpy() / 20 * rng.gamma(4, 0.25, len(df))
+    points = base[:, None] * rng.uniform(0.6, 1.4, (len(df), len(weeks)))
+    return pd.DataFrame(points, index=df.index, columns=list(weeks))
+
+
+def brute_force(planner):
+    """Best total over every way of playing each chip at most once"""
+    n_weeks = len(planner.gameweeks)
+    best = -np.inf
+    for weeks in itertools.product(range(-1, n_weeks), repeat=len(CHIPS)):
+        played = [w for w in weeks if w >= 0]
+        if len(played) != len(set(played)):
+            continue
+        chip_in = {w: chip for chip, w in zip(CHIPS, weeks) if w >= 0}
+        squad, total = "held", 0
+        for t, gameweek in enumerate(planner.gameweeks):
+            chip = chip_in.get(t)
+            if chip == "wildcard":
+                squad = f"wildcard_{gameweek}"
+                if squad not in planner.values:
+                    total = -np.inf
+                    break
+                total += planner.values[squad][t][None]
+            elif chip == "free_hit":
+                total += planner.free_hit[t]
+            else:
+                total += planner.values[squad][t][chip]
+        best = max(best, total)
+    return best
+
+
+def test_fixture_counts():
+    fixtures = make_fixtures()
+    # Move two gameweek 26 games into 25: four doubles then four blanks
+    moved = fixtures[fixtures.gameweek == 26].index[:2]
+    fixtures.loc[moved, "gameweek"] = 25
+    clubs = set(fixtures.loc[moved, ["home", "away"]].to_numpy().ravel())
+
+    games = fixture_counts(fixtures, range(24, 28), CLUBS)
+    assert list(games.columns) == [24, 25, 26, 27]
+    assert set(games.index[games[25] == 2]) == clubs
+    assert set(games.index[games[26] == 0]) == clubs
+    assert (games[[24, 27]] == 1).all().all()
+
+
+def test_plan_matches_brute_force():
+    df = make_players(150)
+    projections = make_projections(df, range(20, 26))
+    fixtures = make_fixtures()
+    fixtures.loc[fixtures[fixtures.gameweek == 23].index[:3], "gameweek"] = 22
+    games = fixture_counts(fixtures, range(20, 26), CLUBS)
+
+    planner = ChipPlanner(df, projections, games=games, season=24)
+    calendar = planner.plan()
+    assert planner.total_points == pytest.approx(brute_force(planner))
+    assert planner.total_points == pytest.approx(calendar.points.sum())
+    assert planner.total_points >= planner.baseline_points
+    assert calendar.chip.dropna().is_unique
+    # Wildcard and free hit squads for each week, the first squad and no more
+    assert planner.n_solves == 2 * len(projections.columns)
+    assert calendar.loc[22, "doubles"] == 6
+
+
+def test_held_squad_and_chips_left():
+    df = make_players(150)
+    projections = make_projections(df, range(30, 34))
+    # The cheapest legal squad, so a wildcard straight away pays
+    limits = {"GK": 2, "DEF": 5, "MID": 5, "FWD": 3}
+    cheapest = df.sort_values("value").groupby("position").cumcount().sort_index()
+    squad = df.index[cheapest < df.position.map(limits)]
+
+    planner = ChipPlanner(
+        df, projections, squad=squad, chips={"wildcard": 1, "bench_boost": 1}
+    )
+    calendar = planner.plan()
+    assert planner.n_solves == len(projections.columns)
+    assert calendar.loc[30, "chip"] == "wildcard"
+    assert set(calendar.chip.dropna()) == {"wildcard", "bench_boost"}
+    assert planner.total_points == pytest.approx(calendar.points.sum())
+
+    with pytest.raises(Exception):
+        ChipPlanner(df, projections, chips={"park_the_bus": 1})
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from scrape.players.features import FeatureStore
+from conftest import make_season
+
+AGG = {
+    "total_points": "sum",
+    "team_name": "last",
+    "value": "last",
+    "ict_index": "mean",
+    "minutes": "sum",
+    "position": "last",
+    "team_id": "last",
+    "element": "last",
+}
+
+
+def make_stats():
+    gw_stats = make_season().gw_stats
+    # A double gameweek, a transfer and an older season without positions
+    double = gw_stats[(gw_stats.season == 24) & (gw_stats.gameweek == 3)].head(5)
+    gw_stats = pd.concat([gw_stats, double], ignore_index=True)
+    moved = (gw_stats.name == "Player 0") & (gw_stats.season == 24)
+    moved &= gw_stats.gameweek >= 4
+    gw_stats.loc[moved, "team_name"] = "Club 19"
+    gw_stats.loc[gw_stats.season == 23, "position"] = None
+    return gw_stats
+
+
+def brute_force(gw_stats, store, season, gameweek, window):
+    """The aggregates by masking and grouping the rows in the window"""
+    times = gw_stats.season.map(store.offsets) + gw_stats.gameweek - 1
+    end = store.time(season, gameweek)
+    rows = gw_stats[(times < end) & (times >= end - window)]
+    rows = rows.iloc[np.argsort(times[rows.index].to_numpy(), kind="stable")]
+    return rows.groupby("name").agg(AGG).reset_index()
+
+
+@pytest.mark.parametrize(
+    "season,gameweek,window",
+    [(24, 7, 6), (24, 3, 5), (24, 20, 30), (23, 1, 5), (25, 1, 4)],
+)
+def test_features_match_grouping(season, gameweek, window):
+    gw_stats = make_stats()
+    store = FeatureStore(gw_stats)
+    features = store.features(season, gameweek, window).set_index("name")
+    expected = brute_force(gw_stats, store, season, gameweek, window).set_index("name")
+    assert list(features.columns[:-2]) == list(expected.columns)
+    pd.testing.assert_frame_equal(
+        features.loc[expected.index, expected.columns],
+        expected,
+        check_dtype=False,
+    )
+    assert len(features) == len(expected)
+
+
+def test_rolling_and_lookups():
+    gw_stats = make_stats()
+    store = FeatureStore(gw_stats, window=4)
+    rolling = store.rolling()
+    one = rolling[(rolling.season == 24) & (rolling.next_gw == 5)]
+    pd.testing.assert_frame_equal(
+        one.reset_index(drop=True), store.features(24, 5), check_dtype=False
+    )
+    assert set(rolling.next_gw[rolling.season == 23]) == set(range(2, 39))
+
+    # Gameweek 4 of 2023-24 looks back into the season before
+    player = store.features(24, 4).set_index("name").loc["Player 0"]
+    assert player.team_name == "Club 0" and player.position == "GK"
+    assert (
+        store.features(24, 6).set_index("name").loc["Player 0"].team_name == "Club 19"
+    )
+
+
+def test_respelled_player_is_one_player():
+    gw_stats = make_stats()
+    gw_stats["name"] = gw_stats["name"].astype(object)
+    # Renamed and given a new element id in the later season
+    later = (gw_stats.name == "Player 1") & (gw_stats.season == 24)
+    gw_stats.loc[later, "name"] = "Player 1 FC"
+    gw_stats.loc[later, "element"] = 999
+    store = FeatureStore(gw_stats, window=6)
+
+    player = store.features(24, 4).set_index("name").loc["Player 1 FC"]
+    rows = gw_stats[gw_stats.element.isin([2, 999])]
+    times = rows.season.map(store.offsets) + rows.gameweek - 1
+    window = rows[(times < store.time(24, 4)) & (times >= store.time(24, 4) - 6)]
+    assert player.total_points == window.total_points.sum()
+    assert player.element == 999
+    assert "Player 1" not in set(store.features(24, 4).name)
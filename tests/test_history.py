@@ -0,0 +1,143 @@
+import io
+
+import pandas as pd
+import pytest
+
+from scrape.cache import SourceCache
+from scrape.history import HistoryStore
+from scrape.players.scrape import FPLScraper
+from conftest import FIXTURES, MERGED_GW, TEAMS, SourceServer
+
+SEASONS = {
+    **MERGED_GW,
+    "2021-22": (
+        "name,team,assists,bps,element,kickoff_time,minutes,total_points,value,"
+        "was_home,GW\n"
+        "Mohamed Salah,Liverpool,1,40,4,2021-08-14T11:30:00Z,90,13,125,False,1\n"
+        "Mohamed Salah,Liverpool,0,20,4,2021-08-21T11:30:00Z,90,9,125,True,2\n"
+        "Mohamed Salah,Liverpool,1,35,4,2021-08-28T11:30:00Z,90,8,125,True,3\n"
+    ),
+}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    files = {f"/{s}/gws/merged_gw.csv": csv for s, csv in SEASONS.items()}
+    with SourceServer(files) as server:
+        monkeypatch.setattr(FPLScraper, "BASE_URL", server.url)
+        store = HistoryStore(tmp_path)
+        assert store.ingest([22, 23, 24]) == [22, 23, 24]
+        store.server = server
+        yield store
+
+
+def test_partitions_and_pushdown(store):
+    assert store.seasons == [22, 23, 24]
+    assert store.gameweeks(22) == [1, 2, 3]
+
+    every = store.read()
+    assert store.partitions_read == 6
+    assert len(every) == 7
+    assert every["name"].dtype == "category"
+    assert set(every["name"]) >= {"Mohamed Salah", "Heung-Min Son"}
+
+    store.partitions_read = 0
+    late = store.read(seasons=[22, 24], gameweeks=[2, 3], columns=["name", "bps"])
+    assert store.partitions_read == 3
+    assert list(late.columns) == ["name", "bps"]
+    assert list(late["bps"]) == [20, 35, 10]
+
+    # Everything known going into 2023-24 gameweek 2
+    store.partitions_read = 0
+    known = store.read(before=(24, 2))
+    assert store.partitions_read == 5
+    assert set(zip(known.season, known.gameweek)) == {
+        (22, 1),
+        (22, 2),
+        (22, 3),
+        (23, 1),
+        (24, 1),
+    }
+
+    scraper = FPLScraper(24)
+    scraper.gw_stats = known
+    pd.testing.assert_frame_equal(scraper.gw_stats, known)
+
+
+def test_ingest_skips_stored_seasons(store):
+    n_requests = len(store.server.requests)
+    assert store.ingest([22, 23, 24]) == []
+    assert len(store.server.requests) == n_requests
+
+    store.server.files["/2023-24/gws/merged_gw.csv"] = MERGED_GW["2023-24"].replace(
+        ",8,90,True,1", ",12,90,True,1"
+    )
+    assert store.ingest([24], refresh=True) == [24]
+    assert store.read(seasons=[24], gameweeks=[1]).total_points.max() == 12
+
+    with pytest.raises(Exception):
+        store.ingest([5])
+
+
+def gameweek_csv(csv, gameweek):
+    """merged_gw.csv rows of one gameweek as vaastav's gwN.csv, without GW"""
+    frame = pd.read_csv(io.StringIO(csv))
+    return frame[frame.GW == gameweek].drop(columns="GW").to_csv(index=False)
+
+
+def test_update_fetches_new_gameweeks(store):
+    files = store.server.files
+    season = MERGED_GW["2023-24"]
+    files["/2023-24/gws/gw3.csv"] = gameweek_csv(season, 2).replace(
+        "2023-08-19", "2023-08-26"
+    )
+    files["/2023-24/teams.csv"] = TEAMS
+    files["/2023-24/fixtures.csv"] = FIXTURES
+    store.server.requests.clear()
+
+    assert store.update(24) == [3]
+    # The last stored, the new gameweek and a look for the next one
+    assert store.server.requests == [
+        "/2023-24/gws/gw2.csv",
+        "/2023-24/gws/gw3.csv",
+        "/2023-24/gws/gw4.csv",
+    ]
+    assert store.gameweeks(24) == [1, 2, 3]
+    week = store.read(seasons=[24], gameweeks=[3])
+    assert list(week.gameweek) == [3] and list(week.name) == ["Heung-Min Son"]
+    assert week["game_date"].iloc[0] == pd.Timestamp("2023-08-26")
+
+    # Again fetches the last gameweek, which was stored while in progress
+    files["/2023-24/gws/gw3.csv"] = files["/2023-24/gws/gw3.csv"].replace(",2,", ",7,")
+    assert store.update(24) == [3]
+    assert list(store.read(seasons=[24], gameweeks=[3]).total_points) == [7]
+
+    # Reads don't touch the network
+    store.server.requests.clear()
+    assert len(store.gw_stats([24, 23])) == 5
+    assert store.server.requests == []
+
+    # Writing a gameweek twice replaces it
+    files["/2023-24/gws/gw2.csv"] = gameweek_csv(season, 2)
+    assert store.update(24, since=2) == [2, 3]
+    assert len(store.read(seasons=[24])) == 4
+
+    # The scraper reads its two seasons through the store, newest first
+    scraper = FPLScraper(24, history=store).prefetch()
+    assert list(scraper.gw_stats.season.unique()) == [24, 23]
+    assert len(scraper.gw_stats) == 5
+    assert scraper.gw_stats["name"].dtype == "category"
+
+
+def test_offline_update_stops_at_uncached_gameweek(tmp_path, monkeypatch):
+    files = {f"/{s}/gws/merged_gw.csv": csv for s, csv in SEASONS.items()}
+    with SourceServer(files) as server:
+        monkeypatch.setattr(FPLScraper, "BASE_URL", server.url)
+        online = HistoryStore(tmp_path / "history", SourceCache(tmp_path / "cache"))
+        expected = online.gw_stats([24])
+
+    # gw3.csv was never published so isn't cached, which ends the update
+    offline = SourceCache(tmp_path / "cache", offline=True)
+    store = HistoryStore(tmp_path / "history", offline)
+    assert store.update(24) == []
+    pd.testing.assert_frame_equal(store.gw_stats([24]), expected)
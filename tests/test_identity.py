@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+
+from scrape.combine import BetFPLCombiner
+from scrape.identity import UNMATCHED, IdentityIndex, merge_on_keys
+
+
+def test_club_aliases_and_fuzzy_matches():
+    index = IdentityIndex.default()
+    names = ["Man City", "Manchester City", "Manchester Cty", "Spurs"]
+    names += ["Tottenham Hotspur", "Brighton & Hove Albion", "Real Madrid"]
+    keys = index.team_keys(names, "odds")
+    assert keys.dtype == np.int32
+    assert keys[0] == keys[1] == keys[2]
+    assert keys[3] == keys[4] != keys[0]
+    assert index.teams.names[keys[5]] == "Brighton"
+    assert keys[6] == UNMATCHED
+
+    report = index.report()
+    assert list(report.name) == ["Real Madrid"]
+    assert report.source[0] == "odds"
+
+    # A matched alias is remembered, and similar clubs are kept apart
+    assert "cty manchester" in index.teams.aliases
+    assert len(set(index.team_keys(["Club 1", "Club 10"], add_new=True))) == 2
+
+
+def test_suffixes_and_save(tmp_path):
+    index = IdentityIndex.default()
+    names = ["Luton Town", "Norwich City", "Man Utd", "Manchester United"]
+    keys = index.team_keys(names + ["Manchester City"], "odds")
+    assert [index.teams.names[k] for k in keys] == [
+        "Luton",
+        "Norwich",
+        "Manchester Utd",
+        "Manchester Utd",
+        "Manchester City",
+    ]
+    assert index.report().empty
+
+    index.save(tmp_path / "identity.json")
+    loaded = IdentityIndex.load(tmp_path / "identity.json")
+    assert loaded.teams.names == index.teams.names
+    assert list(loaded.team_keys(["Spurs"])) == list(index.team_keys(["Tottenham"]))
+
+
+def test_merge_on_keys():
+    index = IdentityIndex.default()
+    players = pd.DataFrame(
+        {
+            "name": ["A", "B", "C"],
+            "team_name": ["Tottenham", "Manchester City", "Arsenal"],
+            "season": 24,
+            "next_opponent_name": ["Manchester City", "Tottenham", "Burnley"],
+        }
+    )
+    odds = pd.DataFrame(
+        {
+            "home": ["Tottenham Hotspur", "Arsenal FC"],
+            "away": ["Man City", "Burnley"],
+            "season": 24,
+            "home_odds": [0.4, 0.7],
+        }
+    )
+    merged = merge_on_keys(
+        players,
+        odds,
+        left_on=["team_name", "season", "next_opponent_name"],
+        right_on=["home", "season", "away"],
+        kinds=["team", None, "team"],
+        identity=index,
+        how="left",
+    )
+    assert list(merged.home_odds.fillna(0)) == [0.4, 0, 0.7]
+    # Matched odds rows are spelled as the players' clubs
+    assert list(merged.home.fillna("")) == ["Tottenham", "", "Arsenal"]
+    assert list(merged.away.fillna("")) == ["Manchester City", "", "Burnley"]
+    assert list(merged.columns) == list(players.columns) + [
+        "home",
+        "away",
+        "home_odds",
+    ]
+    assert index.report().empty
+
+
+def test_combiner_picks_the_side_of_an_alias():
+    players = pd.DataFrame(
+        {
+            "name": ["Dominic Solanke", "Bukayo Saka"],
+            "element": [1, 2],
+            "team_name": ["Bournemouth", "Arsenal"],
+            "total_points": [100, 120],
+            "value": [70, 90],
+            "ict_index": [8.0, 10.0],
+            "minutes": [900, 900],
+            "position": ["FWD", "MID"],
+            "is_home": [True, False],
+            "season": 24,
+            "next_opponent_name": ["Arsenal", "Bournemouth"],
+        }
+    )
+    odds = pd.DataFrame(
+        {
+            "home": ["AFC Bournemouth"],
+            "away": ["Arsenal"],
+            "home_odds": [0.2],
+            "away_odds": [0.6],
+            "draw_odds": [0.2],
+            "season": [24],
+        }
+    )
+    next_game = BetFPLCombiner(10, odds, players).prepare_next_gw()
+    win_odds = next_game.set_index("team_name")["agg_win_odds"]
+    assert win_odds["Bournemouth"] == 0.2
+    assert win_odds["Arsenal"] == 0.6
+    next_opp = next_game.set_index("team_name")["next_opp"]
+    assert next_opp["Bournemouth"] == "Arsenal"
+    assert next_opp["Arsenal"] == "Bournemouth"
+
+
+def test_player_and_element_keys(tmp_path):
+    index = IdentityIndex.default()
+    names = ["Son Heung-min", "Heung-Min Son", "Mohamed Salah", "Mo Salah"]
+    keys = index.player_keys(names, [23, 24, 23, 24], [380, 427, 253, 308])
+    assert keys[0] == keys[1] != keys[2]
+    assert len(index.players) > 0
+    assert list(index.element_keys([24, 23, 22], [427, 253, 253])) == [
+        keys[0],
+        keys[2],
+        UNMATCHED,
+    ]
+
+    index.save(tmp_path / "identity.json")
+    loaded = IdentityIndex.load(tmp_path / "identity.json")
+    assert list(loaded.element_keys([23], [380])) == [keys[0]]
+
+    stats = pd.DataFrame({"name": ["Heung-Min Son", "Mohamed Salah"], "pts": [7, 9]})
+    picks = pd.DataFrame({"player": ["Son Heung-min", "Bukayo Saka"], "pick": [1, 2]})
+    merged = merge_on_keys(
+        picks, stats, ["player"], ["name"], ["player"], new="right", identity=index
+    )
+    assert list(merged.player) == ["Heung-Min Son"] and list(merged.pts) == [7]
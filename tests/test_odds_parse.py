@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+from scrape.bet.game import Game
+from scrape.bet.parse import odds_frame
+from scrape.bet.scrape import BetScraper, FutureBetScraper
+from conftest import make_game, make_games
+
+
+def test_matches_game_objects():
+    games = make_games(50, 8)
+    games.append(
+        make_game("Tottenham Hotspur", "Arsenal", "2023-09-30T14:00:00Z", [(2, 3.5, 4)])
+    )
+    expected = pd.DataFrame([Game(game).to_dict() for game in games])
+
+    scraper = FutureBetScraper()
+    scraper.games = [Game(game) for game in games]
+    odds = scraper.to_df()
+    assert list(odds.columns) == [
+        "home",
+        "away",
+        "home_odds",
+        "away_odds",
+        "draw_odds",
+        "season",
+    ]
+    for col in ["home_odds", "away_odds", "draw_odds"]:
+        np.testing.assert_allclose(odds[col], expected[col])
+    assert odds.home.iloc[-1] == "Tottenham"
+    assert (odds.season == 24).all()
+
+    # Each game's probabilities are free of the margin
+    total = odds[["home_odds", "away_odds", "draw_odds"]].sum(axis=1)
+    np.testing.assert_allclose(total, 1)
+
+
+def test_incomplete_lines():
+    game = make_game(
+        "Arsenal", "Chelsea", "2023-09-30T14:00:00Z", [(2, 4, 4), (2, 4, 4)]
+    )
+    # A bookmaker without a draw price is left out
+    game["bookmakers"][1]["markets"][0]["outcomes"].pop()
+    empty = make_game("Fulham", "Everton", "2023-09-30T14:00:00Z", [])
+    odds = odds_frame([game, empty], BetScraper.NAME_MAP)
+    np.testing.assert_allclose(odds.loc[0, ["home_odds", "draw_odds"]], [0.5, 0.25])
+    assert odds.loc[1, ["home_odds", "away_odds", "draw_odds"]].isna().all()
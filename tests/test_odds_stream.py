@@ -0,0 +1,74 @@
+import io
+import json
+import tracemalloc
+
+import pandas as pd
+import pytest
+
+from scrape.bet.parse import odds_frame
+from scrape.bet.scrape import BetScraper
+from scrape.bet.stream import CsvSink, iter_games, stream_odds
+from conftest import make_game, make_games
+
+
+def chunked(payload, size):
+    data = json.dumps(payload, indent=1, ensure_ascii=False).encode()
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+def test_matches_bulk_parse():
+    games = make_games(40, 5)
+    # Multibyte characters to split across chunks
+    games.append(make_game("Málaga", "Deportivo Alavés", "2023-09-30", [(2, 3, 4)]))
+    payload = {"timestamp": "2023-09-01T12:00:00Z", "data": games, "next": None}
+    expected = odds_frame(games, BetScraper.NAME_MAP)
+
+    for size in [1, 7, 1 << 16]:
+        sink, meta = stream_odds(
+            chunked(payload, size), batch_size=16, name_map=BetScraper.NAME_MAP
+        )
+        assert len(sink.frames) == 3
+        pd.testing.assert_frame_equal(sink.frame(), expected)
+        assert meta == {"timestamp": "2023-09-01T12:00:00Z", "next": None}
+
+    # The odds endpoint sends a plain list
+    sink, meta = stream_odds(chunked(games, 5))
+    pd.testing.assert_frame_equal(sink.frame(), odds_frame(games))
+    assert meta == {}
+
+
+def test_edge_payloads():
+    assert list(iter_games([b"[]"])) == []
+    assert list(iter_games([b'{"data": [], "timestamp": 1}'])) == []
+    assert list(iter_games([b"[1", b"23, 4", b"5]"])) == [123, 45]
+    assert stream_odds(io.BytesIO(b"[ ]"))[0].frame().empty
+    with pytest.raises(Exception):
+        list(iter_games([b'[{"home_team": "Arsenal"}']))
+
+
+def test_csv_sink(tmp_path):
+    games = make_games(30, 4)
+    sink, _ = stream_odds(
+        io.BytesIO(json.dumps(games).encode()), CsvSink(tmp_path / "odds.csv"), 8
+    )
+    pd.testing.assert_frame_equal(sink.frame(), odds_frame(games))
+
+
+def test_memory_is_flat(tmp_path):
+    """Peak memory streaming a payload doesn't grow with it, unlike json.loads"""
+
+    def peak(n_games, path):
+        data = json.dumps({"data": make_games(n_games, 10)}).encode()
+        tracemalloc.start()
+        stream_odds(io.BytesIO(data), CsvSink(path), batch_size=50)
+        streamed = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+        odds_frame(json.loads(data)["data"])
+        loaded = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return streamed, loaded
+
+    small, _ = peak(200, tmp_path / "small.csv")
+    large, loaded = peak(2000, tmp_path / "large.csv")
+    assert large < 2 * small
+    assert large < loaded / 4
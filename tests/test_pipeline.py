@@ -0,0 +1,126 @@
+import time
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from pipeline import Pipeline
+import run
+from run import build_pipeline
+from team.cache import ResultCache
+from conftest import make_players
+
+
+def make_pipeline(path, calls, delay=0.3, budget=1000):
+    def source(name):
+        def scrape(value):
+            calls.append(name)
+            time.sleep(delay)
+            return pd.DataFrame({name: [value, value + 1]})
+
+        return scrape
+
+    def combine(stats, odds):
+        calls.append("combine")
+        return pd.concat([stats, odds], axis=1)
+
+    def pick(combined, budget):
+        calls.append("pick")
+        return combined.sum().sum() + budget
+
+    pipeline = Pipeline(path)
+    pipeline.add("stats", source("stats"), params={"value": 1})
+    pipeline.add("odds", source("odds"), params={"value": 10})
+    pipeline.add("combined", combine, inputs=["stats", "odds"])
+    pipeline.add("team", pick, inputs=["combined"], params={"budget": budget})
+    return pipeline
+
+
+def test_independent_stages_run_concurrently(tmp_path):
+    calls = []
+    start = time.perf_counter()
+    result = make_pipeline(tmp_path, calls).run()
+    assert time.perf_counter() - start < 0.55
+    assert result == {"team": 1 + 2 + 10 + 11 + 1000}
+    assert calls.index("combine") > max(calls.index("stats"), calls.index("odds"))
+
+
+def test_memo_skips_unchanged_stages(tmp_path):
+    calls = []
+    make_pipeline(tmp_path, calls).run()
+
+    # Only the last stage's settings changed: nothing upstream runs or loads
+    calls.clear()
+    pipeline = make_pipeline(tmp_path, calls, budget=990)
+    assert pipeline.run() == {"team": 1014}
+    assert calls == ["pick"]
+    assert pipeline.reused == ["stats", "odds", "combined"]
+
+    # A refreshed source returning the same data keeps what follows it
+    calls.clear()
+    pipeline = make_pipeline(tmp_path, calls, budget=990)
+    pipeline.run(refresh=["odds"])
+    assert calls == ["odds"]
+    assert pipeline.reused == ["stats", "combined", "team"]
+
+    outputs = pipeline.run(targets=["combined", "stats"])
+    assert list(outputs["combined"].columns) == ["stats", "odds"]
+    assert pipeline.ran == []
+
+
+def test_declared_inputs_must_exist():
+    pipeline = Pipeline(None)
+    with pytest.raises(Exception):
+        pipeline.add("combined", sum, inputs=["stats"])
+
+
+def test_run_pipeline_stages(tmp_path):
+    pipeline = build_pipeline(24, 10, budget=990, memo=tmp_path)
+    assert pipeline.stages["next_game"].inputs == ["player_stats", "win_odds"]
+    assert not pipeline.stages["team"].memo
+    assert pipeline.stages["team"].params["budget"] == 990
+
+
+def test_run_pipeline_sources_and_picks(tmp_path, monkeypatch):
+    calls = []
+    stats = make_players(150)
+
+    def fake_source(name, frame):
+        def scrape(**params):
+            calls.append(name)
+            return frame
+
+        return scrape
+
+    def build(day):
+        today = SimpleNamespace(today=lambda: day)
+        monkeypatch.setattr(run, "datetime", SimpleNamespace(date=today))
+        pipeline = build_pipeline(
+            24, 10, memo=tmp_path / "memo", picks=tmp_path / "picks"
+        )
+        pipeline.stages["player_stats"].func = fake_source("stats", stats)
+        pipeline.stages["win_odds"].func = fake_source("odds", stats[["name"]])
+        pipeline.stages["next_game"].func = lambda player_stats, win_odds, **_: (
+            player_stats
+        )
+        return pipeline
+
+    first = build("2024-10-01").run()["team"]
+    assert calls == ["stats", "odds"]
+
+    # Memoised for the day, and the pick reused from the ResultCache
+    calls.clear()
+    pipeline = build("2024-10-01")
+    team = pipeline.run()["team"]
+    assert calls == []
+    assert pipeline.ran == ["team"]
+    assert team.selector._first_xv.empty
+    pd.testing.assert_frame_equal(team.first_xi, first.first_xi)
+    assert len(ResultCache(tmp_path / "picks")) == 1
+
+    # Sources are scraped again on refresh or the next day
+    pipeline.run(refresh=["player_stats"])
+    assert calls == ["stats"]
+    calls.clear()
+    build("2024-10-02").run()
+    assert calls == ["stats", "odds"]
@@ -0,0 +1,100 @@
+import time
+
+import pandas as pd
+
+from scrape.players.scrape import FPLScraper
+from conftest import FIXTURES, MERGED_GW, TEAMS, SourceServer
+
+
+def source_files():
+    files = {"/2023-24/teams.csv": TEAMS, "/2023-24/fixtures.csv": FIXTURES}
+    for season, csv in MERGED_GW.items():
+        files[f"/{season}/gws/merged_gw.csv"] = csv
+    return files
+
+
+def write_sources(path, files=None):
+    for name, csv in (files or source_files()).items():
+        file = path / name.lstrip("/")
+        file.parent.mkdir(parents=True, exist_ok=True)
+        file.write_text(csv)
+
+
+def test_gw_stats_typed_and_renamed(tmp_path, monkeypatch):
+    write_sources(tmp_path)
+    monkeypatch.setattr(FPLScraper, "BASE_URL", str(tmp_path))
+    gw_stats = FPLScraper(24).run_scrape()
+
+    assert "xP" not in gw_stats.columns
+    assert gw_stats["name"].dtype == "category"
+    assert gw_stats["team_name"].dtype == "category"
+    assert gw_stats["total_points"].dtype == "int16"
+    assert gw_stats["gameweek"].dtype == "int8"
+
+    # Renames merge the two spellings and the team across seasons
+    son = gw_stats[gw_stats["name"] == "Heung-Min Son"]
+    assert list(son["season"]) == [24, 24, 23]
+    assert set(son["team_name"]) == {"Tottenham"}
+    assert "Son Heung-min" not in gw_stats["name"].cat.categories
+
+    assert list(gw_stats["game_date"].head(2)) == [
+        pd.Timestamp("2023-08-13"),
+        pd.Timestamp("2023-08-11"),
+    ]
+    assert gw_stats["position"].isna().sum() == 1
+
+
+def test_prefetch_is_concurrent(monkeypatch):
+    with SourceServer(source_files(), delay=0.5) as server:
+        monkeypatch.setattr(FPLScraper, "BASE_URL", server.url)
+        start = time.perf_counter()
+        scraper = FPLScraper(24).prefetch()
+        elapsed = time.perf_counter() - start
+        assert len(server.requests) == 4
+        # Four files at half a second each, fetched side by side
+        assert elapsed < 1.5
+
+        # The same frames as reading each property in turn
+        lazy = FPLScraper(24)
+        pd.testing.assert_frame_equal(scraper.fixtures, lazy.fixtures)
+        pd.testing.assert_frame_equal(scraper.team_ids, lazy.team_ids)
+        pd.testing.assert_frame_equal(scraper.gw_stats, lazy.run_scrape())
+        assert len(scraper.fixtures) == 2 and len(scraper.gw_stats) == 4
+
+
+# 2018-19 and 2019-20 have no team or position, and suffix names with ids
+OLD_SEASON = {
+    "/2018-19/gws/merged_gw.csv": (
+        "name,assists,bps,element,fixture,kickoff_time,minutes,opponent_team,"
+        "total_points,value,was_home,GW\n"
+        "Son_Heung-min_380,0,20,380,2,2018-08-11T11:30:00Z,90,19,6,85,False,1\n"
+        "Sergio_Agüero_270,1,30,270,3,2018-08-12T15:00:00Z,90,6,9,110,False,1\n"
+        "Son_Heung-min_380,1,25,380,12,2018-08-18T14:00:00Z,85,9,7,85,True,2\n"
+    ),
+    "/2018-19/fixtures.csv": (
+        "id,team_h,team_a,kickoff_time,event\n"
+        "2,19,17,2018-08-11T11:30:00Z,1\n"
+        "3,6,11,2018-08-12T15:00:00Z,1\n"
+        "12,17,9,2018-08-18T14:00:00Z,2\n"
+    ),
+    "/master_team_list.csv": (
+        "season,team,team_name\n"
+        "2018-19,6,Chelsea\n"
+        "2018-19,9,Fulham\n"
+        "2018-19,11,Man City\n"
+        "2018-19,17,Spurs\n"
+        "2018-19,19,Newcastle\n"
+        "2019-20,11,Liverpool\n"
+    ),
+}
+
+
+def test_old_season_without_team(tmp_path, monkeypatch):
+    write_sources(tmp_path, OLD_SEASON)
+    monkeypatch.setattr(FPLScraper, "BASE_URL", str(tmp_path))
+
+    gw_stats = FPLScraper._combine_gw_stats([FPLScraper(19)._read_gw_stats(19)])
+    assert list(gw_stats["name"]) == ["Heung-Min Son", "Sergio Agüero", "Heung-Min Son"]
+    assert list(gw_stats["team_name"]) == ["Tottenham", "Manchester City", "Tottenham"]
+    assert gw_stats["team_name"].dtype == "category"
+    assert "position" not in gw_stats.columns
@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+
+from scrape.cache import SourceCache
+from scrape.players.scrape import FPLScraper
+from conftest import FIXTURES, TEAMS, SourceServer
+
+
+@pytest.fixture
+def server(monkeypatch):
+    files = {"/2023-24/teams.csv": TEAMS, "/2023-24/fixtures.csv": FIXTURES}
+    with SourceServer(files) as server:
+        monkeypatch.setattr(FPLScraper, "BASE_URL", server.url)
+        yield server
+
+
+def test_cache_hits_and_revalidates(server, tmp_path):
+    cache = SourceCache(tmp_path, max_age=3600)
+    first = FPLScraper(24, cache=cache).fixtures
+    assert cache.downloads == 2  # fixtures and the teams they're merged with
+
+    n_requests = len(server.requests)
+    again = FPLScraper(24, cache=cache).fixtures
+    pd.testing.assert_frame_equal(first, again)
+    assert len(server.requests) == n_requests
+    assert cache.hits == 2
+
+    # Past max_age an unchanged file is revalidated, not downloaded
+    cache.max_age = 0
+    FPLScraper(24, cache=cache).fixtures
+    assert cache.revalidated == 2
+    assert cache.downloads == 2
+
+    # A changed file is downloaded again
+    server.files["/2023-24/teams.csv"] = TEAMS.replace("Arsenal", "Gunners")
+    teams = FPLScraper(24, cache=cache).team_ids
+    assert cache.downloads == 3
+    assert "Gunners" in teams.team.to_list()
+
+
+def test_offline(server, tmp_path):
+    with pytest.raises(Exception):
+        FPLScraper(24, cache=SourceCache(tmp_path, offline=True)).team_ids
+
+    FPLScraper(24, cache=SourceCache(tmp_path)).team_ids
+    n_requests = len(server.requests)
+    cache = SourceCache(tmp_path, max_age=0, offline=True)
+    teams = FPLScraper(24, cache=cache).team_ids
+    assert len(server.requests) == n_requests
+    assert cache.hits == 1
+    assert len(teams) == 3
+
+
+def test_stale_copy_when_unreachable(server, tmp_path):
+    cache = SourceCache(tmp_path, max_age=0)
+    url = f"{server.url}/2023-24/teams.csv"
+    cache.read_csv(url, "2023-24/teams.csv")
+    server.__exit__()
+    teams = cache.read_csv(url, "2023-24/teams.csv")
+    assert len(teams) == 3 and cache.hits == 1
+
+    # Different read arguments don't reuse the stored frame
+    with pytest.raises(Exception):
+        cache.read_csv(url, "2023-24/teams.csv", usecols=["id"])
@@ -0,0 +1,333 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from team.model import PulpBackend, build_xv_model, get_backend
+from team.select import (
+    DumbOptimiser,
+    GreedyOptimiser,
+    JointOptimiser,
+    Optimiser,
+    PersistentOptimiser,
+    select_xi,
+)
+from conftest import make_players
+
+
+def check_xv(df, xv, budget=1000):
+    squad = xv[xv.picked == 1]
+    assert len(squad) == 15
+    assert squad.value.sum() <= budget
+    assert squad.team_name.value_counts().max() <= 3
+    for pos, n in Optimiser.POS_CONSTRAINTS["XV"].items():
+        assert (squad.position == pos).sum() == n
+    assert xv.captain.sum() == 1
+    assert xv.loc[xv.captain == 1, "picked"].item() == 1
+
+
+def test_xv_model_shape():
+    df = make_players()
+    model = build_xv_model(
+        df.points_weighted,
+        df.value,
+        df.position,
+        df.team_name,
+        1000,
+        Optimiser.POS_CONSTRAINTS["XV"],
+    )
+    assert model.n_cols == 2 * len(df)
+    # size, budget, captain, 4 positions, 1 per club, 1 captain link per player
+    assert model.n_rows == 3 + 4 + df.team_name.nunique() + len(df)
+
+
+def test_backends_agree():
+    df = make_players()
+    model = build_xv_model(
+        df.points_weighted,
+        df.value,
+        df.position,
+        df.team_name,
+        1000,
+        Optimiser.POS_CONSTRAINTS["XV"],
+    )
+    default = get_backend(model).solve()
+    pulp = get_backend(model, PulpBackend).solve()
+    assert model.c @ default == pytest.approx(model.c @ pulp)
+
+
+def test_pick_xv_feasible():
+    df = make_players()
+    xv = DumbOptimiser(df, 24)._pick_xv()
+    check_xv(df, xv)
+
+
+def test_persistent_update_matches_rebuild():
+    df = make_players()
+    opt = PersistentOptimiser(df, 24)
+    captain = opt.first_xv.captain.idxmax()
+
+    opt.update([captain], available=[False])
+    xv = opt.first_xv
+    check_xv(df, xv)
+    assert xv.loc[captain, "picked"] == 0
+
+    rebuilt = DumbOptimiser(df.drop(index=captain), 24).first_xv
+    assert xv.loc[xv.picked == 1, "points_weighted"].sum() == pytest.approx(
+        rebuilt.loc[rebuilt.picked == 1, "points_weighted"].sum()
+    )
+
+    # Players fixed out as dominated in one solve can be picked in the next
+    assert (opt.backend.model.col_ub == 0).sum() == 2
+
+    # Players left out of the model are added back once worth picking
+    left_out = np.setdiff1d(np.arange(len(df)), opt.candidates)[0]
+    assert xv.loc[left_out, "picked"] == 0
+    opt.update([left_out], points_weighted=[2.0])
+    assert opt.first_xv.loc[left_out, "captain"] == 1
+    assert left_out in opt.candidates
+
+
+def test_persistent_what_ifs_stay_optimal():
+    df = make_players(300, 1)
+    opt = PersistentOptimiser(df, 24)
+    current = df.copy()
+    rng = np.random.default_rng(1)
+    for _ in range(6):
+        rows = rng.choice(len(df), 10, replace=False)
+        points = current.points_weighted.to_numpy()[rows] * rng.uniform(0.5, 2, 10)
+        values = current.value.to_numpy()[rows] - rng.integers(-5, 6, 10)
+        opt.update(rows, points_weighted=points, value=values)
+        current.loc[current.index[rows], "points_weighted"] = points
+        current.loc[current.index[rows], "value"] = values
+
+        xv = opt.first_xv
+        check_xv(current, xv)
+        assert squad_objective(xv) == pytest.approx(
+            squad_objective(DumbOptimiser(current, 24).first_xv)
+        )
+
+
+def test_solver_options():
+    df = make_players(700)
+    opt = DumbOptimiser(df, 24)
+    opt.first_xv
+    assert opt.solve_info["status"] == "optimal"
+    assert opt.solve_info["objective"] == pytest.approx(squad_objective(opt.first_xv))
+
+    # Either finishes or stops on the limit with the best squad found so far
+    opt = JointOptimiser(df, 24, solver_options={"time_limit": 0.5, "threads": 1})
+    check_xv(df, opt.first_xv)
+    info = opt.solve_info
+    assert info["status"] in ("optimal", "time_limit")
+    assert info["solve_time"] < 2
+    assert info["bound"] is None or info["objective"] <= info["bound"] + 1e-9
+
+
+def squad_objective(xv):
+    points = xv.loc[xv.picked == 1, "points_weighted"]
+    return points.sum() + points.max()
+
+
+def test_k_best_squads():
+    df = make_players(200)
+    opt = PersistentOptimiser(df, 24)
+    best = opt.k_best(4)
+
+    squads = [frozenset(g.index) for _, g in best.groupby("rank")]
+    objectives = best.groupby("rank").objective.first().to_numpy()
+    assert len(set(squads)) == 4
+    assert (np.diff(objectives) <= 1e-9).all()
+    assert objectives[0] == pytest.approx(squad_objective(opt.first_xv))
+
+    # The runner-up has to leave out at least one player of the optimum
+    runner_up = max(
+        squad_objective(xv)
+        for xv in (DumbOptimiser(df.drop(index=i), 24).first_xv for i in squads[0])
+    )
+    assert objectives[1] == pytest.approx(runner_up)
+
+    diverse = opt.k_best(3, min_changes=3)
+    squads = [frozenset(g.index) for _, g in diverse.groupby("rank")]
+    for a, b in itertools.combinations(squads, 2):
+        assert len(a - b) >= 3
+
+    # Cuts and fixed bounds are undone
+    model = opt.backend.model
+    assert not any(name.startswith("no_good") for name in model.row_names)
+    assert (model.col_lb == 0).all() and (model.col_ub == 1).all()
+
+
+def test_k_best_partition_matches_cuts(monkeypatch):
+    df = make_players(200)
+    split = PersistentOptimiser(df, 24).k_best(8)
+    monkeypatch.setattr(
+        PersistentOptimiser, "_partition", lambda self, k: self._cut(k, 1)
+    )
+    cut = PersistentOptimiser(df, 24).k_best(8)
+    np.testing.assert_allclose(
+        split.groupby("rank").objective.first(),
+        cut.groupby("rank").objective.first(),
+    )
+
+
+def test_k_best_runs_out_of_squads(monkeypatch):
+    # The optimum and a spare keeper only make three squads
+    df = make_players(200)
+    xv = DumbOptimiser(df, 24).first_xv
+    spare = df[df.position == "GK"].iloc[[0]].assign(value=40, team_name="Spare")
+    df = pd.concat([df.loc[xv.index[xv.picked == 1]], spare], ignore_index=True)
+    for min_changes in (1, 2):
+        best = PersistentOptimiser(df, 24).k_best(5, min_changes=min_changes)
+        assert best["rank"].nunique() == (3 if min_changes == 1 else 1)
+
+    # Other solver failures after the first squad still surface
+    opt = PersistentOptimiser(df, 24)
+    opt.k_best(1)
+    solve, calls = type(opt.backend).solve, itertools.count()
+
+    def fail(backend, warm_start=None):
+        if next(calls) == 0:
+            return solve(backend, warm_start)
+        backend.info = {"status": "time_limit"}
+        raise Exception("Solver failed: Time limit reached")
+
+    monkeypatch.setattr(type(opt.backend), "solve", fail)
+    with pytest.raises(Exception, match="Time limit"):
+        opt.k_best(5)
+
+
+def check_xi(xi):
+    squad = xi[xi.picked == 1]
+    starters = squad[squad.first_xi == 1]
+    assert len(starters) == 11
+    for pos, (low, high) in Optimiser.POS_CONSTRAINTS["XI"].items():
+        assert low <= (starters.position == pos).sum() <= high
+
+
+def xi_score(xi):
+    squad = xi[xi.picked == 1]
+    return (
+        squad.loc[squad.first_xi == 1, "points_weighted"].sum()
+        + squad.loc[squad.captain == 1, "points_weighted"].sum()
+    )
+
+
+def test_dumb_pick_xi_uses_squad_rows():
+    df = make_players()
+    xi = DumbOptimiser(df, 24).pick_xi()
+    check_xi(xi)
+    squad = xi[xi.picked == 1]
+    bench = squad[squad.first_xi == 0]
+    # No benched player should outscore a starter in the same position
+    for pos in ["GK", "DEF", "MID", "FWD"]:
+        starting = squad[(squad.first_xi == 1) & (squad.position == pos)]
+        if (bench.position == pos).any():
+            assert (
+                bench[bench.position == pos].points_weighted.max()
+                <= starting.points_weighted.min()
+            )
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_pick_xi_follows_max_var(seed):
+    df = make_players(seed=seed)
+    opt = DumbOptimiser(df, 24, max_var="total_points")
+    xi = opt.pick_xi()
+    check_xi(xi)
+    squad = xi[xi.picked == 1]
+    # Captain kept from the squad pick, the XI the best by total_points
+    captain = opt.first_xv.element[opt.first_xv.captain == 1].item()
+    assert squad.element[squad.captain == 1].item() == captain
+    assert squad.vice_captain.sum() == 1
+    assert (squad.element[squad.vice_captain == 1] != captain).all()
+    best = select_xi(squad.drop(columns="first_xi"), points_col="total_points")
+    assert squad.total_points[squad.first_xi == 1].sum() == pytest.approx(
+        best.total_points[best.first_xi == 1].sum()
+    )
+
+
+def test_joint_optimiser():
+    df = make_players()
+    joint = JointOptimiser(df, 24)
+    xi = joint.pick_xi()
+    check_xv(df, joint.first_xv)
+    check_xi(xi)
+
+    squad = xi[xi.picked == 1]
+    assert squad.loc[squad.captain == 1, "first_xi"].item() == 1
+    assert sorted(squad.bench_order) == [0] * 11 + [1, 2, 3, 4]
+    assert squad.loc[squad.bench_order == 1, "position"].item() == "GK"
+    assert xi_score(xi) >= xi_score(DumbOptimiser(df, 24).pick_xi()) - 1e-9
+
+
+def test_select_xi_matches_brute_force():
+    df = make_players(seed=1)
+    squad = pd.concat(
+        [
+            df[df.position == pos].head(n)
+            for pos, n in Optimiser.POS_CONSTRAINTS["XV"].items()
+        ]
+    ).assign(picked=1)
+    xi = select_xi(squad)
+    check_xi(xi)
+
+    best = 0
+    for defs, mids in itertools.product(range(3, 6), range(2, 6)):
+        fwds = 10 - defs - mids
+        if not 1 <= fwds <= 3:
+            continue
+        score = sum(
+            squad[squad.position == pos].points_weighted.nlargest(n).sum()
+            for pos, n in [("GK", 1), ("DEF", defs), ("MID", mids), ("FWD", fwds)]
+        )
+        best = max(best, score)
+    assert xi.loc[xi.first_xi == 1, "points_weighted"].sum() == pytest.approx(best)
+
+    starters = xi[xi.first_xi == 1].points_weighted
+    assert xi.loc[xi.captain == 1, "points_weighted"].item() == starters.max()
+    assert (
+        xi.loc[xi.vice_captain == 1, "points_weighted"].item()
+        == starters.nlargest(2).iloc[1]
+    )
+    assert xi.loc[xi.bench_order == 1, "position"].item() == "GK"
+
+
+@pytest.mark.parametrize("max_var", ["value_fixture", "total_points"])
+def test_pruning_keeps_optimum(max_var):
+    col = "points_weighted" if max_var == "value_fixture" else "total_points"
+    df = make_players(seed=2)
+    pruned = DumbOptimiser(df, 24, max_var=max_var)
+    full = DumbOptimiser(df, 24, max_var=max_var, prune=False)
+
+    def objective(xv):
+        return xv.loc[xv.picked == 1, col].sum() + xv.loc[xv.captain == 1, col].sum()
+
+    check_xv(df, pruned.first_xv)
+    assert pruned.n_pruned > 0
+    assert objective(pruned.first_xv) == pytest.approx(objective(full.first_xv))
+
+
+def test_greedy_optimiser_bounds_optimum():
+    df = make_players(seed=3)
+    greedy = GreedyOptimiser(df, 24)
+    xv = greedy.first_xv
+    check_xv(df, xv)
+
+    exact = DumbOptimiser(df, 24).first_xv
+    optimum = (
+        exact.loc[exact.picked == 1, "points_weighted"].sum()
+        + exact.loc[exact.captain == 1, "points_weighted"].sum()
+    )
+    assert greedy.objective_value <= optimum + 1e-9
+    assert optimum <= greedy.upper_bound + 1e-9
+    assert greedy.gap >= 0
+
+
+def test_greedy_optimiser_infeasible_budget():
+    df = make_players(seed=3)
+    with pytest.raises(Exception, match="No feasible squad"):
+        GreedyOptimiser(df, 24, budget=400).first_xv
+    with pytest.raises(Exception, match="Solver failed"):
+        DumbOptimiser(df, 24, budget=400).first_xv
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from team.select import PersistentOptimiser
+from team.simulate import SquadSimulator
+from conftest import make_players
+
+
+def make_sim_players(n=300, seed=0):
+    df = make_players(n, seed)
+    rng = np.random.default_rng(seed)
+    df["minutes"] = rng.integers(0, 20 * 90 + 1, n)
+    df.loc[0, "minutes"] = 20 * 90
+    return df
+
+
+def test_simulated_means_match_history():
+    df = make_sim_players()
+    sim = SquadSimulator(df, n_scenarios=20000, seed=1)
+    assert sim.n_games == 20
+
+    # Regulars scoring at least the appearance points per 90 keep their mean
+    regular = (df.minutes >= 5 * 90) & (df.total_points * 90 >= 2 * df.minutes)
+    expected = df.total_points / 20
+    simulated = sim.points.mean(axis=0)
+    np.testing.assert_allclose(
+        simulated[regular], expected[regular], rtol=0.1, atol=0.05
+    )
+
+
+def test_team_mates_are_correlated():
+    df = make_sim_players()
+    df["minutes"] = 20 * 90
+    sim = SquadSimulator(df, n_scenarios=20000, team_effect=1, seed=2)
+    scorers = df.total_points.to_numpy() > 40
+    corr = np.corrcoef(sim.points[:, scorers].T)
+    teams = df.team_name.to_numpy()[scorers]
+    same = teams[:, None] == teams[None, :]
+    off_diagonal = ~np.eye(len(teams), dtype=bool)
+    assert corr[same & off_diagonal].mean() > 0.05
+    assert abs(corr[~same].mean()) < 0.01
+
+
+def test_score_squads():
+    df = make_sim_players(200)
+    squads = PersistentOptimiser(df, 24).k_best(5)
+    sim = SquadSimulator(df, n_scenarios=4000, seed=3, chunk_size=2)
+    scores, samples = sim.score(squads, return_samples=True)
+
+    assert list(scores["rank"]) == list(range(5))
+    assert samples.shape == (4000, 5)
+    quantiles = scores[["q05", "q25", "q50", "q75", "q95"]].to_numpy()
+    assert (np.diff(quantiles, axis=1) >= 0).all()
+
+    # Same as scoring each squad by hand, captain counted twice
+    for rank, squad in squads.groupby("rank"):
+        by_hand = sim.points[:, squad.index].sum(axis=1)
+        captain = squad.index[squad.captain == 1]
+        by_hand = by_hand + sim.points[:, captain].sum(axis=1)
+        np.testing.assert_allclose(samples[:, rank], by_hand, rtol=1e-5)
+        assert scores.loc[rank, "mean"] == pytest.approx(by_hand.mean(), rel=1e-5)
+        assert scores.loc[rank, "captain_uplift"] == pytest.approx(
+            sim.points[:, captain].mean(), rel=1e-5
+        )
+
+    # A weights matrix is scored the same way
+    weights, _ = sim.squad_weights(squads)
+    pd.testing.assert_frame_equal(
+        sim.score(weights).drop(columns="rank"), scores.drop(columns="rank")
+    )
+
+
+def test_one_result_per_fixture():
+    df = make_sim_players()
+    clubs = sorted(df.team_name.unique())
+    # Clubs paired off in order, the first of each pair favoured
+    opponents = {a: b for a, b in zip(clubs[::2], clubs[1::2])}
+    opponents.update({b: a for a, b in opponents.items()})
+    df["next_opp"] = df.team_name.map(opponents)
+    odds = {c: 0.7 if c in clubs[::2] else 0.2 for c in clubs}
+    df["agg_win_odds"] = df.team_name.map(odds)
+
+    sim = SquadSimulator(df, seed=4)
+    _, _, _, win, opponent = sim._player_params()
+    won, _ = sim._results(20000, win, opponent)
+    home, away = np.arange(0, len(clubs), 2), np.arange(1, len(clubs), 2)
+    assert (opponent[home] == away).all()
+    assert not (won[:, home] & won[:, away]).any()
+    np.testing.assert_allclose(won.mean(axis=0), win, atol=0.015)
+    draws = ~(won[:, home] | won[:, away])
+    assert draws.mean() == pytest.approx(0.1, abs=0.01)
@@ -0,0 +1,54 @@
+import pandas as pd
+import pytest
+
+from scrape.combine import BetFPLCombiner
+from team.select import DumbOptimiser
+from team.sweep import make_grid, sweep
+from conftest import make_players
+
+
+def separate_picks(df, grid):
+    """Each grid point's squad names and objective from its own DumbOptimiser"""
+    picks = {}
+    for k, point in grid.iterrows():
+        points = BetFPLCombiner.weight_points(
+            df.position,
+            df.scaled_points,
+            df.agg_win_odds,
+            point.odds_weight_def,
+            point.odds_weight_fwd,
+        )
+        xv = DumbOptimiser(
+            df.assign(points_weighted=points),
+            24,
+            budget=point.budget,
+            max_var=point.max_var,
+        ).first_xv
+        squad = xv[xv.picked == 1]
+        objective = squad.points_weighted.sum() + xv.points_weighted[xv.captain == 1]
+        picks[k] = (set(squad.name), xv.name[xv.captain == 1].item(), objective.sum())
+    return picks
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_sweep_matches_separate_runs(processes):
+    df = make_players(150)
+    grid = make_grid(odds_weight_def=[0.3, 0.6], budget=[950, 1000])
+    assert len(grid) == 4
+
+    results = sweep(df, grid, processes=processes)
+    assert sorted(results.grid_point.unique()) == list(grid.index)
+    for k, (names, captain, objective) in separate_picks(df, grid).items():
+        squad = results[results.grid_point == k]
+        assert len(squad) == 15
+        assert set(squad.name) == names
+        assert squad.name[squad.captain == 1].item() == captain
+        assert squad.objective.iloc[0] == pytest.approx(objective)
+        assert (squad.budget == grid.budget[k]).all()
+
+
+def test_make_grid_rejects_unknown_parameters():
+    with pytest.raises(Exception):
+        make_grid(odds_weight_mid=[0.5])
+    grid = make_grid()
+    pd.testing.assert_index_equal(grid.index, pd.RangeIndex(1, name="grid_point"))
@@ -0,0 +1,169 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from team.model import PulpBackend
+from team.select import DumbOptimiser, Optimiser
+from team.team import Team
+from team.transfers import TransferPlanner, sell_price
+from conftest import make_players
+
+
+def make_projections(df, weeks, seed=0):
+    rng = np.random.default_rng(seed)
+    base = df.value.to_numpy() / 20 * rng.gamma(4, 0.25, len(df))
+    points = base[:, None] * rng.uniform(0.6, 1.4, (len(df), len(weeks)))
+    return pd.DataFrame(points, index=df.index, columns=list(weeks))
+
+
+def make_planner(n=150, weeks=range(10, 14), seed=0, **kwargs):
+    df = make_players(n, seed)
+    projections = make_projections(df, weeks, seed)
+    picks = DumbOptimiser(df, 2024, budget=1000).pick_xi()
+    squad = df.index[df.name.isin(picks[picks.picked == 1].name)]
+    kwargs.setdefault("candidates_per_position", 8)
+    kwargs.setdefault("solver_options", {"mip_gap": 0})
+    bank = 1000 - df.value[squad].sum()
+    return TransferPlanner(df, squad, projections, bank=bank, **kwargs)
+
+
+def check_plan(planner, free_transfers):
+    df = planner.player_df
+    summary = planner.summary
+    for gameweek in planner.gameweeks:
+        squad = df.loc[planner.squad(gameweek)]
+        assert len(squad) == 15
+        assert squad.team_name.value_counts().max() <= 3
+        for pos, n in Optimiser.POS_CONSTRAINTS["XV"].items():
+            assert (squad.position == pos).sum() == n
+        week = summary.loc[gameweek]
+        assert week.bank >= -1e-6
+        assert week.free_transfers == free_transfers
+        assert week.hits == max(week.transfers - free_transfers, 0)
+        if week.hits:
+            free_transfers = 1
+        else:
+            free_transfers = min(free_transfers - week.transfers + 1, 5)
+
+
+def test_sell_price():
+    assert list(sell_price([50, 50, 50], [53, 50, 47])) == [51, 50, 47]
+
+
+def test_plan_is_feasible():
+    planner = make_planner()
+    moves = planner.plan()
+    check_plan(planner, 1)
+
+    # Each week's moves take the squad from the last week's to this one's
+    squad = set(planner.owned)
+    for gameweek in planner.gameweeks:
+        week = moves[moves.gameweek == gameweek]
+        squad -= set(week[week.move == "out"].index)
+        squad |= set(week[week.move == "in"].index)
+        assert squad == set(planner.squad(gameweek))
+
+
+def test_hits_need_to_pay():
+    planner = make_planner(hit_cost=1000)
+    planner.plan()
+    assert planner.summary.hits.sum() == 0
+    check_plan(planner, 1)
+
+
+def test_advance_matches_rebuild():
+    planner = make_planner()
+    planner.plan()
+    bought = planner.transfers.query("gameweek == 10 and move == 'in'").index
+
+    projections = make_projections(planner.player_df, range(11, 15), seed=1)
+    planner.advance(projections)
+    assert set(bought) <= set(planner.owned)
+    check_plan(planner, planner.free_transfers)
+
+    fresh = TransferPlanner(
+        planner.player_df,
+        planner.owned,
+        projections,
+        bank=planner.bank,
+        free_transfers=planner.free_transfers,
+        purchase_prices=planner.sell_prices,
+        solver_options={"mip_gap": 0},
+    )
+    fresh.candidates = planner.candidates
+    fresh.projections = projections.loc[planner.candidates]
+    fresh.plan()
+    assert planner.objective_value == pytest.approx(fresh.objective_value)
+
+
+def test_default_size():
+    # 700 players with the default candidates and solve budget
+    planner = make_planner(
+        700, range(10, 15), candidates_per_position=12, solver_options=None
+    )
+    assert len(planner.candidates) < 100
+    hold = planner._get_backend().model.c @ planner._hold_solution()
+    start = time.perf_counter()
+    planner.plan()
+    assert planner.objective_value >= hold - 1e-6
+    check_plan(planner, 1)
+
+    planner.advance(make_projections(planner.player_df, range(11, 16), seed=1))
+    check_plan(planner, planner.free_transfers)
+    # Two solves of at most 10 s each
+    assert time.perf_counter() - start < 25
+
+
+def test_best_transfer():
+    planner = make_planner()
+    planner.plan()
+    # The dearest player, so there is money for a replacement
+    player_out = planner.player_df.value[planner.owned].idxmax()
+    plan = planner.transfers.copy(), planner.objective_value
+    move = planner.best_transfer(player_out)
+    assert list(move.move) == ["out", "in"]
+    # The horizon plan is left as it was
+    pd.testing.assert_frame_equal(planner.transfers, plan[0])
+    assert planner.objective_value == plan[1]
+    assert move.index[0] == player_out
+    assert move.index[1] not in planner.owned
+    with pytest.raises(Exception):
+        planner.best_transfer(planner.candidates.difference(planner.owned)[0])
+
+
+def test_backends_agree():
+    highs = make_planner(n=80, weeks=range(10, 13))
+    pulp = make_planner(n=80, weeks=range(10, 13))
+    highs.plan()
+    pulp.backend = PulpBackend(highs.backend.model)
+    pulp.plan()
+    assert pulp.objective_value == pytest.approx(highs.objective_value)
+
+
+def test_team_transfers():
+    df = make_players(150)
+    initial = Team(2024, 10, df, budget=1000)
+    initial.pick_xi()
+
+    # Prices rise, so the squad is worth more than was paid but only half
+    # of each rise can be sold on
+    later = df.assign(value=df.value + 2)
+    # A player outside the squad shares a squad player's name
+    picked = initial.first_xi.picked == 1
+    namesake = later.index.difference(
+        later.index[later.name.isin(initial.first_xi.name[picked])]
+    )[0]
+    later.loc[namesake, "name"] = initial.first_xi.name[picked].iloc[0]
+    team = Team(2024, 11, later, initial_xi=initial)
+    assert team.budget == 1000 + 15
+
+    moves = team.suggest_transfers(
+        make_projections(later, range(11, 14)), candidates_per_position=8
+    )
+    assert set(moves.move) <= {"in", "out"}
+    squad = initial.first_xi[initial.first_xi.picked == 1]
+    player_out = squad.name[squad.value.idxmax()]
+    move = team.suggest_specific_transfer(player_out)
+    assert move.name.iloc[0] == player_out